@@ -388,6 +388,7 @@ def load_post(dummy):
     """クラッシュ回避"""
     custom_icons.unload_icons()
     custom_icons.load_icons()
+    memocoords.bump_generation()
 
 
 ###############################################################################
@@ -439,6 +440,7 @@ def register():
     custom_icons.load_icons()
     bpy.app.handlers.load_pre.append(load_pre)
     bpy.app.handlers.load_post.append(load_post)
+    bpy.app.handlers.scene_update_post.append(memocoords.scene_update_post)
 
 
 def unregister():
@@ -449,6 +451,7 @@ def unregister():
     custom_icons.unload_icons()
     bpy.app.handlers.load_pre.remove(load_pre)
     bpy.app.handlers.load_post.remove(load_post)
+    bpy.app.handlers.scene_update_post.remove(memocoords.scene_update_post)
 
     for cls in classes[::-1]:
         bpy.utils.unregister_class(cls)
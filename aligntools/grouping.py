@@ -23,6 +23,8 @@ import itertools
 from itertools import chain
 import logging
 
+import numpy as np
+
 import bpy
 from mathutils import Matrix, Vector
 import bmesh
@@ -189,15 +191,18 @@ class Group(collections.abc.Sequence):
         """
         if Space.get(space) == Space.REGION:
             # REGIONの場合のみbb_matは単位行列を元にする
-            vecs = self.get_coords(context, Space.REGION)
-            v_min = Vector([min((v[i] for v in vecs)) for i in range(3)])
-            v_max = Vector([max((v[i] for v in vecs)) for i in range(3)])
+            vecs = self.get_coords(context, Space.GLOBAL)
+            arr = memocoords.region_projector(context).project(vecs)
+            v_min = Vector(arr.min(axis=0))
+            v_max = Vector(arr.max(axis=0))
             bb_mat = Matrix.Identity(4)
             bb_mat.col[3][:3] = (v_min + v_max) / 2
             bb_scale = v_max - v_min
         else:
             vecs = self.get_coords(context, Space.GLOBAL)
-            mat = self.get_orientation(context, space, individual_orientation)
+            mat = self.get_orientation(
+                context, space,
+                individual_orientation=individual_orientation)
             imat = mat.inverted()
             vecs = [imat * v for v in vecs]
             v_min = Vector([min((v[i] for v in vecs)) for i in range(3)])
@@ -217,17 +222,18 @@ class Group(collections.abc.Sequence):
         :rtype: (Matrix, Vector)
         """
         if space == Space.REGION:
-            vecs = self.get_coords(context, Space.REGION)
-            vecs_2d = [v.to_2d() for v in vecs]
+            vecs = self.get_coords(context, Space.GLOBAL)
+            arr = memocoords.region_projector(context).project(vecs)
+            vecs_2d = [Vector(v) for v in arr[:, :2]]
             mat, scale = convexhull.OBB(vecs_2d)
-            z_min = min(vecs, key=lambda v: v[2])
-            z_max = max(vecs, key=lambda v: v[2])
+            z_min = arr[:, 2].min()
+            z_max = arr[:, 2].max()
             mat = mat.to_4x4()
             mat.col[3][:2] = mat.col[2][:2]
             mat.col[2][:3] = [0, 0, 1]
-            mat.col[3][2] = (z_min[2] + z_max[2]) / 2
+            mat.col[3][2] = (z_min + z_max) / 2
             scale = scale.to_3d()
-            scale[2] = z_max[2] - z_min[2]
+            scale[2] = z_max - z_min
         else:
             vecs = self.get_coords(context, Space.GLOBAL)
             mat, scale = convexhull.OBB(vecs)
@@ -265,7 +271,15 @@ class Group(collections.abc.Sequence):
         """self.bb_mat, self.bb_scale, self.bb_mat3x3, self.bb_scale2d の更新
         :type context: bpy.types.Context
         """
-        self.bb_mat, self.bb_scale = self.calc_bb(context)
+        self.set_bb(*self.calc_bb(context))
+
+    def set_bb(self, bb_mat, bb_scale):
+        """計算済みのBoundingBoxからself.bb_mat, self.bb_scale,
+        self.bb_mat3x3, self.bb_scale2d を更新する。Groupsから用いる。
+        :type bb_mat: Matrix
+        :type bb_scale: Vector
+        """
+        self.bb_mat, self.bb_scale = bb_mat, bb_scale
         for i in range(2):
             self.bb_mat3x3.col[i][:2] = self.bb_mat.col[i][:2]
         self.bb_mat3x3.col[2][:2] = self.bb_mat.col[3][:2]
@@ -311,7 +325,8 @@ class Group(collections.abc.Sequence):
             for i in range(3):
                 loc += mat.col[i].to_3d() * position[i] * scale[i] * 0.5
         if self.bb_space == Space.REGION:
-            loc = vav.unproject(context.region, context.region_data, loc)
+            loc = Vector(
+                memocoords.region_projector(context).unproject(loc)[0])
         return loc
 
     def calc_pivot_target(self, context, target, distance):
@@ -423,13 +438,20 @@ class Group(collections.abc.Sequence):
         return pivot
 
     # Update ------------------------------------------------------------------
-    def update(self, context, groups=None):
+    def update(self, context, groups=None, update_bb=True):
+        """
+        :type groups: Groups
+        :param update_bb: 偽ならBoundingBoxを更新しない。Groupsで纏めて
+            計算する場合に用いる
+        :type update_bb: bool
+        """
         if groups is not None:
             self.bb_type = groups.bb_type
             self.bb_space = groups.bb_space
             self.individual_orientation = groups.individual_orientation
         self.sort_dependence()
-        self.update_bb(context)
+        if update_bb:
+            self.update_bb(context)
 
     def translate(self, context, vec):
         """各要素を移動する
@@ -525,6 +547,7 @@ class ObjectGroup(Group):
         objects = [bpy.data.objects[name] for name in self]
         for ob in vaob.sorted_dependency(objects):
             ob.matrix_world.col[3][:3] = coords[ob.name] + vec
+        memocoords.bump_generation()
 
     def transform(self, context, matrix):
         """
@@ -537,6 +560,7 @@ class ObjectGroup(Group):
             mat = matrix * matrices[ob.name]
             for i in range(4):
                 ob.matrix_world.col[i][:] = mat.col[i]
+        memocoords.bump_generation()
 
 
 class ObjectMeshGroup(ObjectGroup):
@@ -1135,8 +1159,7 @@ class Groups(collections.abc.Sequence):
         if not groups:
             return groups
 
-        for group in groups:
-            group.update(context, groups=self)
+        self._update_groups(context, groups)
 
         fatten_vec = Vector([self.shrink_fatten * 2] * 3)
         fatten_vec_2d = fatten_vec.to_2d()
@@ -1154,7 +1177,7 @@ class Groups(collections.abc.Sequence):
                     g2.bb_mat, g2.bb_scale + fatten_vec)
 
         intersected_groups = localutils.utils.groupwith(groups, key)  # 2d list
-        groups = [Group(context, chain.from_iterable(group_list))
+        groups = [Group(None, chain.from_iterable(group_list))
                   for group_list in intersected_groups]
 
         return groups
@@ -1184,10 +1207,55 @@ class Groups(collections.abc.Sequence):
             return
 
         groups = self._make_groups(context)
-        for group in groups:
-            group.update(context, groups=self)
+        self._update_groups(context, groups)
         self._groups = groups[:]
 
+    def _update_groups(self, context, groups):
+        """各Groupを更新する。BoundingBoxは全Groupの座標を連結した配列から
+        纏めて計算する。
+        :type groups: list[Group]
+        """
+        for group in groups:
+            group.update(context, groups=self, update_bb=False)
+
+        bb_type = BoundingBox.get(self.bb_type)
+        bb_space = Space.get(self.bb_space)
+        coords_list = [group.get_coords(context, Space.GLOBAL)
+                       for group in groups]
+        # 空のGroupとREGIONのOBBは個別に計算する
+        batch = []
+        for group, coords in zip(groups, coords_list):
+            if (coords and not (bb_type == BoundingBox.OBB and
+                                bb_space == Space.REGION)):
+                batch.append((group, coords))
+            else:
+                group.update_bb(context)
+        if not batch:
+            return
+
+        coords, offsets = convexhull.concat_coords(
+            [vecs for _, vecs in batch])
+
+        if bb_type == BoundingBox.AABB:
+            if bb_space == Space.REGION:
+                coords = memocoords.region_projector(context).project(coords)
+                centers, sizes = convexhull.aabb_batch(coords, offsets)
+                matrices = [Matrix.Identity(3)] * len(batch)
+            else:
+                matrices = [group.get_orientation(context, bb_space)
+                            for group, _ in batch]
+                centers, sizes = convexhull.aabb_batch(
+                    coords, offsets, np.array([np.array(m) for m in matrices]))
+            for (group, _), mat, center, size in zip(
+                    batch, matrices, centers, sizes):
+                bb_mat = mat.to_4x4()
+                bb_mat.col[3][:3] = center
+                group.set_bb(bb_mat, Vector(size))
+        else:
+            results = convexhull.obb_per_group(coords, offsets)
+            for (group, _), (bb_mat, bb_scale) in zip(batch, results):
+                group.set_bb(bb_mat, bb_scale)
+
     def get_active(self, context):
         """activeな要素が含まれるGroupを返す。
         Activeな要素が複数のGroupに跨がる場合はその全てのGroupを返す。
@@ -1230,11 +1298,11 @@ class ObjectGroups(Groups):
         Group = self.Group
 
         if group_type == GroupType.NONE:
-            groups = [Group(context, (ob.name,))
+            groups = [Group(None, (ob.name,))
                       for ob in context.selected_objects]
 
         elif group_type == GroupType.ALL:
-            groups = [Group(context,
+            groups = [Group(None,
                             (ob.name for ob in context.selected_objects))]
 
         elif group_type == GroupType.PARENT_CHILD:
@@ -1242,7 +1310,7 @@ class ObjectGroups(Groups):
                 return (a.parent == b or b.parent == a or
                         b in a.children or a in b.children)
             objects = localutils.utils.groupwith(context.selected_objects, key)
-            groups = [Group(context, (ob.name for ob in obs))
+            groups = [Group(None, (ob.name for ob in obs))
                       for obs in objects]
 
         elif group_type == GroupType.GROUP:
@@ -1251,7 +1319,7 @@ class ObjectGroups(Groups):
             # def key(a, b):
             #     return a[1] & b[1]
             ob_list = localutils.utils.groupwith(seq, lambda a, b: a[1] & b[1])
-            groups = [Group(context, [elem[0] for elem in ls])
+            groups = [Group(None, [elem[0] for elem in ls])
                       for ls in ob_list]
 
         elif group_type == GroupType.BOUNDING_BOX:
@@ -1283,6 +1351,7 @@ class ObjectGroups(Groups):
 
         for ob in vaob.sorted_dependency(ob_vec.keys()):
             ob.matrix_world.col[3][:3] = coords[ob.name] + ob_vec[ob]
+        memocoords.bump_generation()
 
     def transform(self, context, matrices, reverse=False):
         if isinstance(matrices, list):
@@ -1299,6 +1368,7 @@ class ObjectGroups(Groups):
             mat = ob_mat[ob] * current_matrices[ob.name]
             for i in range(4):
                 ob.matrix_world.col[i][:] = mat.col[i]
+        memocoords.bump_generation()
 
 
 class BMeshGroups(Groups):
@@ -1322,17 +1392,18 @@ class BMeshGroups(Groups):
         bm = bmesh.from_edit_mesh(ob.data)
 
         if group_type == GroupType.NONE:
-            groups = [Group(context, (i,))
+            groups = [Group(None, (i,))
                       for i, v in enumerate(bm.verts) if v.select]
 
         elif group_type == GroupType.ALL:
-            groups = [Group(context,
+            groups = [Group(None,
                             (i for i, v in enumerate(bm.verts) if v.select))]
 
         elif group_type == GroupType.LINKED:
+            bm.verts.index_update()
             seq = vabm.linked_vertices_list(bm, select=True, hide=False)
             d = {v: i for i, v in enumerate(bm.verts)}
-            groups = [Group(context, (d[v] for v in verts))
+            groups = [Group(None, (d[v] for v in verts))
                       for verts in seq]
 
         elif group_type == GroupType.GROUP:
@@ -1342,7 +1413,7 @@ class BMeshGroups(Groups):
             seq = [(i, set(v[layer].keys()))
                    for i, v in enumerate(bm.verts) if v.select and not v.hide]
             v_list = localutils.utils.groupwith(seq, lambda a, b: a[1] & b[1])
-            groups = [Group(context, [elem[0] for elem in ls])
+            groups = [Group(None, [elem[0] for elem in ls])
                       for ls in v_list]
 
         elif group_type == GroupType.BOUNDING_BOX:
@@ -1496,7 +1567,7 @@ class EditBoneGroups(Groups):
             else:
                 raise ValueError()
 
-            group_list = [Group(context, ((b.name, i) for b, i in ls))
+            group_list = [Group(None, ((b.name, i) for b, i in ls))
                           for ls in bones_list]
 
         return group_list
@@ -1664,7 +1735,7 @@ class PoseBoneGroups(Groups):
             else:
                 raise ValueError()
 
-            group_list = [Group(context, (b.name for b in ls))
+            group_list = [Group(None, (b.name for b in ls))
                           for ls in bones_list]
 
         return group_list
@@ -24,6 +24,15 @@ import inspect as _inspect
 import collections as _collections
 import itertools as _itertools
 import types as _types
+import sys as _sys
+import weakref as _weakref
+import enum as _enum
+import time as _time
+
+try:
+    import mathutils as _mathutils
+except ImportError:
+    _mathutils = None
 
 
 if __name__ == '__main__':
@@ -47,13 +56,264 @@ class _self_cache:
     pass
 
 
+_missing = _void()
+
+
+def _sizeof(obj, _seen=None):
+    """オブジェクトのおおよそのメモリ使用量(byte)を返す。
+    コンテナは中身も再帰的に加算する。同一オブジェクトは一度だけ数える。
+    """
+    if _seen is None:
+        _seen = set()
+    i = id(obj)
+    if i in _seen:
+        return 0
+    _seen.add(i)
+    try:
+        size = _sys.getsizeof(obj)
+    except TypeError:
+        return 0
+    if isinstance(obj, (str, bytes, bytearray)):
+        pass
+    elif isinstance(obj, dict):
+        for k, v in obj.items():
+            size += _sizeof(k, _seen) + _sizeof(v, _seen)
+    elif isinstance(obj, (list, tuple, set, frozenset, _collections.deque)):
+        for v in obj:
+            size += _sizeof(v, _seen)
+    elif hasattr(obj, 'nbytes'):  # numpy.ndarray
+        size += getattr(obj, 'nbytes', 0)
+    return size
+
+
+def _digest_key(args, kw):
+    """pickleしてSHA-512を取る。旧来のキー。"""
+    dumped_args = _pickle.dumps((args, kw))
+    return _hashlib.sha512(dumped_args).hexdigest()
+
+
+class _DigestKey(str):
+    """ハッシュ化出来ない引数の代替キー"""
+    __slots__ = ()
+
+
+class _IdentityKey(tuple):
+    """登録された型のインスタンスのキー。(type, id)"""
+    __slots__ = ()
+
+
+# そのままキーに出来る型。functools.lru_cache(typed=True)と同様に
+# 1 == 1.0 == True を区別する為、キーには型も加える
+_RAW_TYPES = {int, float, bool, complex, str, bytes, type(None)}
+# 値をキーに変換する関数。 {type: function, ...}
+_KEY_CONVERTERS = {}
+# idをキーとする型。 Memoize.register_identity_type() で追加する
+_IDENTITY_TYPES = set()
+
+if _mathutils:
+    for _t in (_mathutils.Vector, _mathutils.Quaternion, _mathutils.Color):
+        _KEY_CONVERTERS[_t] = lambda v: (type(v), tuple(v))
+    _KEY_CONVERTERS[_mathutils.Euler] = \
+        lambda v: (_mathutils.Euler, tuple(v), v.order)
+    _KEY_CONVERTERS[_mathutils.Matrix] = \
+        lambda m: (_mathutils.Matrix, tuple(map(tuple, m)))
+    del _t
+
+
+def _items_key(values):
+    """要素毎のキーのタプルに、要素の型のタプルを連結して返す。"""
+    types = tuple(map(type, values))
+    if _RAW_TYPES.issuperset(types):
+        return tuple(values) + types
+    return tuple([_value_key(v) for v in values]) + types
+
+
+def _value_key(value):
+    """引数一つ分のキーを返す。値自体の型は呼び出し側で加える。
+    コンテナは中身のキーと型を、登録された型は(type, id)を、mathutilsの値は
+    タプルを用いる。それ以外でハッシュ化出来る物はそのままキーにし、
+    出来ない物のみpickle+SHA-512を用いる。
+    """
+    t = type(value)
+    if t in _RAW_TYPES:
+        return value
+    elif t is tuple:
+        return tuple, _items_key(value)
+    elif t in _IDENTITY_TYPES:
+        return _IdentityKey((t, id(value)))
+    elif t in _KEY_CONVERTERS:
+        return _KEY_CONVERTERS[t](value)
+    elif t is list:
+        return list, _items_key(value)
+    elif t in (frozenset, set):
+        return t, frozenset([(type(v), _value_key(v)) for v in value])
+    elif t is dict:
+        return dict, frozenset([((type(k), _value_key(k)),
+                                 (type(v), _value_key(v)))
+                                for k, v in value.items()])
+    try:
+        hash(value)
+    except TypeError:
+        return _DigestKey(_hashlib.sha512(_pickle.dumps(value)).hexdigest())
+    return value
+
+
+def _make_key(args, kw):
+    key = _items_key(args)
+    if kw:
+        key += (_void, tuple(sorted(
+            [(k, type(v), _value_key(v)) for k, v in kw.items()])))
+    return key
+
+
+class _Budget:
+    """全てのMemoizeで共有するメモリ予算。
+    maxbytesを超えたら全キャッシュの中で最も古いエントリから削除する。
+    """
+
+    def __init__(self):
+        self.maxbytes = None
+        self.nbytes = 0
+        self.evictions = 0
+        self.tick = _itertools.count()
+        self.caches = _weakref.WeakSet()
+
+    def enforce(self):
+        if self.maxbytes is None:
+            return
+        while self.nbytes > self.maxbytes:
+            oldest = None
+            oldest_tick = None
+            for cache in self.caches:
+                if cache.data:
+                    t = next(iter(cache.data.values()))[2]
+                    if oldest is None or t < oldest_tick:
+                        oldest = cache
+                        oldest_tick = t
+            if oldest is None:
+                break
+            oldest.pop_oldest()
+            self.evictions += 1
+
+
+_budget = _Budget()
+
+
+class _CacheStats:
+    """関数毎のキャッシュの設定と統計。
+    key_time, miss_timeは秒。miss_timeはキャッシュに無かった場合に
+    元の関数の実行に掛かった時間の合計。
+    """
+
+    def __init__(self, maxsize=None, maxbytes=None):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.evictions = 0
+        self.evicted_bytes = 0
+        self.reset()
+
+    def reset(self):
+        self.hits = 0
+        self.misses = 0
+        self.key_time = 0.0
+        self.miss_time = 0.0
+
+    def info(self, caches):
+        caches = list(caches)
+        return {'maxsize': self.maxsize,
+                'maxbytes': self.maxbytes,
+                'currsize': sum(len(c) for c in caches),
+                'nbytes': sum(c.nbytes for c in caches),
+                'evictions': self.evictions,
+                'evicted_bytes': self.evicted_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'key_time': self.key_time,
+                'miss_time': self.miss_time}
+
+
+class _LRUCache:
+    """maxsize, maxbytesで制限されたLRUキャッシュ。
+    エントリは {key: [value, nbytes, tick], ...}。
+    nbytesはmaxbytesかグローバル予算が設定されている場合にのみ計算する。
+    """
+
+    def __init__(self, stats):
+        self.data = _collections.OrderedDict()
+        self.stats = stats
+        self.nbytes = 0
+        _budget.caches.add(self)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def lookup(self, key):
+        try:
+            entry = self.data[key]
+        except KeyError:
+            return _missing
+        self.data.move_to_end(key)
+        entry[2] = next(_budget.tick)
+        return entry[0]
+
+    def store(self, key, value):
+        stats = self.stats
+        if stats.maxbytes is not None or _budget.maxbytes is not None:
+            nbytes = _sizeof(value)
+        else:
+            nbytes = 0
+        if key in self.data:
+            self._remove(key)
+        self.data[key] = [value, nbytes, next(_budget.tick)]
+        self.nbytes += nbytes
+        _budget.nbytes += nbytes
+
+        maxsize = stats.maxsize
+        maxbytes = stats.maxbytes
+        while self.data and (
+                maxsize is not None and len(self.data) > maxsize or
+                maxbytes is not None and self.nbytes > maxbytes):
+            self.pop_oldest()
+        _budget.enforce()
+
+    def _remove(self, key):
+        entry = self.data.pop(key)
+        self.nbytes -= entry[1]
+        _budget.nbytes -= entry[1]
+        return entry
+
+    def pop_oldest(self):
+        key = next(iter(self.data))
+        entry = self._remove(key)
+        self.stats.evictions += 1
+        self.stats.evicted_bytes += entry[1]
+
+    def clear(self):
+        _budget.nbytes -= self.nbytes
+        self.nbytes = 0
+        self.data.clear()
+
+    def __del__(self):
+        try:
+            _budget.nbytes -= self.nbytes
+        except Exception:
+            pass
+
+
 exec_template = """\
 def _memo_gen_func({wraps}=wraps,
                    {self}=self,
                    {function}=function,
                    {key}=key,
                    {cache}=cache,
-                   {self_id_instance}=self_id_instance):
+                   {stats}=stats,
+                   {lru_cache}=lru_cache,
+                   {missing}=missing,
+                   {register_instance}=register_instance,
+                   {timer}=timer):
     @{wraps}({function})
     def {function_name}{args}:
         if {use_instance}:
@@ -61,23 +321,32 @@ def _memo_gen_func({wraps}=wraps,
             try:
                 {current_cache} = {cache}[{id_of_instance}]
             except KeyError:
-                {current_cache} = {cache}[{id_of_instance}] = {{}}
-                {self_id_instance}[{id_of_instance}] = {args0}
+                {current_cache} = {cache}[{id_of_instance}] = \
+                    {lru_cache}({stats})
+                {register_instance}({id_of_instance}, {args0})
         else:
             {current_cache} = {cache}
 
+        {t} = {timer}()
         if {use_func_param}:  # use_func_param
             {k} = {key}({function}, {bind_string})
         else:
             {k} = {key}({bind_string})
+        {t2} = {timer}()
+        {stats}.key_time += {t2} - {t}
 
         if {self}.read:
-            if {k} in {current_cache}:
-                return {current_cache}[{k}]
+            {entry} = {current_cache}.lookup({k})
+            if {entry} is not {missing}:
+                {stats}.hits += 1
+                return {entry}
 
+        {stats}.misses += 1
+        {t} = {timer}()
         result = {function}({bind_string})
+        {stats}.miss_time += {timer}() - {t}
         if {self}.write:
-            {current_cache}[{k}] = result
+            {current_cache}.store({k}, result)
 
         return result
 
@@ -97,6 +366,7 @@ class Memoize:
     """デコレータとして使用。
     キャッシュは関数毎に独立している。
     use_instance引数を真にする事でインスタンス毎にも独立させる事が出来る。
+    インスタンスは弱参照で保持し、破棄された時点でそのキャッシュも削除する。
     デコレート前の関数は memoize.functions[function] で取得できる。
     memoize = Memoize()
     class Hoge:
@@ -129,21 +399,38 @@ class Memoize:
     @staticmethod
     def cache_key(*args, **kw):
         """キャッシュに格納する際のキーを作る。
-        >> key = pickle.dumps((('hoge', [0,1,2]), {'edit': True}))
-        >> key
-        "((S'hoge'\np0\n(lp1\nI0\naI1\naI2\natp2\n(dp3\nS'piyo'\np4\nI01\nstp5\n."
-        >> hashlib.sha1(key).hexdigest()
-        '6f30c538ee4f2a96911c79559d2ef754db11aebd'
+        引数をハッシュ化可能なタプルに変換し、引数の型を加える。
+        >> Memoize.cache_key('hoge', [0, 1], edit=True)
+        ('hoge', (<class 'list'>, (0, 1, <class 'int'>, <class 'int'>)),
+         <class 'str'>, <class 'list'>,
+         <class '_void'>, (('edit', <class 'bool'>, True),))
+        ハッシュ化出来る引数はそのまま用い、出来ない引数に限りpickleして
+        SHA-512を取る。
         """
-        dumped_args = _pickle.dumps((args, kw))
-        return _hashlib.sha512(dumped_args).hexdigest()
+        return _make_key(args, kw)
 
     @staticmethod
     def cache_key_ex(_func, *args, **kw):
-        dumped_args = _pickle.dumps((args, kw))
-        return _hashlib.sha512(dumped_args).hexdigest()
+        return _make_key(args, kw)
+
+    @staticmethod
+    def register_identity_type(cls):
+        """clsのインスタンスを値ではなくidでキーにする。
+        インスタンスが生存している間に限り有効なキーとなるので注意。
+        クラスデコレータとしても使える。
+        """
+        _IDENTITY_TYPES.add(cls)
+        return cls
 
-    def __init__(self, key=None, use_instance=False, use_func_param=False):
+    @staticmethod
+    def register_key_converter(cls, converter):
+        """clsのインスタンスをキーに変換する関数を登録する。
+        :type converter: (T) -> collections.abc.Hashable
+        """
+        _KEY_CONVERTERS[cls] = converter
+
+    def __init__(self, key=None, use_instance=False, use_func_param=False,
+                 maxsize=None, maxbytes=None):
         """
         :param key: 辞書のキーを返す関数。引数はデコレート対象の関数に合わせる
         :type key: types.FunctionType -> T
@@ -153,17 +440,28 @@ class Memoize:
         :param use_func_param: key関数の引数の最初にデコレート対象の
             関数オブジェクトを渡す
         :type use_func_param: bool
+        :param maxsize: キャッシュのエントリ数の上限。超えたら最も古く参照された
+            物から削除する(LRU)。use_instanceが真ならインスタンス毎の上限。
+            Noneで無制限。
+        :type maxsize: int | None
+        :param maxbytes: キャッシュの推定メモリ使用量の上限。maxsizeと同様。
+        :type maxbytes: int | None
         :rtype: types.FunctionType
         """
 
         self.key = key
         self.use_func_param = use_func_param
         self.use_instance = use_instance
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
 
-        self.id_instance = {}  # {id(instance): instance, ...}
+        # {id(instance): weakref.ref(instance), ...}
+        # weakrefに対応していない型はインスタンスをそのまま保持する
+        self.id_instance = {}
         self.func_cache = {}  # {ラップ前の関数: cache, ...}
         self.func_instance_cache = {}  # {ラップ前の関数: {id: cache, ...}, ...}
         self.functions = {}  # {ラップ済み: ラップ前, ...}
+        self.func_stats = {}  # {ラップ前の関数: _CacheStats, ...}
 
         # キャッシュからの読み込み・書き込みを一時的に切り替える。
         # 但しclear()時には無視される。
@@ -171,12 +469,14 @@ class Memoize:
         self.write = True
         # TODO: self毎にread, writeを切り替え出来るようにする
 
-    def __call__(self, key=_void, use_instance=_void, use_func_param=_void):
+    def __call__(self, key=_void, use_instance=_void, use_func_param=_void,
+                 maxsize=_void, maxbytes=_void):
         def _memoize(function):
             """ラップ後の関数の引数をラップ前のそれと同じにする為、ちょっと
             面倒な事をする
             """
             nonlocal self, key, use_func_param, use_instance  # local変数/global変数に存在しないから
+            nonlocal maxsize, maxbytes
 
             is_user_defined = hasattr(function, '__globals__')
             try:
@@ -188,8 +488,10 @@ class Memoize:
             wraps = _functools.wraps
 
             kw = {name: name for name in
-                  ('wraps', 'self', 'function', 'key', 'cache',
-                   'self_id_instance', 'id_of_instance', 'current_cache', 'k')}
+                  ('wraps', 'self', 'function', 'key', 'cache', 'stats',
+                   'lru_cache', 'missing', 'register_instance', 'timer',
+                   'id_of_instance', 'current_cache', 'k', 'entry',
+                   't', 't2')}
 
             # 関数名と引数
             if is_user_defined:
@@ -223,13 +525,21 @@ class Memoize:
                     key = self.cache_key
 
             # cache
+            if maxsize is _void:
+                maxsize = self.maxsize
+            if maxbytes is _void:
+                maxbytes = self.maxbytes
+            stats = self.func_stats[function] = _CacheStats(maxsize, maxbytes)
+            lru_cache = _LRUCache
+            missing = _missing
             if use_instance is _void:
                 use_instance = self.use_instance
             if use_instance:
                 cache = self.func_instance_cache[function] = {}
             else:
-                cache = self.func_cache[function] = {}
-            self_id_instance = self.id_instance
+                cache = self.func_cache[function] = _LRUCache(stats)
+            register_instance = self._register_instance
+            timer = _time.perf_counter
 
             # 関数の生成
             exec_string = exec_template.format(
@@ -253,13 +563,146 @@ class Memoize:
         return _memoize
 
     @classmethod
-    def memoize(cls, key=None, use_instance=False, use_func_param=False):
+    def memoize(cls, key=None, use_instance=False, use_func_param=False,
+                maxsize=None, maxbytes=None):
         inst = cls(key=key,
                    use_instance=use_instance,
-                   use_func_param=use_func_param)
+                   use_func_param=use_func_param,
+                   maxsize=maxsize,
+                   maxbytes=maxbytes)
 
         return inst()
 
+    @staticmethod
+    def set_global_maxbytes(maxbytes):
+        """全てのMemoizeで共有するメモリ予算を設定する。Noneで無制限。
+        超過分は直ちに削除される。
+        """
+        _budget.maxbytes = maxbytes
+        _budget.enforce()
+
+    @staticmethod
+    def global_info():
+        """全てのMemoizeで共有するメモリ予算の状態を返す。
+        :rtype: dict
+        """
+        return {'maxbytes': _budget.maxbytes,
+                'nbytes': _budget.nbytes,
+                'evictions': _budget.evictions}
+
+    def _function_caches(self, function):
+        if function in self.func_cache:
+            return [self.func_cache[function]]
+        elif function in self.func_instance_cache:
+            return list(self.func_instance_cache[function].values())
+        else:
+            return []
+
+    def cache_info(self, function=None):
+        """キャッシュの設定と削除数等を返す。
+        :param function: ラップ済みかラップ前の関数。Noneなら全ての関数。
+        :return: functionを指定した場合は
+            {'maxsize': int, 'maxbytes': int, 'currsize': int,
+             'nbytes': int, 'evictions': int, 'evicted_bytes': int,
+             'hits': int, 'misses': int, 'key_time': float,
+             'miss_time': float}
+            そうでなければ {ラップ前の関数: 上記の辞書, ...}
+            key_time, miss_timeは秒。
+        :rtype: dict
+        """
+        if function is None:
+            return {f: self.cache_info(f) for f in self.func_stats}
+        function = self._unwrap(function)
+        stats = self.func_stats[function]
+        return stats.info(self._function_caches(function))
+
+    def _unwrap(self, function):
+        if isinstance(function, _types.MethodType):
+            function = function.__func__
+        if isinstance(function, property):
+            function = function.fget
+        return self.functions.get(function, function)
+
+    def reset_stats(self, function=None):
+        """hits, misses, key_time, miss_timeを0に戻す。
+        :param function: ラップ済みかラップ前の関数。Noneなら全ての関数。
+        """
+        if function is None:
+            for stats in self.func_stats.values():
+                stats.reset()
+        else:
+            self.func_stats[self._unwrap(function)].reset()
+
+    def report(self, sort='total', file=None):
+        """関数毎の統計を表にして出力する。
+        saved列はヒット時に省けた推定時間(平均計算時間 * hits)から
+        キー生成の時間を引いた物。負ならキャッシュは割に合っていない。
+        :param sort: 'total', 'saved', 'hits', 'misses', 'name' の何れか。
+        :param file: 出力先。Noneならsys.stdout。
+        :return: 出力した文字列
+        :rtype: str
+        """
+        rows = []
+        for function, info in self.cache_info().items():
+            calls = info['hits'] + info['misses']
+            if info['misses']:
+                avg = info['miss_time'] / info['misses']
+            else:
+                avg = 0.0
+            saved = avg * info['hits'] - info['key_time']
+            total = info['key_time'] + info['miss_time']
+            name = getattr(function, '__qualname__', repr(function))
+            rows.append((name, calls, info, total, saved))
+
+        if sort == 'name':
+            rows.sort(key=lambda r: r[0])
+        elif sort == 'saved':
+            rows.sort(key=lambda r: r[4])
+        elif sort in ('hits', 'misses'):
+            rows.sort(key=lambda r: r[2][sort], reverse=True)
+        else:
+            rows.sort(key=lambda r: r[3], reverse=True)
+
+        fmt = '{:<40} {:>8} {:>8} {:>8} {:>6} {:>10} {:>10} {:>10}'
+        lines = [fmt.format('function', 'calls', 'hits', 'misses', 'size',
+                            'key(ms)', 'miss(ms)', 'saved(ms)')]
+        for name, calls, info, total, saved in rows:
+            lines.append(fmt.format(
+                name[-40:], calls, info['hits'], info['misses'],
+                info['currsize'],
+                '{:.3f}'.format(info['key_time'] * 1000),
+                '{:.3f}'.format(info['miss_time'] * 1000),
+                '{:.3f}'.format(saved * 1000)))
+        text = '\n'.join(lines)
+        print(text, file=file if file is not None else _sys.stdout)
+        return text
+
+    def _register_instance(self, id_of_instance, instance):
+        """instanceが破棄された時にそのキャッシュを削除するよう登録する"""
+        if id_of_instance in self.id_instance:
+            return
+
+        def callback(ref, id_of_instance=id_of_instance):
+            if self.id_instance.get(id_of_instance) is ref:
+                self._forget_instance(id_of_instance)
+
+        try:
+            ref = _weakref.ref(instance, callback)
+        except TypeError:
+            ref = instance  # 従来通り強参照で保持する
+        self.id_instance[id_of_instance] = ref
+
+    def _get_instance(self, id_of_instance):
+        ref = self.id_instance[id_of_instance]
+        if isinstance(ref, _weakref.ref):
+            return ref()
+        return ref
+
+    def _forget_instance(self, id_of_instance):
+        for cache in self.func_instance_cache.values():
+            cache.pop(id_of_instance, None)
+        self.id_instance.pop(id_of_instance, None)
+
     def clear(self, obj=None):
         """キャッシュをクリアする。
         :param obj: 削除対象の関数を指定する。use_instanceが真の場合にメソッド、
@@ -288,8 +731,8 @@ class Memoize:
         if slf is not None:
             remove_ids = {id(slf)}
         elif cls is not None:
-            remove_ids = {i for i, s in self.id_instance.items()
-                          if isinstance(s, cls)}
+            remove_ids = {i for i in self.id_instance
+                          if isinstance(self._get_instance(i), cls)}
         else:
             remove_ids = set()
 
@@ -393,6 +836,17 @@ def _test():
     assert b == hoge1.func_b('B')
     assert c != hoge2.func_a('C')
 
+    # weakref test
+    import gc
+    hoge3 = Hoge()
+    hoge3.func_a('W')
+    i = id(hoge3)
+    assert i in memoize.id_instance
+    del hoge3
+    gc.collect()
+    assert i not in memoize.id_instance
+    assert all(i not in c for c in memoize.func_instance_cache.values())
+
     # clear test: all
     a = hoge1.func_a('A')
     b = hoge1.func_b('B')
@@ -402,6 +856,119 @@ def _test():
     assert b != hoge1.func_b('B')
     assert c != hoge2.func_a('C')
 
+    # maxsize test
+    @memoize(key=lambda a: a, maxsize=2)
+    def func_c(a):
+        import random
+        return random.randint(-1000, 1000)
+
+    a = func_c('A')
+    b = func_c('B')
+    assert a == func_c('A')  # 'B'が最も古くなる
+    func_c('C')
+    assert memoize.cache_info(func_c)['currsize'] == 2
+    assert memoize.cache_info(func_c)['evictions'] == 1
+    assert a == func_c('A')
+    assert b != func_c('B')
+
+    # maxbytes test
+    @memoize(key=lambda n: n, maxbytes=4096)
+    def func_d(n):
+        return list(range(n))
+
+    for i in range(100):
+        func_d(10 + i)
+    info = memoize.cache_info(func_d)
+    assert 0 < info['nbytes'] <= 4096
+    assert info['evictions'] > 0
+
+    # global budget test
+    Memoize.set_global_maxbytes(2048)
+    assert Memoize.global_info()['nbytes'] <= 2048
+    for i in range(10):
+        func_d(20 + i)
+    assert Memoize.global_info()['nbytes'] <= 2048
+    Memoize.set_global_maxbytes(None)
+
+    # stats test
+    memoize.reset_stats()
+    func_c('X')
+    func_c('X')
+    func_c('X')
+    info = memoize.cache_info(func_c)
+    assert info['hits'] == 2 and info['misses'] == 1
+    assert info['key_time'] > 0 and info['miss_time'] > 0
+    hoge1.func_a('S')
+    hoge1.func_a('S')
+    info = memoize.cache_info(hoge1.func_a)
+    assert info['hits'] == 1 and info['misses'] == 1
+    import io
+    text = memoize.report(file=io.StringIO())
+    assert 'func_c' in text
+    memoize.reset_stats(func_c)
+    assert memoize.cache_info(func_c)['hits'] == 0
+
+
+def _test_cache_key():
+    class E(_enum.Enum):
+        A = 1
+
+    class Ident:
+        pass
+
+    key = Memoize.cache_key
+    assert key(1, 'a') == key(1, 'a')
+    assert key(1) != key(1.0) != key(True)
+    assert key((1, 2)) != key((1.0, 2)) != key([1, 2])
+    assert key([1, [2]]) == key([1, [2]])
+    assert key([1, [2]]) != key([1, [2.0]])
+    assert key({1}) != key({1.0})
+    assert key({'a': 1}) != key({'a': True})
+    assert key(E.A) == key(E.A)
+    assert key(E.A)[0] is E.A
+    assert key(a=1, b=2) == key(b=2, a=1)
+    assert key(a=1) != key(a=1.0)
+    assert key(1, b=2) != key(1, 2)
+    assert isinstance(key(bytearray(b'a'))[0], _DigestKey)
+    hash(key({'a': [1]}, {1, 2}, None, bytearray(b'a')))
+
+    Memoize.register_identity_type(Ident)
+    i1 = Ident()
+    i2 = Ident()
+    assert key(i1) == key(i1)
+    assert key(i1) != key(i2)
+    _IDENTITY_TYPES.discard(Ident)
+
+
+class _BenchEnum(_enum.Enum):
+    A = 1
+
+
+def _bench_cache_key(number=100000):
+    """キーの生成に掛かる時間を旧来のpickle+SHA-512と比較する"""
+    import timeit
+
+    E = _BenchEnum
+    samples = [
+        ('primitives', ('scene', 1, 2.5, True, None), {}),
+        ('enum+kw', (E.A, 'name'), {'select': True}),
+        ('nested', (('a', 'b'), (1.0, 2.0, 3.0), [0, 1, 2]), {}),
+    ]
+    if _mathutils:
+        samples.append(
+            ('mathutils', (_mathutils.Matrix.Identity(4),
+                           _mathutils.Vector((1, 2, 3))), {}))
+    print('{:<12} {:>12} {:>12} {:>8}'.format(
+        'args', 'digest(us)', 'struct(us)', 'ratio'))
+    for name, args, kw in samples:
+        t_old = timeit.timeit(lambda: _digest_key(args, kw), number=number)
+        t_new = timeit.timeit(lambda: _make_key(args, kw), number=number)
+        print('{:<12} {:>12.3f} {:>12.3f} {:>8.2f}'.format(
+            name, t_old / number * 1e6, t_new / number * 1e6, t_old / t_new))
+
 
 if __name__ == '__main__':
     _test()
+    _test_cache_key()
+    if 'bench' in _sys.argv:
+        _bench_cache_key()
@@ -34,7 +34,8 @@ except:
 import tempfile, os, cProfile, pstats
 
 
-__all__ = ('flatten', 'groupwith', 'xproperty', 'find_brackets',
+__all__ = ('flatten', 'groupwith', 'UnionFind', 'bounds_overlap_pairs',
+           'xproperty', 'find_brackets',
            'generate_signature_bind_function',
            'generate_signature_bind_string',
            'generate_function',
@@ -75,8 +76,78 @@ def flatten(sequence, to_expand=_is_iterable, dimension=0):
             yield item
 
 
-def groupwith(iterable, key=None, data=None, order=None):
+class UnionFind:
+    """素集合データ構造。要素は0からn-1の整数"""
+
+    def __init__(self, n):
+        self.parent = list(range(n))
+        self.rank = [0] * n
+
+    def find(self, i):
+        parent = self.parent
+        root = i
+        while parent[root] != root:
+            root = parent[root]
+        while parent[i] != root:  # 経路圧縮
+            parent[i], i = root, parent[i]
+        return root
+
+    def union(self, i, j):
+        """iとjの集合を結合する。既に同じ集合なら偽を返す"""
+        ri = self.find(i)
+        rj = self.find(j)
+        if ri == rj:
+            return False
+        if self.rank[ri] < self.rank[rj]:
+            ri, rj = rj, ri
+        self.parent[rj] = ri
+        if self.rank[ri] == self.rank[rj]:
+            self.rank[ri] += 1
+        return True
+
+    def groups(self):
+        """各集合の要素のリスト。集合は最小の要素順、要素は昇順に並ぶ
+        :rtype: list[list[int]]
+        """
+        groups = {}
+        result = []
+        for i in range(len(self.parent)):
+            root = self.find(i)
+            if root in groups:
+                groups[root].append(i)
+            else:
+                group = groups[root] = [i]
+                result.append(group)
+        return result
+
+
+def bounds_overlap_pairs(mins, maxs):
+    """境界ボックスが重なる(接する場合を含む)インデックスの組を返す。
+    最初の軸でソートして走査するので、全ての組を調べるより遥かに少ない。
+    groupwith()のcandidatesに用いる。
+    :param mins: 各要素の最小値のシーケンス。[(x, y, z), ...]
+    :param maxs: 各要素の最大値のシーケンス
+    :rtype: types.GeneratorType
+    """
+    order = sorted(range(len(mins)), key=lambda i: mins[i][0])
+    active = []
+    for i in order:
+        lo = mins[i]
+        hi = maxs[i]
+        active = [j for j in active if maxs[j][0] >= lo[0]]
+        for j in active:
+            if all(mins[j][k] <= hi[k] and lo[k] <= maxs[j][k]
+                   for k in range(1, len(lo))):
+                yield (j, i) if j < i else (i, j)
+        active.append(i)
+
+
+def groupwith(iterable, key=None, data=None, order=None, adjacency=None,
+              candidates=None):
     """key関数の結果に従ってグループ化する。並び順は保証される。
+    グループ内はインデックス順に並ぶ。グループはkeyで判定する場合は
+    最初に見つかった順(二つのグループが結合した時は要素数の多い方の位置)に、
+    adjacencyを指定した場合は最小のインデックス順に並ぶ。
     :param iterable: 対象のシーケンス。
     :type iterable: collections.abc.Iterable
     :param key: 比較用の関数。引数を二つ取って真偽値を返す。key(A, B)。
@@ -85,6 +156,14 @@ def groupwith(iterable, key=None, data=None, order=None):
     :param data: None以外ならkey関数に引数として渡す。key(A, B, data)
     :param order: このリストの中身を並び順を表すインデックスで更新する
     :type order: list
+    :param adjacency: 各要素に隣接する要素のインデックスを表す。
+        adjacency[i] -> [j, ...]。指定するとkeyは用いずに連結成分を求める
+        (O(V+E))。片方向のみの記述でも良い。
+    :type adjacency: collections.abc.Sequence | dict
+    :param candidates: keyで判定する要素の組(i, j)を返すイテラブル、若しくは
+        シーケンスを受け取ってそれを返す関数。空間的に近い物のみを
+        調べる場合に用いる。Noneなら全ての組を調べる(O(n^2))。
+    :type candidates: collections.abc.Iterable | types.FunctionType
     :return: 二次元リスト
     :rtype: list
 
@@ -97,75 +176,75 @@ def groupwith(iterable, key=None, data=None, order=None):
     indices
     >> [[0, 3], [1, 2]]
     """
-    # if isinstance(iterable, types.GeneratorType):
-    #     seq = tuple(iterable)
-    # else:
-    #     seq = iterable
     seq = tuple(iterable)
+    n = len(seq)
 
-    if len(seq) == 0:
+    if n <= 1:
+        indices = [[0]] if n else []
         if order is not None:
-            order[:] = []
-        return []
-    elif len(seq) == 1:
-        if order is not None:
-            order[:] = [[0]]
-        return [[seq[0]]]
-
-
-    if key is None:
-        key = lambda a, b: a == b
-        data = None
-
-    indices = deque()
-    dic = {}
-    for i, j in itertools.combinations(range(len(seq)), 2):
-        if data is not None:
-            is_same_group = key(seq[i], seq[j], data)
+            order[:] = indices
+        return [[seq[i] for i in group] for group in indices]
+
+    uf = UnionFind(n)
+    union = uf.union
+    # 旧実装と同じ並び順にする為、集合毎に順位と要素数を記録する。
+    # 結合後の集合は要素数の多い方(同数ならiの方)の順位を引き継ぐ
+    positions = list(range(n))
+    sizes = [1] * n
+    if adjacency is not None:
+        if isinstance(adjacency, dict):
+            items = adjacency.items()
         else:
-            is_same_group = key(seq[i], seq[j])
-        if is_same_group:
-            if i in dic and j in dic:
-                # groupの結合。前側のgroupに後側のgroupの要素を追加した後で
-                # 後側のgroupを消す。
-                group_i = dic[i]
-                group_j = dic[j]
-                if group_i is not group_j:
-                    if len(group_j) > len(group_i):
-                        group_i, group_j = group_j, group_i
-                    group_i.extend(group_j)
-                    # indices.remove(group_j)だと == で要素を比較する為不適
-                    for k, g in enumerate(indices):
-                        if g is group_j:
-                            break
-                    indices.rotate(-k)
-                    indices.popleft()
-                    indices.rotate(k)
-                    for m in group_j:
-                        dic[m] = group_i
-            elif i in dic:
-                dic[i].append(j)
-                dic[j] = dic[i]
-            elif j in dic:
-                dic[j].append(i)
-                dic[i] = dic[j]
+            items = enumerate(adjacency)
+        for i, linked in items:
+            for j in linked:
+                union(i, j)
+    else:
+        if candidates is None:
+            if key is None:
+                # ハッシュ可能なら辞書で纏める
+                try:
+                    first = {}
+                    for i, elem in enumerate(seq):
+                        j = first.setdefault(elem, i)
+                        union(j, i)
+                        positions[uf.find(j)] = j
+                except TypeError:
+                    uf = UnionFind(n)
+                    union = uf.union
+                    positions = list(range(n))
+                else:
+                    candidates = ()
+            if candidates is None:
+                candidates = itertools.combinations(range(n), 2)
+        elif callable(candidates):
+            candidates = candidates(seq)
+        if key is None:
+            key = lambda a, b: a == b
+            data = None
+        find = uf.find
+        for i, j in candidates:
+            ri = find(i)
+            rj = find(j)
+            if ri == rj:
+                continue
+            if data is not None:
+                is_same_group = key(seq[i], seq[j], data)
             else:
-                group = [i, j]
-                indices.append(group)
-                dic[i] = dic[j] = group
-        else:
-            if i not in dic:
-                group = [i]
-                indices.append(group)
-                dic[i] = group
-            if j not in dic:
-                group = [j]
-                indices.append(group)
-                dic[j] = group
-
-    for group in indices:
-        group.sort()
-
+                is_same_group = key(seq[i], seq[j])
+            if is_same_group:
+                if sizes[rj] > sizes[ri]:
+                    position = positions[rj]
+                else:
+                    position = positions[ri]
+                union(i, j)
+                root = find(i)
+                positions[root] = position
+                sizes[root] = sizes[ri] + sizes[rj]
+
+    indices = uf.groups()
+    if adjacency is None:
+        indices.sort(key=lambda group: positions[uf.find(group[0])])
     if order is not None:
         order[:] = indices
 
@@ -1028,6 +1107,21 @@ def test_groupwith():
         return a in data[b] or b in data[a]
     eq_(groupwith(ls, func, data), [[0, 1, 2, 3]])
 
+    ls = []
+    adjacency = {0: [3], 1: [], 2: [1], 3: []}
+    eq_(groupwith('abcd', adjacency=adjacency, order=ls),
+        [['a', 'd'], ['b', 'c']])
+    eq_(ls, [[0, 3], [1, 2]])
+
+    eq_(groupwith([3, 1, 3, 2, 1]), [[3, 3], [1, 1], [2]])
+
+    mins = [(0, 0), (5, 5), (0.5, 0.5), (9, 9)]
+    maxs = [(1, 1), (6, 6), (2, 2), (10, 10)]
+    pairs = list(bounds_overlap_pairs(mins, maxs))
+    eq_(pairs, [(0, 2)])
+    eq_(groupwith(range(4), lambda a, b: True, candidates=pairs),
+        [[0, 2], [1], [3]])
+
 
 def test_generate_signature_bind_string():
     import inspect
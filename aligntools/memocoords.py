@@ -18,6 +18,9 @@
 
 
 from collections import OrderedDict
+from itertools import chain
+
+import numpy as np
 
 import bpy
 import bmesh
@@ -39,6 +42,42 @@ checkargs = CheckArgs(True)
 tool_data = tooldata.tool_data
 memoize = tool_data.memoize
 
+# 視点の行列をキーに含む為、modal中は視点の変更毎にエントリが増える
+CACHE_MAXSIZE = 16
+
+# Objectが変更される度に増える。object_coords, object_matricesのキーに使う
+_object_generation = 0
+# scene_update_postで比べるObjectの数等。変わればbump_generation()する
+_object_layout = None
+
+
+def bump_generation():
+    """Objectのキャッシュを無効にする。
+    スクリプトからObject.matrix_world等を変更した場合は、次の
+    scene_update_postを待たずに呼び出すこと。
+    """
+    global _object_generation
+    _object_generation += 1
+
+
+def _scene_object_layout(scene):
+    """Objectの追加・削除、レイヤーの切り替え、アクティブの変更を検出する為の
+    値。Objectの数に依らず一定の時間で求まるものに限る。
+    :rtype: tuple
+    """
+    active = scene.objects.active
+    return (len(bpy.data.objects), len(scene.objects), tuple(scene.layers),
+            active.as_pointer() if active else 0)
+
+
+@bpy.app.handlers.persistent
+def scene_update_post(scene):
+    global _object_layout
+    layout = _scene_object_layout(scene)
+    if bpy.data.objects.is_updated or layout != _object_layout:
+        _object_layout = layout
+        bump_generation()
+
 
 def flatten(seq):
     if isinstance(seq, Matrix):
@@ -47,14 +86,19 @@ def flatten(seq):
         return tuple(seq)
 
 
+def region_projector(context):
+    """
+    :type context: bpy.types.Context
+    :rtype: vav.RegionProjector
+    """
+    return vav.region_projector(context.region, context.region_data)
+
+
 def project_v3_list(context, coords):
-    """world座標からregion座標へ。ジェネレーター"""
-    region = context.region
-    rv3d = context.region_data
-    sx, sy = region.width, region.height
-    mat = rv3d.perspective_matrix
-    func = vav.project_v3
-    return (func(sx, sy, mat, v) for v in coords)
+    """world座標からregion座標へ。一度の行列積で纏めて変換する。
+    :rtype: list[Vector]
+    """
+    return region_projector(context).project_vectors(list(coords))
 
 
 def plane_to_tuple(plane):
@@ -85,18 +129,37 @@ def memo_append_mat(key, context, space, ob=None):
 ###############################################################################
 # Object
 ###############################################################################
-def _memo_object_coords(context, space=Space.GLOBAL, select=None):
+def _memo_object_coords(context, space=Space.GLOBAL, select=None,
+                        objects=None):
+    """キーはObjectの数に依らない。Objectの変更はscene_update_post()で
+    _object_generationに反映する。
+    NOTE: アクティブが変わらない選択の変更やObject.hideの変更は
+    Object.is_updatedに現れないので検出できない。selectを指定して
+    呼び出す場合は、事前にbump_generation()を呼ぶこと。
+    :param objects: 未使用。_memo_object_coords_flatten()と引数を揃える
+    """
     space = Space.get(space)
+    key = (context.scene.name, space, select, _object_generation)
+    key = memo_append_mat(key, context, space)
+    return key
+
+
+def _memo_object_coords_flatten(context, space=Space.GLOBAL, select=None,
+                                objects=None):
+    """全Objectの行列を並べる旧来のキー。ベンチマーク用"""
+    space = Space.get(space)
+    if objects is None:
+        objects = bpy.data.objects
     key = (context.scene.name, space, select)
     if space != Space.LOCAL:
-        key += tuple((flatten(ob.matrix_world) for ob in bpy.data.objects
+        key += tuple((flatten(ob.matrix_world) for ob in objects
                       if select is None or
                       ob.is_visible(context.scene) and ob.select == select))
     key = memo_append_mat(key, context, space)
     return key
 
 
-@memoize(_memo_object_coords)
+@memoize(_memo_object_coords, maxsize=CACHE_MAXSIZE)
 def object_coords(context, space=Space.GLOBAL, select=None):
     """複数のObjectの座標を返す。
     spaceがSpace.LOCALの場合、全てのオブジェクトの座標は[0, 0, 0]となる。
@@ -123,10 +186,9 @@ def object_coords(context, space=Space.GLOBAL, select=None):
         for v in coords.values():
             v[:] = mat * v
     elif space == Space.REGION:
-        sx, sy = context.region.width, context.region.height
-        mat = context.region_data.perspective_matrix
-        for v in coords.values():
-            v[:] = vav.project_v3(sx, sy, mat, v)
+        vecs = project_v3_list(context, coords.values())
+        for v, vec in zip(coords.values(), vecs):
+            v[:] = vec
     elif space == Space.PLANE:
         mat = tool_data.plane.to_matrix().inverted()
         for v in coords.values():
@@ -136,7 +198,7 @@ def object_coords(context, space=Space.GLOBAL, select=None):
     return coords
 
 
-@memoize(_memo_object_coords)
+@memoize(_memo_object_coords, maxsize=CACHE_MAXSIZE)
 def object_matrices(context, space=Space.GLOBAL, select=None):
     """複数のObjectの行列を返す。
     coordinate_systemが'local'の場合、
@@ -181,7 +243,7 @@ def _memo_dm_vert_coords_ex(context, ob, space=Space.GLOBAL,
     return key
 
 
-@memoize(_memo_dm_vert_coords_ex)
+@memoize(_memo_dm_vert_coords_ex, maxsize=CACHE_MAXSIZE)
 def dm_vert_coords_ex(context, ob, space=Space.GLOBAL,
                       apply_modifiers=True, settings='PREVIEW',
                       calc_tessface=True, calc_undeformed=False):
@@ -235,7 +297,7 @@ def _memo_dm_vert_coords(context, ob, space=Space.GLOBAL,
     return key
 
 
-@memoize(_memo_dm_vert_coords)
+@memoize(_memo_dm_vert_coords, maxsize=CACHE_MAXSIZE)
 def dm_vert_coords(context, ob, space=Space.GLOBAL, settings='PREVIEW'):
     """
     :type context: bpy.types.Context
@@ -257,7 +319,7 @@ def _memo_bm_vert_coords(context, ob, space=Space.GLOBAL, select=None):
     return key
 
 
-@memoize(_memo_bm_vert_coords)
+@memoize(_memo_bm_vert_coords, maxsize=CACHE_MAXSIZE)
 def bm_vert_coords(context, ob, space=Space.GLOBAL, select=None):
     """BMeshの頂点の座標を返す。
     :type context: bpy.types.Context
@@ -309,7 +371,7 @@ def _memo_bm_vert_normals(context, ob, space=Space.GLOBAL,
     return key
 
 
-@memoize(_memo_bm_vert_normals)
+@memoize(_memo_bm_vert_normals, maxsize=CACHE_MAXSIZE)
 def bm_vert_normals(context, ob, space=Space.GLOBAL, select=None):
     """BMeshの頂点の法線を返す。
     :type context: bpy.types.Context
@@ -354,6 +416,158 @@ def bm_vert_normals(context, ob, space=Space.GLOBAL, select=None):
     return coords
 
 
+###############################################################################
+# NumPy
+###############################################################################
+def transform_np(mat, coords, normals=False):
+    """(N, 3)の配列に行列を掛けた新しい配列を返す。
+    :type mat: Matrix
+    :type coords: numpy.ndarray
+    :param normals: 真なら3x3部分のみ用いて結果を正規化する
+    :rtype: numpy.ndarray
+    """
+    m = np.array(mat, dtype=coords.dtype)
+    result = np.dot(coords, m[:3, :3].T)
+    if normals:
+        lengths = np.sqrt(np.einsum('ij,ij->i', result, result))
+        lengths[lengths == 0.0] = 1.0
+        result /= lengths[:, np.newaxis]
+    else:
+        result += m[:3, 3]
+    return result
+
+
+def space_transform_np(context, coords, space, ob=None):
+    """Space.LOCALの座標の配列(ob指定時)、若しくはSpace.GLOBALの座標の配列
+    (ob未指定時)をspaceへ変換する。
+    :type coords: numpy.ndarray
+    :type space: Space
+    :type ob: bpy.types.Object
+    :rtype: numpy.ndarray
+    """
+    if space == Space.LOCAL:
+        return coords
+    if space == Space.VIEW:
+        mat = context.region_data.view_matrix
+    elif space == Space.PLANE:
+        mat = tool_data.plane.to_matrix().inverted()
+    elif space in {Space.GLOBAL, Space.REGION}:
+        mat = None
+    else:
+        raise ValueError()
+    if ob:
+        if mat is None:
+            mat = ob.matrix_world
+        else:
+            mat = mat * ob.matrix_world
+    if mat is not None:
+        coords = transform_np(mat, coords)
+    if space == Space.REGION:
+        coords = region_projector(context).project(coords)
+    return coords
+
+
+def _mesh_vert_attr_np(mesh, attr):
+    arr = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get(attr, arr)
+    return arr.reshape((-1, 3)).astype(np.float64)
+
+
+def _vert_attr_np(context, ob, attr, select=None):
+    """頂点のco又はnormalを(N, 3)の配列で返す。
+    エディットモードではob.update_from_editmode()でMeshへ書き出さず、
+    BMeshから直接読む。行の並びはBMVertSeqと同じ。
+    :param select: 真なら選択要素のみ返す。偽なら表示中の非選択要素
+    :rtype: numpy.ndarray
+    """
+    if context.mode == 'EDIT_MESH':
+        verts = bmesh.from_edit_mesh(ob.data).verts
+        arr = np.fromiter(
+            chain.from_iterable((*getattr(v, attr), v.select, v.hide)
+                                for v in verts),
+            np.float64, len(verts) * 5).reshape((-1, 5))
+        values = arr[:, :3]
+        sel = arr[:, 3].astype(bool)
+        hide = arr[:, 4].astype(bool)
+    else:
+        mesh = ob.data
+        values = _mesh_vert_attr_np(mesh, attr)
+        if select is None:
+            return values
+        num = len(mesh.vertices)
+        sel = np.empty(num, dtype=bool)
+        hide = np.empty(num, dtype=bool)
+        mesh.vertices.foreach_get('select', sel)
+        mesh.vertices.foreach_get('hide', hide)
+    if select is None:
+        return values
+    return values[(sel if select else ~sel) & ~hide]
+
+
+@memoize(_memo_dm_vert_coords, maxsize=CACHE_MAXSIZE)
+def dm_vert_coords_np(context, ob, space=Space.GLOBAL, settings='PREVIEW'):
+    """dm_vert_coordsの配列版。
+    :type context: bpy.types.Context
+    :type ob: bpy.types.Object
+    :param space: GLOBAL, LOCAL, VIEW, REGION, PLANE
+    :type space: Space | str
+    :type settings: str
+    :return: shapeは(N, 3)。行は頂点のインデックス順
+    :rtype: numpy.ndarray
+    """
+    if ob.type not in {'MESH', 'CURVE', 'SURFACE', 'META', 'FONT'}:
+        return None
+
+    space = Space.get(space)
+    mesh = ob.to_mesh(context.scene, True, settings, True, False)
+    coords = _mesh_vert_attr_np(mesh, 'co')
+    bpy.data.meshes.remove(mesh)
+    return space_transform_np(context, coords, space, ob)
+
+
+@memoize(_memo_bm_vert_coords, maxsize=CACHE_MAXSIZE)
+def bm_vert_coords_np(context, ob, space=Space.GLOBAL, select=None):
+    """bm_vert_coordsの配列版。
+    :type context: bpy.types.Context
+    :type ob: bpy.types.Object
+    :param space: GLOBAL, LOCAL, VIEW, REGION, PLANE
+    :type space: Space | str
+    :param select: 真なら選択要素のみ返す。偽なら表示中の非選択要素
+    :return: shapeは(N, 3)。行の並びはBMVertSeqでの並び順(selectで
+        絞り込んだ物)に拠る
+    :rtype: numpy.ndarray
+    """
+    space = Space.get(space)
+    coords = _vert_attr_np(context, ob, 'co', select)
+    return space_transform_np(context, coords, space, ob)
+
+
+@memoize(_memo_bm_vert_normals, maxsize=CACHE_MAXSIZE)
+def bm_vert_normals_np(context, ob, space=Space.GLOBAL, select=None):
+    """bm_vert_normalsの配列版。
+    :type context: bpy.types.Context
+    :type ob: bpy.types.Object
+    :param space: GLOBAL, LOCAL, VIEW, PLANE
+    :type space: Space | str
+    :param select: 真なら選択要素のみ返す。偽なら表示中の非選択要素
+    :return: shapeは(N, 3)。正規化済み
+    :rtype: numpy.ndarray
+    """
+    space = Space.get(space)
+    normals = _vert_attr_np(context, ob, 'normal', select)
+    if space == Space.LOCAL:
+        mat = Matrix.Identity(4)
+    elif space == Space.GLOBAL:
+        mat = ob.matrix_world
+    elif space == Space.VIEW:
+        mat = context.region_data.view_matrix * ob.matrix_world
+    elif space == Space.PLANE:
+        mat = tool_data.plane.to_matrix().inverted() * ob.matrix_world
+    else:
+        raise ValueError()
+    return transform_np(mat, normals, normals=True)
+
+
 ###############################################################################
 # Armature
 ###############################################################################
@@ -436,7 +650,7 @@ def _memo_arm_bone_coords(context, ob, space=Space.GLOBAL, mode=None,
     return key
 
 
-@memoize(_memo_arm_bone_coords)
+@memoize(_memo_arm_bone_coords, maxsize=CACHE_MAXSIZE)
 def arm_bone_coords(context, ob, space=Space.GLOBAL, mode=None,
                     filter=BoneFilter.ALL):
     """Boneのheadとtailの座標を返す。
@@ -505,9 +719,12 @@ def arm_bone_coords(context, ob, space=Space.GLOBAL, mode=None,
                     [(name, (mat * ht[0], mat * ht[1]))
                      for name, ht in coords.items()])
             elif space == Space.REGION:
+                vecs = project_v3_list(
+                    context, [v for head_tail in coords.values()
+                              for v in head_tail])
                 coords = OrderedDict(
-                    [(name, tuple(project_v3_list(context, head_tail)))
-                     for name, head_tail in coords.items()])
+                    [(name, (vecs[i * 2], vecs[i * 2 + 1]))
+                     for i, name in enumerate(coords)])
             else:
                 mat = tool_data.plane.to_matrix().inverted()
                 coords = OrderedDict(
@@ -530,7 +747,7 @@ def _memo_arm_bone_matrices(context, ob, space=Space.GLOBAL, mode=None,
     return key
 
 
-@memoize(_memo_arm_bone_matrices)
+@memoize(_memo_arm_bone_matrices, maxsize=CACHE_MAXSIZE)
 def arm_bone_matrices(context, ob, space=Space.GLOBAL, mode=None,
                       filter=BoneFilter.ALL):
     """Boneのmatrixの辞書を返す。
@@ -608,6 +825,45 @@ def cache_init(context):
     mmat.update(context, view_only=True, cursor_only=True)
 
 
+###############################################################################
+# Benchmark
+###############################################################################
+class _BenchObject:
+    def __init__(self, i):
+        self.matrix_world = Matrix.Translation((i, i, i))
+        self.select = bool(i % 2)
+
+    def as_pointer(self):
+        return id(self)
+
+    def is_visible(self, scene):
+        return True
+
+
+def _bench_object_key(context, num=10000, number=100):
+    """num個のObjectを模した合成シーンで、キーの生成時間を旧来の行列を
+    並べる方式と比較する。
+    >> memocoords._bench_object_key(bpy.context)
+    """
+    import timeit
+
+    objects = [_BenchObject(i) for i in range(num)]
+    print('{:<8} {:>12} {:>12} {:>12}'.format(
+        'select', 'flatten(ms)', 'gen(ms)', 'ratio'))
+    for select in (None, True):
+        t_old = timeit.timeit(
+            lambda: _memo_object_coords_flatten(
+                context, Space.GLOBAL, select, objects),
+            number=number)
+        t_new = timeit.timeit(
+            lambda: _memo_object_coords(context, Space.GLOBAL, select,
+                                        objects),
+            number=number)
+        print('{:<8} {:>12.4f} {:>12.4f} {:>12.1f}'.format(
+            str(select), t_old / number * 1e3, t_new / number * 1e3,
+            t_old / t_new))
+
+
 ###############################################################################
 # Manipulator Matrix
 ###############################################################################
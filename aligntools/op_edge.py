@@ -142,8 +142,10 @@ class OperatorEdgeAlignToPlane(OperatorTemplate, bpy.types.Operator):
         imat = mat.inverted()
         mesh = actob.data
         bm = bmesh.from_edit_mesh(mesh)
+        bm.verts.index_update()
+        bm.verts.ensure_lookup_table()
 
-        vert_verts = vabm.vert_verts_dict(bm, select=None, hide=False)
+        vert_verts = vabm.vert_verts_csr(bm, select=None, hide=False)
         verts_linked = vabm.linked_vertices_list(bm, select=True, hide=False)
 
         plane = tool_data.plane.copy()
@@ -153,7 +155,8 @@ class OperatorEdgeAlignToPlane(OperatorTemplate, bpy.types.Operator):
             # eve1: expand and move, eve2: move
             if len(verts) == 1:
                 eve1 = verts[0]
-                others = vert_verts[eve1]
+                others = [bm.verts[i]
+                          for i in vert_verts[eve1.index].tolist()]
                 if len(others) == 1:
                     eve2 = others[0]
                 else:
@@ -254,8 +257,10 @@ class OperatorEdgeIntersect(OperatorTemplate, bpy.types.Operator):
         mat = actob.matrix_world
         mesh = actob.data
         bm = bmesh.from_edit_mesh(mesh)
+        bm.verts.index_update()
+        bm.verts.ensure_lookup_table()
 
-        vert_verts = vabm.vert_verts_dict(bm, select=None, hide=False)
+        vert_verts = vabm.vert_verts_csr(bm, select=None, hide=False)
         verts_linked = vabm.linked_vertices_list(bm, select=True, hide=False)
 
         vert_pairs = []
@@ -263,7 +268,8 @@ class OperatorEdgeIntersect(OperatorTemplate, bpy.types.Operator):
             # eve1: expand and move, eve2: move
             if len(verts) == 1:
                 eve1 = verts[0]
-                others = vert_verts[eve1]
+                others = [bm.verts[i]
+                          for i in vert_verts[eve1.index].tolist()]
                 if len(others) == 1:
                     eve2 = others[0]
                     vert_pairs.append((eve1, eve2))
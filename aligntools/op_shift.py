@@ -20,6 +20,8 @@
 import math
 import itertools
 
+import numpy as np
+
 import bpy
 from mathutils import Matrix, Vector
 import mathutils.geometry as geom
@@ -30,6 +32,7 @@ from .va import vamath as vam
 from .va import vabmesh as vabm
 from .va import vaoperator as vaop
 from .va import modalmouse
+from .va import triarrays as vatri
 from .va.looptris import LoopTris
 
 from . import tooldata
@@ -142,6 +145,65 @@ class OperatorShift(vaop.OperatorTemplate, bpy.types.Operator):
     def poll(cls, context):
         return context.mode == 'EDIT_MESH'
 
+    @classmethod
+    def _make_loop_tris(cls, bm):
+        """bmからLoopTrisを生成し、計算に用いる配列やフラグを付加する。
+        bmはLoopTris.index_update()でインデックスを更新しておく事。
+        :type bm: bmesh.types.BMesh
+        :rtype: LoopTris
+        """
+        loop_tris = LoopTris(bm)
+        loop_tris.correct()
+
+        # --- Shift Outline ---
+        # 配列。頂点・辺・面の並びはbmと同じ
+        loop_tris.coords = np.fromiter(
+            itertools.chain.from_iterable(eve.co for eve in bm.verts),
+            dtype=float, count=len(bm.verts) * 3).reshape((-1, 3))
+        loop_tris.edge_verts = edge_verts = vabm.edge_vert_indices(bm)
+        loop_tris.edge_select = vabm.elem_mask(bm.edges, select=True)
+        loop_tris.edge_hide = vabm.elem_mask(bm.edges, hide=True)
+        loop_tris.face_select = face_select = vabm.elem_mask(
+            bm.faces, select=True)
+        loop_tris.face_hide = face_hide = vabm.elem_mask(bm.faces, hide=True)
+        loop_tris.vert_select = vabm.elem_mask(bm.verts, select=True)
+        loop_tris.vert_hide = vabm.elem_mask(bm.verts, hide=True)
+
+        num_edges = len(bm.edges)
+        link_faces, link_edges = vabm.face_link_indices(bm, 'EDGE')
+        visible = ~face_hide[link_faces]
+        is_selected = face_select[link_faces]
+        selected = np.bincount(link_edges[visible & is_selected],
+                               minlength=num_edges)
+        deselected = np.bincount(link_edges[visible & ~is_selected],
+                                 minlength=num_edges)
+        edge_sel = loop_tris.edge_select & ~loop_tris.edge_hide
+        eflags = np.zeros(num_edges, dtype=int)
+        eflags[edge_sel & (selected == 0) & (deselected <= 2)] = cls.WIRE
+        eflags[edge_sel & (selected == 1) & (deselected <= 1)] = cls.BORDER
+        loop_tris.eflags_array = eflags
+
+        num_verts = len(bm.verts)
+        wire_num = np.bincount(edge_verts[eflags & cls.WIRE != 0].ravel(),
+                               minlength=num_verts)
+        border_num = np.bincount(
+            edge_verts[eflags & cls.BORDER != 0].ravel(),
+            minlength=num_verts)
+        vflags = np.zeros(num_verts, dtype=int)
+        vflags[(1 <= wire_num) & (wire_num <= 2) & (border_num == 0)] = \
+            cls.WIRE
+        vflags[(wire_num == 0) & (border_num == 2)] = cls.BORDER
+        loop_tris.vflags_array = vflags
+
+        loop_tris.eflags = dict(zip(bm.edges, eflags.tolist()))
+        loop_tris.vflags = dict(zip(bm.verts, vflags.tolist()))
+
+        # --- Solidify ---
+        # 面のhideとtriの面積により、法線計算に使えるか否かのフラグを付ける
+        arrays = loop_tris.arrays()
+        loop_tris.tri_tag = ~face_hide[arrays.faces] & (arrays.areas > EPS)
+        return loop_tris
+
     def init(self, context):
         if self.use_world_coords:
             if self.init_called[1]:
@@ -162,13 +224,7 @@ class OperatorShift(vaop.OperatorTemplate, bpy.types.Operator):
             bm.transform(context.active_object.matrix_world)
             bm.normal_update()  # 必要か？
 
-        # LoopTris。要素の変更は無いのでキャッシュを有効にする
-        loop_tris = LoopTris(bm)
-        loop_tris.bm = bm
-        loop_tris.vert_verts = vabm.vert_verts_dict(bm)
-        memo = loop_tris.memoize
-        memo.read = memo.write = True
-        loop_tris.correct()
+        loop_tris = self._make_loop_tris(bm)
 
         # 編集中のbmeshの頂点インデックスから、modifier適用後のbmeshの頂点を
         # 参照する
@@ -191,47 +247,6 @@ class OperatorShift(vaop.OperatorTemplate, bpy.types.Operator):
                 d[i] = efa
                 indices.add(i)
 
-        # --- Shift Outline ---
-        loop_tris.eflags = eflags = {}
-        for eed in bm.edges:
-            flag = 0
-            selected = deselected = 0
-            for efa in eed.link_faces:
-                if not efa.hide:
-                    if efa.select:
-                        selected += 1
-                    else:
-                        deselected += 1
-            if eed.select and not eed.hide:
-                if selected == 0 and deselected <= 2:
-                    flag = self.WIRE
-                elif selected == 1 and deselected <= 1:
-                    flag = self.BORDER
-            eflags[eed] = flag
-
-        loop_tris.vflags = vflags = {}
-        for eve in bm.verts:
-            flag = 0
-            wire_num = border_num = 0
-            for eed in eve.link_edges:
-                f = eflags[eed]
-                if f & self.WIRE:
-                    wire_num += 1
-                elif f & self.BORDER:
-                    border_num += 1
-            if 1 <= wire_num <= 2 and border_num == 0:
-                flag = self.WIRE
-            elif wire_num == 0 and border_num == 2:
-                flag = self.BORDER
-            vflags[eve] = flag
-
-        # --- Solidify ---
-        # 頂点のhideとtriの面積により、法線計算に使えるか否かのフラグを付ける
-        for eve in bm.verts:
-            eve.tag = not eve.hide
-        for tri in loop_tris:
-            tri.tag = not tri[0].face.hide and tri.area > EPS
-
         if self.use_world_coords:
             self.init_called[1] = True
             self._loop_tris_world = loop_tris
@@ -265,71 +280,74 @@ class OperatorShift(vaop.OperatorTemplate, bpy.types.Operator):
         BORDER = self.BORDER
 
         loop_tris = self.loop_tris
-        vert_dict = loop_tris.vert_dict()
-
+        coords = loop_tris.coords
+        edge_verts = loop_tris.edge_verts
+        eflags = loop_tris.eflags_array
+        if self.tangent_calculation in ('selected', 'individual'):
+            face_mask = loop_tris.face_select & ~loop_tris.face_hide
+            edge_mask = loop_tris.edge_select
+        else:
+            face_mask = ~loop_tris.face_select & ~loop_tris.face_hide
+            edge_mask = ~loop_tris.edge_select
+
+        # BORDERの頂点と、それに接続する二頂点(vert_next, vert_prev)を求める
+        verts = np.flatnonzero(loop_tris.vflags_array & BORDER)
+        if len(verts) == 0:
+            return {}
+        border_edges = edge_verts[eflags & BORDER != 0]
+        ends = np.concatenate([border_edges[:, 0], border_edges[:, 1]])
+        others = np.concatenate([border_edges[:, 1], border_edges[:, 0]])
+        is_border = loop_tris.vflags_array[ends] & BORDER != 0
+        ends = ends[is_border]
+        others = others[is_border]
+        others = others[np.argsort(ends, kind='mergesort')].reshape((-1, 2))
+        verts_next = others[:, 0]
+        verts_prev = others[:, 1]
+
+        # tangent (used when self.align_edges is False)
+        arrays = loop_tris.arrays()
+        tangents = vatri.calc_vert_tangents(
+            coords, verts, verts_prev, verts_next, arrays,
+            tri_mask=face_mask[arrays.faces])
+
+        # tangent_min, tangent_max (used when self.align_edges is True)
+        # 条件を満たす辺が一本だけの場合に計算する
+        edge_mask = (edge_mask & ~loop_tris.edge_hide &
+                     (eflags & (WIRE | BORDER) == 0))
+        ends = edge_verts[edge_mask]
+        counts = np.bincount(ends.ravel(), minlength=len(coords))
+        other_verts = np.zeros(len(coords), dtype=np.intp)
+        other_verts[ends[:, 0]] = ends[:, 1]
+        other_verts[ends[:, 1]] = ends[:, 0]
+        co = coords[verts]
+        vec, length = vatri.normalize_rows(coords[other_verts[verts]] - co)
+        use_vec = (counts[verts] == 1) & (length > 0.0)
+        candidates = []
+        for verts_other in (verts_prev, verts_next):
+            vec_other, length = vatri.normalize_rows(coords[verts_other] - co)
+            cross = np.cross(vec_other, vec)
+            f = np.sqrt(np.einsum('ij,ij->i', cross, cross))
+            valid = use_vec & (length > 0.0) & (f > EPS)
+            f[~valid] = 1.0
+            candidates.append((valid, vec / f[:, None]))
+        (valid1, t1), (valid2, t2) = candidates
+        swap = valid1 & valid2 & (np.einsum('ij,ij->i', t2, t2) <
+                                  np.einsum('ij,ij->i', t1, t1))
+        tangent_min = np.where(valid1[:, None], t1, t2)
+        tangent_max = np.where(valid2[:, None], t2, t1)
+        tangent_min[swap], tangent_max[swap] = t2[swap], t1[swap]
+        neither = ~valid1 & ~valid2
+        tangent_min[neither] = tangents[neither]
+        tangent_max[neither] = tangents[neither]
+
+        bm_verts = loop_tris.bm.verts
+        bm_verts.ensure_lookup_table()
         vert_tangents = {}  # eve: Vector
-
-        for eve in loop_tris.bm.verts:
-            if not loop_tris.vflags[eve] & BORDER:
-                continue
-
-            # eveに接続する二頂点(vert_next, vert_prev)を求める
-            eve_next, eve_prev = [eed.other_vert(eve) for eed in eve.link_edges
-                                  if loop_tris.eflags[eed] & BORDER]
-
-            # tangent (used when self.align_edges is False)
-            tris = []
-            for tri in vert_dict[eve]:
-                efa = tri[0].face
-                if not efa.hide:
-                    # if not self.use_outside_calculation and efa.select or \
-                    #    self.use_outside_calculation and not efa.select:
-                    #     tris.append(tri)
-                    if self.tangent_calculation in ('selected', 'individual') and efa.select or \
-                       self.tangent_calculation == 'deselected' and not efa.select:
-                        tris.append(tri)
-            tangent = LoopTris.vert_tangent(
-                eve, eve_prev, eve_next, tris, fallback=Vector((0, 0, 0)))
-
-            # tangent_min, tangent_max (used when self.align_edges is True)
-            edges = []
-            for eed in eve.link_edges:
-                if eed.hide or loop_tris.eflags[eed] & (WIRE | BORDER):
-                    continue
-                # if not self.use_outside_calculation and eed.select or \
-                #    self.use_outside_calculation and not eed.select:
-                #     edges.append(eed)
-                if self.tangent_calculation in ('selected', 'individual') and eed.select or \
-                   self.tangent_calculation == 'deselected' and not eed.select:
-                    edges.append(eed)
-            tangent_min_max = []
-            if len(edges) == 1:
-                eed = edges[0]
-                vec = eed.other_vert(eve).co - eve.co
-                if vec.length > 0:
-                    vec.normalize()
-                    vec1 = eve_prev.co - eve.co
-                    if vec1.length > 0:
-                        vec1.normalize()
-                        f1 = vec1.cross(vec).length
-                        if f1 > EPS:
-                            tangent_min_max.append(vec / f1)
-                    vec2 = eve_next.co - eve.co
-                    if vec2.length > 0:
-                        vec2.normalize()
-                        f2 = vec2.cross(vec).length
-                        if f2 > EPS:
-                            tangent_min_max.append(vec / f2)
-            tangent_min_max.sort(key=lambda v: v.length)
-
-            if len(tangent_min_max) == 0:
-                tangents = [tangent] * 3
-            elif len(tangent_min_max) == 1:
-                tangents = [tangent] + tangent_min_max * 2
-            else:
-                tangents = [tangent] + tangent_min_max
-            vert_tangents[eve] = tangents
-
+        for i, t, tmin, tmax in zip(verts.tolist(), tangents.tolist(),
+                                    tangent_min.tolist(),
+                                    tangent_max.tolist()):
+            vert_tangents[bm_verts[i]] = [Vector(t), Vector(tmin),
+                                          Vector(tmax)]
         return vert_tangents
 
     def calc_vert_tangents_wire(self, obmat, viewmat):
@@ -442,123 +460,42 @@ class OperatorShift(vaop.OperatorTemplate, bpy.types.Operator):
                         vert_tangents[eve] = [v.copy() for i in range(3)]
         return vert_tangents
 
-    def calc_loop_normals(self):
+    def calc_loop_normals(self, weight='NONE'):
+        """選択中の面のloopの法線を求める。loopを含む三角形の法線の平均。
+        :param weight: 'NONE', 'AREA', 'ANGLE'。
+            LoopTriArrays.corner_weights()参照
+        :type weight: str
+        :rtype: dict[BMLoop, Vector]
+        """
         loop_tris = self.loop_tris
-        face_dict = loop_tris.face_dict()
+        arrays = loop_tris.arrays()
+        normals = arrays.loop_normals(weight, loop_tris.coords)
+        counts = arrays.loop_tris().degrees()
         loop_normals = {}
         for efa in loop_tris.bm.faces:
             if not efa.select:
                 continue
-            for tris in loop_tris.tris_of_face_ccw(efa, face_dict):
-                normals = []
-                for tri in tris:
-                    normals.append(tri.normal)
-                normal = sum(normals, Vector()) / len(normals)
-                loop_normals[tris[0][0]] = normal
+            for loop in efa.loops:
+                i = loop.index
+                if counts[i]:
+                    loop_normals[loop] = Vector(normals[i])
         return loop_normals
 
     def calc_vert_normals(self):
-        """eve.selectとeve.tagが真の頂点だけ計算する"""
+        """選択中で隠れていない頂点だけ計算する。
+        triarrays.calc_vert_offset_normals()参照。
+        :rtype: dict[BMVert, Vector]
+        """
         loop_tris = self.loop_tris
-        vert_pair_dict = loop_tris.vert_pair_dict()
-        vert_normals = {}
-        for eve in loop_tris.bm.verts:
-            if not eve.select or not eve.tag:
-                continue
-            edge_normals = {}
-            edge_normals_all = {}
-            for eve_other in loop_tris.vert_verts[eve]:
-                # other_vert
-                #     \          / edge_normal
-                #      \  tri   /
-                # tri  eve ------- other_vert
-                #      /
-                #     /    tri
-                # other_vert
-                #
-                tris = []
-                vert_pair = (eve, eve_other)
-                key = loop_tris.hash_sorted(vert_pair)
-                for tri in vert_pair_dict[key]:
-                    if tri.tag:
-                        if self.normal_calculation in ('all', 'deselected'):
-                            tris.append(tri)
-                        else:
-                            if tri[0].face.select:
-                                tris.append(tri)
-
-                if len(tris) == 1:
-                    if self.normal_calculation != 'deselected':
-                        edge_normals[vert_pair] = tris[0].normal
-                    edge_normals_all[vert_pair] = tris[0].normal
-                elif len(tris) == 2:
-                    n1 = tris[0].normal
-                    n2 = tris[1].normal
-                    normal = (n1 + n2).normalized()
-                    angle = n1.angle(n2)
-                    # x * cos(angle / 2) = 1.0
-                    f = math.cos(angle / 2)
-                    if f != 0.0:
-                        normal /= f
-                    if angle > self.tri_angle_threshold:
-                        if self.normal_calculation == 'deselected':
-                            if tris[0][0].face.select ^ tris[1][0].face.select:
-                                # n1: sel, n2: desel
-                                # deselをselに投影
-                                if tris[1][0].face.select:
-                                    n1, n2 = n2, n1
-                                normal = (n1 - n1.project(n2)).normalized()
-                                f = math.cos(n1.angle(normal))
-                                if f != 0.0:
-                                    normal /= f
-                                edge_normals[vert_pair] = normal
-                        else:
-                            edge_normals[vert_pair] = normal
-                    edge_normals_all[vert_pair] = normal
-
-            normal = None
-
-            for _ in range(2):
-                if len(edge_normals) == 1:
-                    normal = list(edge_normals.values())[0].copy()
-                elif len(edge_normals) >= 2:
-                    normals = []
-                    v0 = eve.co
-                    for k1, k2 in itertools.combinations(
-                            edge_normals.keys(), 2):
-                        #       v3 v5    v6
-                        #     v4  \|_____|   |n2
-                        # \n1   \ / v0   v2
-                        #       v1
-                        v1 = k1[1].co
-                        v2 = k2[1].co
-                        n1 = edge_normals[k1]
-                        n2 = edge_normals[k2]
-                        if (v0 - v1).angle(v2 - v0) >= \
-                                self.intersect_angle_threshold:
-                            v3 = v0 + n1
-                            v4 = v1 + n1
-                            v5 = v0 + n2
-                            v6 = v2 + n2
-                            i1, i2 = geom.intersect_line_line(v3, v4, v5, v6)
-                            normals.append((i1 + i2) / 2 - v0)
-                        else:
-                            l = (n1.length + n2.length) / 2
-                            normals.append((n1 + n2).normalized() * l)
-                    if normals:
-                        normal = Vector()
-                        for v in normals:
-                            normal += v
-                        normal /= len(normals)
-                if normal:
-                    break
-                else:
-                    edge_normals = edge_normals_all
-
-            if normal:
-                vert_normals[eve] = normal
-
-        return vert_normals
+        verts, normals = vatri.calc_vert_offset_normals(
+            loop_tris.coords, loop_tris.edge_verts, loop_tris.arrays(),
+            loop_tris.vert_select & ~loop_tris.vert_hide, loop_tris.tri_tag,
+            loop_tris.face_select, self.normal_calculation,
+            self.tri_angle_threshold, self.intersect_angle_threshold)
+        bm_verts = loop_tris.bm.verts
+        bm_verts.ensure_lookup_table()
+        return {bm_verts[i]: Vector(normal)
+                for i, normal in zip(verts.tolist(), normals.tolist())}
 
     def execute_tangent(self, context, bm):
         if self.offset_tangent == 0.0:
@@ -23,6 +23,11 @@ Convex Hull:
 
 OBB:
     obb_matrix, obb_size = OBB(vectors, eps=1e-6)  # 2D/3D
+
+Batch:
+    coords, offsets = concat_coords([vectors, ...])
+    centers, sizes = aabb_batch(coords, offsets, matrices=None)
+    [(obb_matrix, obb_size), ...] = obb_per_group(coords, offsets, eps=1e-6)
 """
 
 import math
@@ -31,14 +36,16 @@ from functools import reduce
 from itertools import chain
 import random
 
+import numpy as np
+
 import bpy
 import mathutils
 from mathutils import Matrix, Vector
-import mathutils.geometry as geom
 import bmesh
 
 
-__all__ = ['convex_hull', 'OBB']
+__all__ = ['convex_hull', 'OBB', 'concat_coords', 'aabb_batch',
+           'obb_per_group']
 
 
 def _cross_2d(v1, v2):
@@ -139,173 +146,322 @@ def convex_hull_2d(vecs, eps:'距離がこれ以下なら同一平面と見做
 ###############################################################################
 # Convex Hull 3D
 ###############################################################################
-class _Face:
-    __slots__ = ['verts', 'normal', 'edge_keys', 'outer_verts']
-
-    def __init__(self, v1, v2, v3):
-        self.verts = [v1, v2, v3]
-        self.normal = geom.normal(v1.co, v2.co, v3.co)
-        self.edge_keys = [tuple(sorted((self.verts[i - 1], self.verts[i]),
-                                       key=lambda v: v.index))
-                          for i in range(3)]
-        self.outer_verts = []
-
-    def distance(self, v):
-        return geom.distance_point_to_plane(v, self.verts[0].co, self.normal)
-
-
-def _divide_outer_verts(faces, verts, eps):
-    """vertsを各面に分配する"""
-    for v in verts:
-        for face in faces:
-            if face.distance(v.co) > eps:
-                face.outer_verts.append(v)
-                break
-
+class _HullFaces:
+    """convex_hull_3dで用いる面の配列。
+    verts: (M, 3) 反時計回り(外側から見て)の頂点インデックス
+    normals: (M, 3), offsets: (M,) 平面の式 normal・co = offset
+    neighbors: (M, 3) verts[i] -> verts[i + 1] の辺を共有する面
+    alive: (M,) 除去されていない面
+    apexes: (M,) 面に分配された頂点の内、最も遠いもの。無ければ-1
+    """
 
-def _find_remove_faces_re(remove_faces, vec, face, edge_faces, eps):
-    """vecから見えている面をremove_facesに追加していく"""
-    remove_faces.add(face)
-    for ekey in face.edge_keys:
-        pair = edge_faces[ekey]
-        f = pair[1] if pair[0] == face else pair[0]
-        if f not in remove_faces:
-            if f.distance(vec) > eps:
-                _find_remove_faces_re(remove_faces, vec, f, edge_faces, eps)
+    def __init__(self, capacity=64):
+        self.num = 0
+        self.verts = np.empty((capacity, 3), dtype=np.int64)
+        self.normals = np.empty((capacity, 3))
+        self.offsets = np.empty(capacity)
+        self.neighbors = np.empty((capacity, 3), dtype=np.int64)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.apexes = np.empty(capacity, dtype=np.int64)
+
+    def _reserve(self, num):
+        capacity = len(self.verts)
+        if self.num + num <= capacity:
+            return
+        while capacity < self.num + num:
+            capacity *= 2
+        for attr in ('verts', 'normals', 'offsets', 'neighbors', 'alive',
+                     'apexes'):
+            old = getattr(self, attr)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.num] = old[:self.num]
+            setattr(self, attr, new)
+
+    def add(self, coords, tris):
+        """面を追加して、そのインデックスの配列を返す。
+        :type coords: numpy.ndarray
+        :param tris: (K, 3)
+        :rtype: numpy.ndarray
+        """
+        tris = np.asarray(tris, dtype=np.int64)
+        k = len(tris)
+        self._reserve(k)
+        indices = np.arange(self.num, self.num + k)
+        v1, v2, v3 = (coords[tris[:, i]] for i in range(3))
+        # np.crossは小さな配列に対してオーバーヘッドが大きい
+        e1 = v2 - v1
+        e2 = v3 - v1
+        normals = (e1[:, [1, 2, 0]] * e2[:, [2, 0, 1]] -
+                   e1[:, [2, 0, 1]] * e2[:, [1, 2, 0]])
+        lengths = np.sqrt(np.einsum('ij,ij->i', normals, normals))
+        lengths[lengths == 0.0] = 1.0
+        normals /= lengths[:, np.newaxis]
+        self.verts[indices] = tris
+        self.normals[indices] = normals
+        self.offsets[indices] = np.einsum('ij,ij->i', normals, v1)
+        self.neighbors[indices] = -1
+        self.alive[indices] = True
+        self.apexes[indices] = -1
+        self.num += k
+        return indices
+
+
+def _expand_ranges(starts, counts):
+    """各要素iについてstarts[i]からcounts[i]個の連番を連結する。
+    :return: 連番が何番目の要素に属するかを表す配列と連番の配列
+    :rtype: (numpy.ndarray, numpy.ndarray)
+    """
+    owners = np.repeat(np.arange(len(starts)), counts)
+    offsets = np.cumsum(counts) - counts
+    values = (np.repeat(starts - offsets, counts) +
+              np.arange(offsets[-1] + counts[-1] if len(counts) else 0))
+    return owners, values
+
+
+def _assign_outer_points(faces, coords, points, groups, starts, counts,
+                         point_faces, point_dists, tol, dense_size=1024):
+    """pointsをそれぞれのグループの面の内、最も遠くから見える面に分配する。
+    グループgの面はstarts[g]からcounts[g]個の連番。どの面からも見えない
+    頂点は凸包の内側なので-1とする。分配先の面のapexesも更新する。
+    :param groups: (P,) 各頂点のグループ
+    :param point_faces: (N,) 頂点が分配された面。書き換える
+    :param point_dists: (N,) 頂点から分配された面までの距離。書き換える
+    :param dense_size: 頂点数がこれ以上のグループは行列積で距離を求める
+    """
+    if len(points) == 0:
+        return
+    best = np.empty(len(points), dtype=np.int64)
+    max_dists = np.empty(len(points))
+
+    sizes = np.bincount(groups, minlength=len(starts))
+    for g in np.flatnonzero(sizes >= dense_size):
+        rows = np.flatnonzero(groups == g)
+        face_indices = np.arange(starts[g], starts[g] + counts[g])
+        dists = (np.dot(coords[points[rows]], faces.normals[face_indices].T) -
+                 faces.offsets[face_indices])
+        i = np.argmax(dists, axis=1)
+        best[rows] = face_indices[i]
+        max_dists[rows] = dists[np.arange(len(rows)), i]
+
+    rows = np.flatnonzero(sizes[groups] < dense_size)
+    if len(rows):
+        owners, pair_faces = _expand_ranges(starts[groups[rows]],
+                                            counts[groups[rows]])
+        dists = (np.einsum('ij,ij->i', coords[points[rows[owners]]],
+                           faces.normals[pair_faces]) -
+                 faces.offsets[pair_faces])
+        offsets = np.cumsum(counts[groups[rows]]) - counts[groups[rows]]
+        max_dists[rows] = np.maximum.reduceat(dists, offsets)
+        is_max = np.flatnonzero(dists == max_dists[rows[owners]])
+        first = np.ones(len(is_max), dtype=bool)
+        first[1:] = owners[is_max[1:]] != owners[is_max[:-1]]
+        best[rows] = pair_faces[is_max[first]]
+
+    outer = max_dists > tol
+    point_faces[points] = np.where(outer, best, -1)
+    point_dists[points] = max_dists
+
+    # 距離の昇順に代入して、各面で最後に代入される最も遠い頂点を残す
+    order = np.argsort(max_dists[outer])
+    faces.apexes[best[outer][order]] = points[outer][order]
+
+
+# 面から頂点が見えるかの判定に用いる許容値の、座標の大きさに対する比
+HULL_TOLERANCE_FACTOR = 1000 * np.finfo(np.float64).eps
+
+
+def _hull_tolerance(coords):
+    """convex_hull_3dで面から頂点が見えるかの判定に用いる距離の許容値"""
+    return HULL_TOLERANCE_FACTOR * max(np.abs(coords).max(), 1.0e-300)
 
 
 def convex_hull_3d(vecs, eps:'距離がこれ以下なら同一平面と見做す'=1e-6):
-    """三次元又は二次元の凸包を求める"""
+    """三次元又は二次元の凸包を求める。
+    numpyの配列上でQuickHullを行う。互いの見えている面と地平線が重ならない
+    apexは一度に纏めて凸包に加える。
+    epsは全頂点が同一点・同一線上・同一平面かの判定に用いる。面から頂点が
+    見えるかの判定には座標の大きさに比例した浮動小数点誤差程度の許容値を
+    用いる。epsを用いると誤差が蓄積して凸包の外に頂点が残ったり、
+    裏返った面が出来たりする。
+    :return: 三次元なら面(外側から見て反時計回り)の頂点インデックスのリスト。
+        全頂点が同一平面、同一線上、同一点の場合は輪郭の頂点インデックスの
+        リスト。
+    """
     if len(vecs) <= 1:
         return list(range(len(vecs)))
 
-    verts = [_Vert(i, v) for i, v in enumerate(vecs)]
+    coords = _coords_array(vecs)
+    num = len(coords)
+    remain = np.ones(num, dtype=bool)
 
     # なるべく離れている二頂点を求める
-    medium = reduce(lambda a, b: a + b, vecs) / len(vecs)
-    v1 = max(verts, key=lambda v: (v.co - medium).length)
-    v2 = max(verts, key=lambda v: (v.co - v1.co).length)
-    line = v2.co - v1.co
-    if line.length <= eps:
+    medium = coords.mean(axis=0)
+    i1 = int(np.argmax(np.einsum('ij,ij->i', coords - medium,
+                                 coords - medium)))
+    d = coords - coords[i1]
+    i2 = int(np.argmax(np.einsum('ij,ij->i', d, d)))
+    line = coords[i2] - coords[i1]
+    line_length = math.sqrt(np.dot(line, line))
+    if line_length <= eps:
         # 全ての頂点が重なる
         return [0]
 
-    verts.remove(v1)
-    verts.remove(v2)
-    if not verts:
-        return [v1.index, v2.index]
+    remain[[i1, i2]] = False
+    if not remain.any():
+        return [i1, i2]
 
     # 三角形を構成する為の頂点を求める
-    v3 = max(verts, key=lambda v: line.cross(v.co - v1.co).length)
-    if line.normalized().cross(v3.co - v1.co).length <= eps:
+    cross = np.cross(line, d)
+    cross_lengths = np.einsum('ij,ij->i', cross, cross)
+    cross_lengths[~remain] = -1.0
+    i3 = int(np.argmax(cross_lengths))
+    if math.sqrt(cross_lengths[i3]) / line_length <= eps:
         # 全ての頂点が同一線上にある
-        return [v1.index, v2.index]
-    
-    verts.remove(v3)
-    if not verts:
-        return [v1.index, v2.index, v3.index]
+        return [i1, i2]
+
+    remain[i3] = False
+    if not remain.any():
+        return [i1, i2, i3]
 
     # 四面体を構成する為の頂点を求める
-    normal = geom.normal(v1.co, v2.co, v3.co)
-    def key_func(v):
-        return abs(geom.distance_point_to_plane(v.co, v1.co, normal))
-    v4 = max(verts, key=key_func)
-    if key_func(v4) <= eps:
+    normal = np.cross(line, coords[i3] - coords[i1])
+    normal /= math.sqrt(np.dot(normal, normal))
+    plane_dists = np.dot(d, normal)
+    abs_dists = np.abs(plane_dists)
+    abs_dists[~remain] = -1.0
+    i4 = int(np.argmax(abs_dists))
+    if abs_dists[i4] <= eps:
         # 全ての頂点が平面上にある
-        quat = normal.rotation_difference(Vector((0, 0, 1)))
-        vecs_2d = [(quat * v).to_2d() for v in vecs]
+        quat = Vector(normal).rotation_difference(Vector((0, 0, 1)))
+        vecs_2d = [(quat * Vector(v)).to_2d() for v in coords]
         return convex_hull_2d(vecs_2d, eps)
 
-    verts.remove(v4)
+    remain[i4] = False
+    tol = _hull_tolerance(coords)
 
     # 四面体作成
-    #       ^ normal
-    #    v3 |
-    #     / |\
-    # v1 /____\v2
-    #    \    /
-    #     \  /
-    #     v4
-
-    if geom.distance_point_to_plane(v4.co, v1.co, normal) < 0.0:
-        faces = [_Face(v1, v2, v3),
-                 _Face(v1, v4, v2), _Face(v2, v4, v3), _Face(v3, v4, v1)]
+    faces = _HullFaces()
+    if plane_dists[i4] < 0.0:
+        tris = [(i1, i2, i3), (i1, i4, i2), (i2, i4, i3), (i3, i4, i1)]
+        neighbors = [(1, 2, 3), (3, 2, 0), (1, 3, 0), (2, 1, 0)]
     else:
-        faces = [_Face(v1, v3, v2),
-                 _Face(v1, v2, v4), _Face(v2, v3, v4), _Face(v3, v1, v4)]
+        tris = [(i1, i3, i2), (i1, i2, i4), (i2, i3, i4), (i3, i1, i4)]
+        neighbors = [(3, 2, 1), (0, 2, 3), (0, 3, 1), (0, 1, 2)]
+    face_indices = faces.add(coords, tris)
+    faces.neighbors[face_indices] = neighbors
 
     # 残りの頂点を各面に分配
-    _divide_outer_verts(faces, verts, eps)
-
-    # edge_faces作成
-    edge_faces = defaultdict(list)
-    for face in faces:
-        for ekey in face.edge_keys:
-            edge_faces[ekey].append(face)
-
+    point_faces = np.full(num, -1, dtype=np.int64)
+    point_dists = np.zeros(num)
+    points = np.flatnonzero(remain)
+    _assign_outer_points(faces, coords, points,
+                         np.zeros(len(points), dtype=np.int64),
+                         face_indices[:1], np.array([len(face_indices)]),
+                         point_faces, point_dists, tol)
+
+    # 頂点が分配された各面について、最も遠い頂点をapexとして凸包に加える。
+    # 見えている面と地平線の外側の面が重ならないapexは纏めて処理する
     while True:
-        added = False
-        for i in range(len(faces)):
-            try:
-                face = faces[i]
-            except:
-                break
-            if not face.outer_verts:
-                continue
-
-            v1 = max(face.outer_verts, key=lambda v: face.distance(v.co))
-            if face.distance(v1.co) > eps:
-                # 凸包になるようにv1から放射状に面を貼る
-                added = True
-
-                # 隠れて不要となる面を求める
-                remove_faces = set()
-                _find_remove_faces_re(remove_faces, v1.co, face, edge_faces,
-                                      eps)
-
-                # remove_facesを多面体から除去して穴を開ける
-                for f in remove_faces:
-                    for ekey in f.edge_keys:
-                        edge_faces[ekey].remove(f)
-                    faces.remove(f)
-
-                # 穴に面を貼る
-                new_faces = []
-                ekey_count = defaultdict(int)
-                for f in remove_faces:
-                    for ekey in f.edge_keys:
-                        ekey_count[ekey] += 1
-                for ekey, cnt in ekey_count.items():
-                    if cnt != 1:
-                        continue
-                    linkface = edge_faces[ekey][0]
-                    v2, v3 = ekey
-                    if linkface.verts[linkface.verts.index(v2) - 1] != v3:
-                        v2, v3 = v3, v2
-                    new_face = _Face(v1, v2, v3)
-                    for key in new_face.edge_keys:
-                        edge_faces[key].append(new_face)
-                    new_faces.append(new_face)
-                faces.extend(new_faces)
-
-                # 頂点の再分配
-                outer_verts = reduce(lambda a, b: a + b,
-                                     (f.outer_verts for f in remove_faces))
-                if v1 in outer_verts:
-                    outer_verts.remove(v1)
-                _divide_outer_verts(new_faces, outer_verts, eps)
-
-            else:
-                face.outer_verts = []
-
-        if not added:
+        apex_faces = np.flatnonzero(faces.apexes[:faces.num] >= 0)
+        if len(apex_faces) == 0:
             break
-
-    return [[v.index for v in f.verts] for f in faces]
+        apexes = faces.apexes[apex_faces]
+        apex_coords = coords[apexes]
+
+        # apexから見えている面を隣接する面を一段ずつ辿って求める。
+        # 判定した面の内、見えていないものは地平線の外側の面となる。
+        # 面とapexの組はk * m + fで表す
+        m = faces.num
+        visible_keys = [np.arange(len(apexes)) * m + apex_faces]
+        checked_keys = visible_keys[0]
+        front = visible_keys[0]
+        while len(front):
+            keys = np.unique(np.repeat(front // m, 3) * m +
+                             faces.neighbors[front % m].ravel())
+            i = np.searchsorted(checked_keys, keys)
+            i[i == len(checked_keys)] = 0
+            keys = keys[checked_keys[i] != keys]
+            checked_keys = np.sort(np.concatenate((checked_keys, keys)))
+            k = keys // m
+            f = keys % m
+            dists = (np.einsum('ij,ij->i', faces.normals[f], apex_coords[k]) -
+                     faces.offsets[f])
+            front = keys[dists > tol]
+            visible_keys.append(front)
+        visible_keys = np.concatenate(visible_keys)
+
+        # 判定した面が他のapexと重ならないものを採用する。
+        # 残りの候補の内、判定した面の全てで番号が最小のものを採用していく
+        k = checked_keys // m
+        f = checked_keys % m
+        accepted = np.zeros(len(apexes), dtype=bool)
+        candidates = np.ones(len(apexes), dtype=bool)
+        taken = np.zeros(m, dtype=bool)
+        while True:
+            candidates[k[taken[f]]] = False
+            if not candidates.any():
+                break
+            selected = candidates[k]
+            owners = np.full(m, len(apexes), dtype=np.int64)
+            np.minimum.at(owners, f[selected], k[selected])
+            first = candidates.copy()
+            first[k[selected & (owners[f] != k)]] = False
+            accepted |= first
+            candidates &= ~first
+            taken[f[first[k]]] = True
+        k = visible_keys // m
+        visible_keys = visible_keys[accepted[k]]
+        visible = visible_keys % m
+        visible_owners = np.full(m, -1, dtype=np.int64)
+        visible_owners[visible] = visible_keys // m
+
+        # 地平線: 見えている面と見えていない面が共有する辺
+        neighbors = faces.neighbors[visible]
+        rows, slots = np.nonzero(
+            visible_owners[neighbors] != visible_owners[visible, np.newaxis])
+        order = np.argsort(visible_owners[visible[rows]], kind='mergesort')
+        rows = rows[order]
+        slots = slots[order]
+        horizon_faces = visible[rows]
+        groups = visible_owners[horizon_faces]
+        v1 = faces.verts[horizon_faces, slots]
+        v2 = faces.verts[horizon_faces, (slots + 1) % 3]
+        outside = neighbors[rows, slots]
+        outside_slots = np.argmax(
+            faces.neighbors[outside] == horizon_faces[:, np.newaxis], axis=1)
+
+        # 見えている面を除去して穴に面を貼る。辺: apex->v1, v1->v2, v2->apex
+        faces.alive[visible] = False
+        faces.apexes[visible] = -1
+        new_faces = faces.add(
+            coords, np.column_stack((apexes[groups], v1, v2)))
+        faces.neighbors[outside, outside_slots] = new_faces
+        start_keys = groups * num + v1
+        order = np.argsort(start_keys)
+        next_positions = order[np.searchsorted(start_keys[order],
+                                               groups * num + v2)]
+        prev_positions = np.empty_like(next_positions)
+        prev_positions[next_positions] = np.arange(len(new_faces))
+        faces.neighbors[new_faces] = np.column_stack(
+            (new_faces[prev_positions], outside, new_faces[next_positions]))
+
+        # 除去した面に分配されていた頂点を同じapexの新しい面に再分配
+        point_faces[apexes[accepted]] = -1
+        points = np.flatnonzero(point_faces >= 0)
+        points = points[visible_owners[point_faces[points]] >= 0]
+        groups = visible_owners[point_faces[points]]
+        counts = np.bincount(visible_owners[horizon_faces],
+                             minlength=len(apexes))
+        starts = new_faces[0] + np.cumsum(counts) - counts
+        _assign_outer_points(faces, coords, points, groups, starts, counts,
+                             point_faces, point_dists, tol)
+
+    alive = np.flatnonzero(faces.alive[:faces.num])
+    return faces.verts[alive].tolist()
 
 
 ###############################################################################
-# Convex Hull 3D
+# Convex Hull
 ###############################################################################
 def convex_hull(vecs, eps=1e-6):
     """三次元又は二次元の凸包を求める
@@ -327,47 +483,182 @@ def convex_hull(vecs, eps=1e-6):
 ###############################################################################
 # CHBB
 ###############################################################################
-def _closest_axis_on_plane(vecs, indices):
+# OBB(3D)で最小矩形を調べる凸包の面の法線の数。厚みの小さい物から選ぶ
+OBB_CANDIDATE_NORMALS = 32
+
+
+def _akl_toussaint_filter(coords):
+    """8方向の極点で作る多角形の内側の点を除いたインデックスの配列を返す"""
+    x = coords[:, 0]
+    y = coords[:, 1]
+    # 反時計回りの順
+    keys = (x, x + y, y, y - x, -x, -x - y, -y, x - y)
+    poly = []
+    for key in keys:
+        i = int(np.argmax(key))
+        if not poly or poly[-1] != i:
+            poly.append(i)
+    if len(poly) > 1 and poly[0] == poly[-1]:
+        poly.pop()
+    if len(poly) < 3:
+        return np.arange(len(coords))
+    a = coords[poly]
+    edges = np.roll(a, -1, axis=0) - a
+    rel_x = x[:, np.newaxis] - a[:, 0]
+    rel_y = y[:, np.newaxis] - a[:, 1]
+    cross = edges[:, 0] * rel_y - edges[:, 1] * rel_x
+    inside = (cross > 0.0).all(axis=1)
+    return np.flatnonzero(~inside)
+
+
+def _monotone_chain(coords, eps=1e-6):
+    """Andrewのmonotone chainで二次元の凸包を求める。
+    :param coords: (N, 2)
+    :type coords: numpy.ndarray
+    :return: 反時計回りの頂点インデックスのリスト。全ての点が同一線上なら
+        両端の二点、重なるなら一点。
+    :rtype: list[int]
     """
-    calc_OBBから呼び出す。
-    2D/3Dどちらでも可。3Dの場合は全て同一平面上にあるとする
+    candidates = _akl_toussaint_filter(coords)
+    pts = coords[candidates]
+    order = np.lexsort((pts[:, 1], pts[:, 0]))
+    sorted_pts = pts[order].tolist()
+    sorted_indices = candidates[order].tolist()
+
+    def half(indices, points):
+        chain = []
+        chain_pts = []
+        for i, p in zip(indices, points):
+            while len(chain) >= 2:
+                o = chain_pts[-2]
+                a = chain_pts[-1]
+                cross = ((a[0] - o[0]) * (p[1] - o[1]) -
+                         (a[1] - o[1]) * (p[0] - o[0]))
+                if cross > 0.0:
+                    break
+                chain.pop()
+                chain_pts.pop()
+            chain.append(i)
+            chain_pts.append(p)
+        return chain
+
+    lower = half(sorted_indices, sorted_pts)
+    upper = half(sorted_indices[::-1], sorted_pts[::-1])
+    hull = lower[:-1] + upper[:-1]
+
+    first = sorted_indices[0]
+    last = sorted_indices[-1]
+    d = coords[last] - coords[first]
+    if math.sqrt(np.dot(d, d)) <= eps:
+        return [first]
+    if len(hull) < 3:
+        return [first, last]
+    # 全ての頂点が同一線上にある
+    line = d / math.sqrt(np.dot(d, d))
+    rel = coords[hull] - coords[first]
+    if np.abs(line[0] * rel[:, 1] - line[1] * rel[:, 0]).max() <= eps:
+        return [first, last]
+    return hull
+
+
+def _min_area_rect(coords, hull, eps=1e-6, chunk=4096):
+    """凸包の辺の何れかに沿う矩形の内、面積が最小の物を求める。
+    (rotating calipersが調べるのと同じ候補を纏めて計算する)
+    :param coords: (N, 2)
+    :param hull: 反時計回りの凸包の頂点インデックス。3以上
+    :return: (x軸の単位ベクトル, 中心, 大きさ)。大きさは[x, y]でx >= y
+    :rtype: (numpy.ndarray, numpy.ndarray, numpy.ndarray)
     """
-    if not vecs:
-        return None
-    dim = len(vecs[0])
-    axis = None
-    dist = 0.0
-    for i in range(len(indices)):
-        idx1 = indices[i - 1]
-        idx2 = indices[i]
-        v1 = vecs[idx1]
-        v2 = vecs[idx2]
-        line = (v2 - v1).normalized()
-        dist_tmp = None
-        for idx3 in indices:
-            if idx3 == idx1 or idx3 == idx2:
-                continue
-            v3 = vecs[idx3]
-            v13 = v3 - v1
-            if dim == 3:
-                d = line.cross(v13).length
-            else:
-                d = abs(_cross_2d(line, v13))
-            if dist_tmp is None or d > dist_tmp:
-                dist_tmp = d
-                axis_tmp = v13 - v13.project(line)
-                axis_tmp.normalize()
-        if axis is None or dist_tmp < dist:
-            dist = dist_tmp
-            axis = axis_tmp
-    return axis
+    pts = coords[hull]
+    edges = np.roll(pts, -1, axis=0) - pts
+    lengths = np.sqrt(np.einsum('ij,ij->i', edges, edges))
+    valid = lengths > eps
+    dirs = edges[valid] / lengths[valid][:, np.newaxis]
+
+    best = None
+    for start in range(0, len(dirs), chunk):
+        u = dirs[start:start + chunk]
+        v = np.column_stack((-u[:, 1], u[:, 0]))
+        pu = np.dot(pts, u.T)
+        pv = np.dot(pts, v.T)
+        umin = pu.min(axis=0)
+        umax = pu.max(axis=0)
+        vmin = pv.min(axis=0)
+        vmax = pv.max(axis=0)
+        areas = (umax - umin) * (vmax - vmin)
+        i = int(np.argmin(areas))
+        if best is None or areas[i] < best[0]:
+            best = (areas[i], u[i], v[i], umin[i], umax[i], vmin[i], vmax[i])
+
+    _area, u, v, umin, umax, vmin, vmax = best
+    center = u * (umin + umax) / 2 + v * (vmin + vmax) / 2
+    size = np.array([umax - umin, vmax - vmin])
+    if size[0] < size[1]:
+        # Y軸を短い方にする
+        u = v
+        size = size[::-1]
+    return u, center, size
+
+
+def _obb_2d(coords, hull, eps):
+    """
+    :return: (x軸, y軸, 中心, 大きさ)
+    :rtype: (numpy.ndarray, numpy.ndarray, numpy.ndarray, numpy.ndarray)
+    """
+    if len(hull) == 1:
+        return (np.array([1.0, 0.0]), np.array([0.0, 1.0]),
+                coords[hull[0]].copy(), np.zeros(2))
+    elif len(hull) == 2:
+        v1 = coords[hull[0]]
+        v2 = coords[hull[1]]
+        d = v2 - v1
+        length = math.sqrt(np.dot(d, d))
+        xaxis = d / length
+        return (xaxis, np.array([-xaxis[1], xaxis[0]]), (v1 + v2) / 2,
+                np.array([length, 0.0]))
+    else:
+        xaxis, center, size = _min_area_rect(coords, hull, eps)
+        return xaxis, np.array([-xaxis[1], xaxis[0]]), center, size
+
+
+def _plane_basis(normal):
+    """normalに直交する二つの単位ベクトルを返す"""
+    if abs(normal[0]) < 0.9:
+        e1 = np.cross(normal, (1.0, 0.0, 0.0))
+    else:
+        e1 = np.cross(normal, (0.0, 1.0, 0.0))
+    e1 /= math.sqrt(np.dot(e1, e1))
+    e2 = np.cross(normal, e1)
+    return e1, e2
+
+
+def _obb_on_plane(coords, normal, eps):
+    """normalをZ軸とし、XY平面に投影した点の最小矩形からOBBを求める。
+    :return: (3x3の軸(列), 中心, 大きさ, 体積)
+    """
+    e1, e2 = _plane_basis(normal)
+    coords_2d = np.column_stack((np.dot(coords, e1), np.dot(coords, e2)))
+    hull = _monotone_chain(coords_2d, eps)
+    x2, y2, c2, size2 = _obb_2d(coords_2d, hull, eps)
+    xaxis = e1 * x2[0] + e2 * x2[1]
+    yaxis = e1 * y2[0] + e2 * y2[1]
+    d = np.dot(coords, normal)
+    dmin = d.min()
+    dmax = d.max()
+    center = e1 * c2[0] + e2 * c2[1] + normal * (dmin + dmax) / 2
+    size = np.array([size2[0], size2[1], dmax - dmin])
+    axes = np.column_stack((xaxis, yaxis, normal))
+    return axes, center, size, size.prod()
 
 
 def OBB(vecs, r_indices=None, eps=1e-6):
     """Convex hull を用いたOBBを返す。
-    Z->Y->Xの順で長さが最少となる軸を求める。
+    2Dならmonotone chainで求めた凸包の辺に沿う面積最小の矩形。
+    3Dなら凸包の面の法線(厚みの小さい物からOBB_CANDIDATE_NORMALS個)を
+    Z軸の候補とし、平面上の最小矩形と合わせて体積が最小となる物(近似)。
+    軸は長さがZ <= Y <= Xとなるように並べる。
     :param vecs: list of Vector
-    :type vecs: list | tuple
+    :type vecs: list | tuple | numpy.ndarray
     :param r_indices: listを渡すとconvexhullの結果を格納する
     :type r_indices: None | list
     :param eps: 種々の計算の閾値
@@ -382,64 +673,40 @@ def OBB(vecs, r_indices=None, eps=1e-6):
     :rtype: (Matrix, Vector)
     """
 
-    if not vecs:
+    if len(vecs) == 0:
         return None, None
 
-    # 2D ----------------------------------------------------------------------
-    if len(vecs[0]) == 2:
-        mat = Matrix.Identity(3)
-        bb_size = Vector((0, 0))
+    coords = _coords_array(vecs)
 
-        indices = convex_hull_2d(vecs, eps)
-        if r_indices:
+    # 2D ----------------------------------------------------------------------
+    if coords.shape[1] == 2:
+        indices = _monotone_chain(coords, eps)
+        if r_indices is not None:
             r_indices[:] = indices
-
-        if len(indices) == 1:
-            mat.col[2][:2] = vecs[0]
-        elif len(indices) == 2:
-            v1 = vecs[indices[0]]
-            v2 = vecs[indices[1]]
-            xaxis = (v2 - v1).normalized()
-            angle = math.atan2(xaxis[1], xaxis[0])
-            mat2 = Matrix.Rotation(angle, 2)
-            mat.col[0][:2] = mat2.col[0]
-            mat.col[1][:2] = mat2.col[1]
-            mat.col[2][:2] = (v1 + v2) / 2
-            bb_size[0] = (v2 - v1).length
-        else:
-            yaxis = _closest_axis_on_plane(vecs, indices)
-            angle = math.atan2(yaxis[1], yaxis[0]) - math.pi / 2  # X軸
-            mat2 = Matrix.Rotation(angle, 2)
-            imat2 = Matrix.Rotation(-angle, 2)
-            rotvecs = [imat2 * v for v in vecs]
-            loc = Vector((0, 0))
-            for i in range(2):
-                rotvecs.sort(key=lambda v: v[i])
-                bb_size[i] = rotvecs[-1][i] - rotvecs[0][i]
-                loc[i] = (rotvecs[0][i] + rotvecs[-1][i]) / 2
-            mat.col[0][:2] = mat2.col[0]
-            mat.col[1][:2] = mat2.col[1]
-            mat.col[2][:2] = mat2 * loc
-        return mat, bb_size
+        xaxis, yaxis, center, size = _obb_2d(coords, indices, eps)
+        mat = Matrix.Identity(3)
+        mat.col[0][:2] = xaxis
+        mat.col[1][:2] = yaxis
+        mat.col[2][:2] = center
+        return mat, Vector(size)
 
     # 3D ----------------------------------------------------------------------
     mat = Matrix.Identity(4)
     bb_size = Vector((0, 0, 0))
 
-    indices = convex_hull(vecs, eps)
-
-    if r_indices:
+    indices = convex_hull(coords, eps)
+    if r_indices is not None:
         r_indices[:] = indices
 
     if isinstance(indices[0], int):  # 2d
         if len(indices) == 1:
-            mat.col[3][:3] = vecs[0]
+            mat.col[3][:3] = coords[0]
             return mat, bb_size
-        
+
         elif len(indices) == 2:
             # 同一線上
-            v1 = vecs[indices[0]]
-            v2 = vecs[indices[1]]
+            v1 = Vector(coords[indices[0]])
+            v2 = Vector(coords[indices[1]])
             xaxis = (v2 - v1).normalized()
             quat = Vector((1, 0, 0)).rotation_difference(xaxis)
             mat = quat.to_matrix().to_4x4()
@@ -449,64 +716,199 @@ def OBB(vecs, r_indices=None, eps=1e-6):
 
         else:
             # 同一平面上
-            medium = reduce(lambda a, b: a + b, vecs) / len(vecs)
-            v1 = max(vecs, key=lambda v: (v - medium).length)
-            v2 = max(vecs, key=lambda v: (v - v1).length)
-            line = v2 - v1
-            v3 = max(vecs, key=lambda v: line.cross(v - v1).length)
-            zaxis = geom.normal(v1, v2, v3)
-            if zaxis[2] < 0.0:
-                zaxis.negate()
-
-            quat = zaxis.rotation_difference(Vector((0, 0, 1)))
-            rotvecs = [quat * v for v in vecs]
-            indices_2d = indices
+            hull_coords = coords[indices]
+            _u, _s, vt = np.linalg.svd(hull_coords - hull_coords.mean(axis=0))
+            normal = vt[2]
+            axes, center, size, _volume = _obb_on_plane(
+                hull_coords, normal, eps)
 
     else:  # 3d
-        indices_set = set(chain(*indices))
-        zaxis = None
-        dist = 0.0
-        # 最も距離の近い面（平面）と頂点を求める
-        for tri in indices:
-            v1, v2, v3 = [vecs[i] for i in tri]
-            normal = geom.normal(v1, v2, v3)
-            d = 0.0
-            for v4 in (vecs[i] for i in indices_set if i not in tri):
-                f = abs(geom.distance_point_to_plane(v4, v1, normal))
-                d = max(f, d)
-            if zaxis is None or d < dist:
-                zaxis = -normal
-                dist = d
-
-        quat = zaxis.rotation_difference(Vector((0, 0, 1)))
-        rotvecs = [(quat * v).to_2d() for v in vecs]
-        indices_2d = convex_hull_2d(rotvecs, eps)
-
-    yaxis = _closest_axis_on_plane(rotvecs, indices_2d)
-    yaxis = quat.inverted() * yaxis.to_3d()
-
-    xaxis = yaxis.cross(zaxis)
-    xaxis.normalize()  # 不要？
-
-    mat.col[0][:3] = xaxis
-    mat.col[1][:3] = yaxis
-    mat.col[2][:3] = zaxis
-
-    # OBBの大きさと中心を求める
-    imat = mat.inverted()
-    rotvecs = [imat * v for v in vecs]
-    loc = Vector()
+        tris = np.array(indices)
+        hull_coords = coords[np.unique(tris)]
+        v1, v2, v3 = (coords[tris[:, i]] for i in range(3))
+        # np.crossは小さな配列に対してオーバーヘッドが大きい
+        e1 = v2 - v1
+        e2 = v3 - v1
+        normals = (e1[:, [1, 2, 0]] * e2[:, [2, 0, 1]] -
+                   e1[:, [2, 0, 1]] * e2[:, [1, 2, 0]])
+        lengths = np.sqrt(np.einsum('ij,ij->i', normals, normals))
+        normals = normals[lengths > 0.0] / lengths[lengths > 0.0][:, None]
+        # 同じ向きの面を纏める
+        keys = np.round(normals / eps ** 0.5).astype(np.int64).tolist()
+        unique = {}
+        for i, key in enumerate(keys):
+            unique.setdefault(tuple(key), i)
+        normals = normals[sorted(unique.values())]
+        d = np.dot(hull_coords, normals.T)
+        thickness = d.max(axis=0) - d.min(axis=0)
+        order = np.argsort(thickness, kind='mergesort')
+        best = None
+        for i in order[:OBB_CANDIDATE_NORMALS]:
+            obb = _obb_on_plane(hull_coords, normals[i], eps)
+            if best is None or obb[3] < best[3]:
+                best = obb
+        axes, center, size, _volume = best
+
+    # 長さがZ <= Y <= Xとなるように並べる
+    order = np.argsort(size, kind='mergesort')[::-1]
+    axes = axes[:, order]
+    size = size[order]
+    axes[:, 0] = np.cross(axes[:, 1], axes[:, 2])  # 右手系にする
+
     for i in range(3):
-        rotvecs.sort(key=lambda v: v[i])
-        bb_size[i] = rotvecs[-1][i] - rotvecs[0][i]
-        loc[i] = (rotvecs[0][i] + rotvecs[-1][i]) / 2
-    mat.col[3][:3] = mat * loc
+        mat.col[i][:3] = axes[:, i]
+    mat.col[3][:3] = center
+    bb_size[:] = size
     return mat, bb_size
 
 
+###############################################################################
+# Batch
+###############################################################################
+def _coords_array(vecs):
+    """ベクトルのシーケンスを(N, D)のfloat64の配列にする。
+    Vector毎にtupleを作らずに一度に読み込む。
+    :rtype: numpy.ndarray
+    """
+    if isinstance(vecs, np.ndarray):
+        return vecs.astype(np.float64)
+    vecs = list(vecs)
+    dim = len(vecs[0]) if vecs else 3
+    return np.fromiter(chain.from_iterable(vecs), np.float64,
+                       len(vecs) * dim).reshape((-1, dim))
+
+
+def concat_coords(vecs_list):
+    """複数のベクトルのシーケンスを連結し、aabb_batch()やobb_per_group()に渡す
+    座標の配列と各グループの先頭のインデックスを作る。
+    :type vecs_list: list[list[Vector]]
+    :return: (coords, offsets)
+    :rtype: (numpy.ndarray, numpy.ndarray)
+    """
+    lengths = np.array([len(vecs) for vecs in vecs_list], dtype=np.int64)
+    offsets = np.cumsum(lengths) - lengths
+    coords = _coords_array(chain.from_iterable(vecs_list))
+    return coords, offsets
+
+
+def _group_lengths(num, offsets):
+    offsets = np.asarray(offsets, dtype=np.int64)
+    return offsets, np.diff(np.append(offsets, num))
+
+
+def aabb_batch(coords, offsets, matrices=None):
+    """複数のグループのAABBを纏めて求める。
+    :param coords: 全グループの座標を連結した(N, D)の配列
+    :type coords: numpy.ndarray
+    :param offsets: 各グループの先頭のインデックス(G,)。空のグループは不可
+    :type offsets: numpy.ndarray | list[int]
+    :param matrices: 各グループの座標系を表す(G, D, D)の配列。Noneなら単位
+        行列とする
+    :type matrices: numpy.ndarray
+    :return: (centers, sizes)。共に(G, D)。centersはcoordsと同じ座標系、
+        sizesは各グループの座標系での大きさ。
+    :rtype: (numpy.ndarray, numpy.ndarray)
+    """
+    coords = np.asarray(coords, dtype=np.float64)
+    offsets, lengths = _group_lengths(len(coords), offsets)
+    if matrices is not None:
+        matrices = np.asarray(matrices, dtype=np.float64)
+        imats = np.linalg.inv(matrices)
+        group_indices = np.repeat(np.arange(len(offsets)), lengths)
+        coords = np.einsum('nij,nj->ni', imats[group_indices], coords)
+    v_min = np.minimum.reduceat(coords, offsets, axis=0)
+    v_max = np.maximum.reduceat(coords, offsets, axis=0)
+    centers = (v_min + v_max) / 2
+    if matrices is not None:
+        centers = np.einsum('gij,gj->gi', matrices, centers)
+    return centers, v_max - v_min
+
+
+def obb_per_group(coords, offsets, eps=1e-6):
+    """concat_coords()で連結した座標から、グループ毎にOBB()を呼んでOBBを
+    求める。aabb_batch()と違い一括処理ではなくグループ数分のループになる。
+    一点のみのグループはOBB()を呼ばずに配列から直接求める。
+    :param coords: 全グループの座標を連結した(N, 2)か(N, 3)の配列
+    :type coords: numpy.ndarray
+    :param offsets: 各グループの先頭のインデックス(G,)。空のグループは不可
+    :type offsets: numpy.ndarray | list[int]
+    :return: [(matrix, obb_size), ...] OBB()と同じ
+    :rtype: list[(Matrix, Vector)]
+    """
+    coords = np.asarray(coords, dtype=np.float64)
+    offsets, lengths = _group_lengths(len(coords), offsets)
+    dim = coords.shape[1]
+    results = []
+    for start, length in zip(offsets.tolist(), lengths.tolist()):
+        if length == 1:
+            mat = Matrix.Identity(dim + 1)
+            mat.col[dim][:dim] = coords[start]
+            results.append((mat, Vector([0.0] * dim)))
+        else:
+            results.append(OBB(coords[start:start + length], eps=eps))
+    return results
+
+
 ###############################################################################
 # Test
 ###############################################################################
+def bench_convex_hull(sizes=(10 ** 4, 10 ** 5, 10 ** 6),
+                      sphere_max_size=10 ** 4):
+    """一様乱数と球面上の点でconvex_hull_3dの時間を計る。球面上の点は
+    全てが凸包の頂点となる最悪の場合なので、sphere_max_size以下に限る。
+    """
+    import time
+
+    rng = np.random.RandomState(0)
+    print('{:<8} {:>9} {:>8} {:>10}'.format('points', 'dist', 'faces',
+                                            'time(s)'))
+    for size in sizes:
+        for dist in ('uniform', 'sphere'):
+            if dist == 'sphere' and size > sphere_max_size:
+                continue
+            coords = rng.uniform(-1, 1, (size, 3))
+            if dist == 'sphere':
+                coords /= np.sqrt((coords ** 2).sum(axis=1))[:, np.newaxis]
+            t = time.perf_counter()
+            faces = convex_hull_3d(coords)
+            print('{:<8} {:>9} {:>8} {:>10.3f}'.format(
+                size, dist, len(faces), time.perf_counter() - t))
+
+
+def _test_convex_hull_3d(count=200, seed=0):
+    """乱数の点群でconvex_hull_3dの結果が全ての点を含み、面が外側を
+    向いているか調べる。一様分布、球面、格子状(同一平面上の点が多い)、
+    大小のスケールを試す。
+    :return: 失敗した試行の番号のリスト
+    :rtype: list[int]
+    """
+    rng = np.random.RandomState(seed)
+    failures = []
+    for i in range(count):
+        coords = rng.uniform(-1, 1, (rng.randint(10, 2000), 3))
+        kind = i % 4
+        if kind == 1:
+            coords /= np.sqrt((coords ** 2).sum(axis=1))[:, np.newaxis]
+        elif kind == 2:
+            coords = np.round(coords * 4) / 4
+            coords += rng.uniform(-1e-7, 1e-7, coords.shape)
+        elif kind == 3:
+            coords *= rng.choice([1e-3, 1e3, 1e5])
+        tris = np.array(convex_hull_3d(coords), dtype=np.int64)
+        v1, v2, v3 = (coords[tris[:, j]] for j in range(3))
+        normals = np.cross(v2 - v1, v3 - v1)
+        lengths = np.sqrt(np.einsum('ij,ij->i', normals, normals))
+        normals = normals[lengths > 0] / lengths[lengths > 0, np.newaxis]
+        offsets = np.einsum('ij,ij->i', normals, v1[lengths > 0])
+        outside = (np.dot(coords, normals.T) - offsets).max()
+        center = coords.mean(axis=0)
+        facing = np.einsum('ij,ij->i', normals,
+                           ((v1 + v2 + v3) / 3)[lengths > 0] - center)
+        if outside > 10 * _hull_tolerance(coords) or (facing < 0).any():
+            failures.append(i)
+    return failures
+
+
 def test(use_random=True, random_count=10, lifetime=3.0):
     import bpy_extras
     import bgl
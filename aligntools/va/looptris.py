@@ -19,10 +19,13 @@
 
 import math
 import collections
+import types
 from collections import defaultdict
 from functools import reduce
 from itertools import chain
 
+import numpy as np
+
 import bpy
 import bmesh
 import mathutils
@@ -32,6 +35,7 @@ from mathutils import geometry as geom
 from ..localutils.memoize import Memoize
 
 from . import vamath as vam
+from .triarrays import ANGLE_THRESHOLD, LoopTriArrays
 
 
 class _Void:
@@ -155,122 +159,322 @@ class LoopTri(collections.abc.MutableSequence):
                 for i in range(3)]
 
 
-class LoopTris(list):
+class LoopTris(collections.abc.MutableSequence):
+    """LoopTriのシーケンス。
+    三角形は属する面と、その面のループの位置(face.loopsのインデックス)、
+    法線、面積の配列で保持し、LoopTriは参照する度に生成する。
+    その為取り出したLoopTriを変更してもselfには反映されない。反映するには
+    self[i] = tri の様に代入する事。
+    要素を変更するとこのインスタンスのキャッシュを破棄する。
+    """
+
     memoize = Memoize(key=lambda *args: id(args[0]),
                       use_instance=True)
 
-    ANGLE_THRESHOLD = math.radians(1.0)
+    ANGLE_THRESHOLD = ANGLE_THRESHOLD
     DIST_THRESHOLD = 1e-6
     AREA_THRESHOLD = 1e-6
 
     # init --------------------------------------------------------------------
-    def __init__(self, bmesh_or_looptris, sort=False):
+    def __init__(self, bmesh_or_looptris=(), sort=False, bm=None):
         """
-        :param bmesh_or_looptris: BMeshかLoopTris、若しくはLoopTriのシーケンス
+        :param bmesh_or_looptris: BMeshかLoopTris、若しくはLoopTriか
+            (BMLoop, BMLoop, BMLoop)のシーケンス
         :type bmesh_or_looptris: BMesh | LoopTris | list | tuple
         :param sort: Bmesh以外を受け取った場合にソートする
         :type sort: bool
+        :param bm: LoopTriの属するBMesh。bmesh_or_looptrisがBMeshなら
+            それを用いる
+        :type bm: BMesh
         """
-        super().__init__()
+        if isinstance(bmesh_or_looptris, bmesh.types.BMesh):
+            bm = bmesh_or_looptris
+        elif bm is None and isinstance(bmesh_or_looptris, LoopTris):
+            bm = bmesh_or_looptris.bm
+        self.bm = bm
+        """:type: BMesh"""
+
+        # 三角形の属する面。_facesはこのインデックス
+        self._face_seq = []
+        """:type: list[BMFace]"""
+        self._face_pos = None  # {BMFace: int}。_face_seqの逆引き
+        # 三角形毎の配列
+        self._faces = np.zeros(0, dtype=np.intp)
+        self._corners = np.zeros((0, 3), dtype=np.intp)
+        self._normals = np.zeros((0, 3))
+        self._areas = np.zeros(0)
+
+        if bm is not None and bm is bmesh_or_looptris:
+            self._set_corners(*self._corners_from_bmesh(bm))
+        elif bmesh_or_looptris is not None:
+            self._set_data(*self._pack(bmesh_or_looptris, sort))
+            if sort:
+                self.sort(key=lambda tri: tri[0].face.index)
 
-        # キャッシュ。デフォルトでは無効。
-        self.memoize.read = self.memoize.write = False
+    # Sequence ----------------------------------------------------------------
+    def __len__(self):
+        return len(self._faces)
+
+    def __getitem__(self, key):
+        """intならLoopTri、sliceならLoopTrisを新しく生成して返す"""
+        if isinstance(key, slice):
+            return self._subset(np.arange(len(self))[key])
+        face = self._face_seq[self._faces[key]]
+        loops = face.loops
+        return LoopTri([loops[i] for i in self._corners[key].tolist()],
+                       self._normals[key].tolist(), float(self._areas[key]))
+
+    def __iter__(self):
+        face_seq = self._face_seq
+        normals = self._normals.tolist()
+        areas = self._areas.tolist()
+        prev = -1
+        loops = None
+        for i, (f, corners) in enumerate(zip(self._faces.tolist(),
+                                             self._corners.tolist())):
+            if f != prev:
+                loops = list(face_seq[f].loops)
+                prev = f
+            yield LoopTri([loops[c] for c in corners], normals[i], areas[i])
 
-        if not bmesh_or_looptris:
-            return
+    def __setitem__(self, key, value):
+        num = len(self)
+        if isinstance(key, slice):
+            data = self._pack(value)
+            start, stop, step = key.indices(num)
+            if step == 1:
+                stop = max(start, stop)
+                self._set_data(*[np.concatenate([arr[:start], new, arr[stop:]])
+                                 for arr, new in zip(self._arrays(), data)])
+                return
+            indices = np.arange(num)[key]
+            if len(indices) != len(data[0]):
+                raise ValueError(
+                    'attempt to assign sequence of size {} to extended '
+                    'slice of size {}'.format(len(data[0]), len(indices)))
+        else:
+            indices = [np.arange(num)[key]]
+            data = self._pack([value])
+        for arr, new in zip(self._arrays(), data):
+            arr[indices] = new
+        self._modified()
 
-        if isinstance(bmesh_or_looptris, bmesh.types.BMesh):
-            bm = bmesh_or_looptris
-            vert_indices = [v.index for v in bm.verts]
-            face_indices = [f.index for f in bm.faces]
-            self.index_update(bm, verts=True, edges=False, faces=True,
-                              loops=False)
-
-            # 頂点と面のインデックスからLoopを求める辞書
-            vi_fi_to_loop = {}
-            for face in bm.faces:
-                for loop in face.loops:
-                    vi_fi_to_loop[(loop.vert.index, face.index)] = loop
-
-            # bmeshからmesh生成後、tessfaceを計算
-            mesh = bpy.data.meshes.new("tmp")
-            bm.to_mesh(mesh)
-            for polygon in mesh.polygons:
-                polygon.select = False
-            mesh.calc_tessface()  # Cubeを分割して8万ポリにしても0.003s
-
-            polygons = tuple(mesh.polygons)
-
-            # 頂点インデックスから面インデックスを参照する辞書
-            vi_polys = defaultdict(set)
-            for i, polygon in enumerate(polygons):
-                for vi in polygon.vertices:
-                    vi_polys[vi].add(i)
-
-            for index, tessface in enumerate(mesh.tessfaces):
-                # ３つの頂点を共有するpolyを求める
-                seq = (vi_polys[i] for i in tessface.vertices)
-                poly_indices = reduce(lambda a, b: a & b, seq)
-
-                if len(poly_indices) == 1:
-                    poly_index = poly_indices.pop()
-                else:
-                    # tessfaceがどのpolyに属するか求める
-                    for poly_index in poly_indices:
-                        polygons[poly_index].select = True
-                        mesh.calc_tessface()
-                        polygons[poly_index].select = False
-                        if mesh.tessfaces[index].select:
-                            break
-                loops = []
-                for vert_index in tessface.vertices:
-                    loop = vi_fi_to_loop.get((vert_index, poly_index))
-                    if loop:
-                        loops.append(loop)
-                    else:
-                        print('Error')  # 原因不明
-                # NOTE: vertices_rawの長さはは必ず4。末尾が0ならverticesの
-                # 長さは3となる。
-                normal = tessface.normal
-                area = tessface.area
-                if len(loops) == 3:
-                    self.append(LoopTri(loops, normal, area))  # sort不要
-                elif len(loops) == 4:
-                    t1, t2 = self.tessellate(loops)
-                    self.append(LoopTri([loops[i] for i in t1]))
-                    self.append(LoopTri([loops[i] for i in t2]))
-
-            # indexの復帰
-            for v, i in zip(bm.verts, vert_indices):
-                v.index = i
-            for f, i in zip(bm.faces, face_indices):
-                f.index = i
-
-            # meshを削除
-            bpy.data.meshes.remove(mesh)
+    def __delitem__(self, key):
+        indices = np.arange(len(self))[key]
+        self._set_data(*[np.delete(arr, indices, axis=0)
+                         for arr in self._arrays()])
+
+    def insert(self, index, value):
+        self[index:index] = [value]
+
+    def extend(self, values):
+        num = len(self)
+        self[num:num] = values
 
+    def sort(self, key=None, reverse=False):
+        """list.sort()と同じ。keyにはLoopTriを渡す"""
+        if key is None:
+            keys = list(self)
         else:
-            looptris = bmesh_or_looptris
-            self.extend(looptris)
-            if len(self) > 0 and not isinstance(self[0], LoopTri):
-                for i, tri in enumerate(self):
-                    self[i] = LoopTri(tri, sort=sort)
-            if sort:
-                self.sort(key=lambda tri: tri[0].face.index)
+            keys = [key(tri) for tri in self]
+        order = sorted(range(len(keys)), key=keys.__getitem__,
+                       reverse=reverse)
+        self._set_data(*[arr[order] for arr in self._arrays()])
+
+    # Data --------------------------------------------------------------------
+    def _arrays(self):
+        return self._faces, self._corners, self._normals, self._areas
+
+    def _set_data(self, faces, corners, normals, areas):
+        self._faces = faces
+        self._corners = corners
+        self._normals = normals
+        self._areas = areas
+        self._modified()
+
+    def _set_corners(self, face_seq, faces, corners):
+        """面とループの位置から設定し、法線と面積を計算する"""
+        self._face_seq = face_seq
+        self._face_pos = None
+        num = len(faces)
+        self._set_data(faces, corners, np.zeros((num, 3)), np.zeros(num))
+        self.update_normals_areas()
+
+    def _modified(self):
+        """要素の変更後に呼ぶ"""
+        self.memoize.clear(self)
+
+    def _face_positions(self):
+        if self._face_pos is None:
+            self._face_pos = {face: i for i, face in
+                              enumerate(self._face_seq)}
+        return self._face_pos
+
+    def _pack(self, looptris, sort=False):
+        """LoopTriのシーケンスを配列に変換する。
+        必要ならself._face_seqに面を追加する。
+        :param sort: LoopTri以外の要素はループを面の順に並べる
+        :return: (faces, corners, normals, areas)
+        :rtype: (numpy.ndarray, numpy.ndarray, numpy.ndarray, numpy.ndarray)
+        """
+        face_seq = self._face_seq
+        face_pos = self._face_positions()
+        if isinstance(looptris, LoopTris):
+            mapping = np.empty(len(looptris._face_seq), dtype=np.intp)
+            for i, face in enumerate(looptris._face_seq):
+                pos = face_pos.get(face)
+                if pos is None:
+                    pos = face_pos[face] = len(face_seq)
+                    face_seq.append(face)
+                mapping[i] = pos
+            return (mapping[looptris._faces], looptris._corners.copy(),
+                    looptris._normals.copy(), looptris._areas.copy())
+
+        faces = []
+        corners = []
+        normals = []
+        areas = []
+        calc = []  # 法線と面積を計算する三角形
+        calc_coords = []
+        loop_positions = {}
+        for tri in looptris:
+            is_looptri = isinstance(tri, LoopTri)
+            loops = tri.loops if is_looptri else list(tri)
+            face = loops[0].face
+            pos = face_pos.get(face)
+            if pos is None:
+                pos = face_pos[face] = len(face_seq)
+                face_seq.append(face)
+            positions = loop_positions.get(face)
+            if positions is None:
+                positions = loop_positions[face] = {
+                    loop: i for i, loop in enumerate(face.loops)}
+            tri_corners = [positions[loop] for loop in loops]
+            if is_looptri:
+                normals.append(tuple(tri.normal))
+                areas.append(tri.area)
+            else:
+                if sort:
+                    tri_corners.sort()
+                calc.append(len(faces))
+                calc_coords.extend(face.loops[i].vert.co
+                                   for i in tri_corners)
+                normals.append((0.0, 0.0, 0.0))
+                areas.append(0.0)
+            faces.append(pos)
+            corners.append(tri_corners)
+
+        num = len(faces)
+        faces = np.array(faces, dtype=np.intp)
+        corners = np.array(corners, dtype=np.intp).reshape((num, 3))
+        normals = np.array(normals, dtype=float).reshape((num, 3))
+        areas = np.array(areas, dtype=float)
+        if calc:
+            coords = np.array([tuple(co) for co in calc_coords])
+            normals[calc], areas[calc] = LoopTriArrays.calc_normals_areas(
+                coords, np.arange(len(coords)).reshape((-1, 3)))
+        return faces, corners, normals, areas
+
+    def _subset(self, indices):
+        """indicesの三角形からなる新しいインスタンスを返す。
+        :rtype: LoopTris
+        """
+        other = self.__class__(bm=self.bm)
+        other._face_seq = list(self._face_seq)
+        other._set_data(*[arr[indices] for arr in self._arrays()])
+        return other
 
+    def update_normals_areas(self, indices=None):
+        """頂点座標から三角形の法線と面積を再計算する。
+        :param indices: 計算する三角形のインデックス。Noneなら全て
+        :type indices: numpy.ndarray | list[int]
+        """
+        if indices is None:
+            indices = np.arange(len(self))
+        faces = self._faces[indices]
+        if len(faces) == 0:
+            return
+        used = np.unique(faces)
+        face_loops = [self._face_seq[i].loops for i in used.tolist()]
+        sizes = np.fromiter((len(loops) for loops in face_loops),
+                            dtype=np.intp, count=len(face_loops))
+        starts = np.cumsum(sizes) - sizes
+        coords = np.fromiter(
+            chain.from_iterable(loop.vert.co for loops in face_loops
+                                for loop in loops),
+            dtype=float, count=sizes.sum() * 3).reshape((-1, 3))
+        verts = (starts[np.searchsorted(used, faces)][:, None] +
+                 self._corners[indices])
+        normals, areas = LoopTriArrays.calc_normals_areas(coords, verts)
+        self._normals[indices] = normals
+        self._areas[indices] = areas
+        self._modified()
 
     # Generate ----------------------------------------------------------------
+    @classmethod
+    def _corners_from_faces(cls, faces, ngon_tris=None):
+        """BMFaceの並び順で三角形に分割する。
+        :type faces: collections.abc.Iterable
+        :param ngon_tris: 5頂点以上の面の分割結果。
+            {BMFace: [(BMLoop, BMLoop, BMLoop), ...], ...}。
+            含まれない面はtessellate()で分割する。
+        :type ngon_tris: dict
+        :return: 面のリストと、三角形毎のその面のインデックス(shapeは(T,))と
+            ループの位置(shapeは(T, 3))
+        :rtype: (list[BMFace], numpy.ndarray, numpy.ndarray)
+        """
+        face_seq = list(faces)
+        tri_faces = []
+        corners = []
+        for i, face in enumerate(face_seq):
+            loops = face.loops
+            num = len(loops)
+            if num == 3:
+                tris = [(0, 1, 2)]
+            elif num == 4:
+                # 4頂点の面は頂点法線を見て分割する
+                tris = cls.tessellate(loops)
+            elif ngon_tris and face in ngon_tris:
+                positions = {loop: j for j, loop in enumerate(loops)}
+                tris = [[positions[loop] for loop in tri]
+                        for tri in ngon_tris[face]]
+            else:
+                tris = cls.tessellate(loops)
+            tri_faces.extend([i] * len(tris))
+            corners.extend(tris)
+        return (face_seq, np.array(tri_faces, dtype=np.intp),
+                np.array(corners, dtype=np.intp).reshape((-1, 3)))
+
+    @classmethod
+    def _corners_from_bmesh(cls, bm):
+        """一時的なMeshを作らずにBMeshのループから直接三角形を求める。
+        三角形と四角形はそのまま、五頂点以上の面はBMeshのtessellationの
+        結果を用いる。
+        :type bm: BMesh
+        :return: _corners_from_faces()参照
+        :rtype: (list[BMFace], numpy.ndarray, numpy.ndarray)
+        """
+        ngon_tris = None
+        if any(len(face.loops) > 4 for face in bm.faces):
+            if hasattr(bm, 'calc_loop_triangles'):
+                bm_tris = bm.calc_loop_triangles()
+            else:
+                bm_tris = bm.calc_tessface()
+            ngon_tris = defaultdict(list)
+            for tri in bm_tris:
+                face = tri[0].face
+                if len(face.loops) > 4:
+                    ngon_tris[face].append(tri)
+        return cls._corners_from_faces(bm.faces, ngon_tris)
+
     @classmethod
     def from_faces(cls, faces):
         """BMFaceのリストからLoopTrisを生成する。
         :rtype: LoopTris
         """
-        triloop_list = []
-        for face in faces:
-            tri_indices = cls.tessellate(face.loops)
-            triloop_list.extend([[face.loops[i] for i in tri]
-                                 for tri in tri_indices])
-        return cls(triloop_list)
+        looptris = cls()
+        looptris._set_corners(*cls._corners_from_faces(faces))
+        return looptris
 
     # Tessellate Polyline -----------------------------------------------------
     @classmethod
@@ -448,37 +652,52 @@ class LoopTris(list):
 
     def correct(self):
         """不正な面の修正。詳細はcorrect_tessellate()。完了後にソートを行う"""
-        face_tris_dict = self.face_dict()
-        corrected_tris = []
-        for face, looptris in face_tris_dict.items():
-            polyline = list(face.loops)
-            tri_indices = {
-                tuple([polyline.index(loop) for loop in looptri]): looptri
-                for looptri in looptris}
+        face_seq = self._face_seq
+        order = np.argsort(self._faces, kind='mergesort')
+        bounds = np.flatnonzero(np.diff(self._faces[order])) + 1
+        corners_list = self._corners.tolist()
+        src = []  # 元の三角形のインデックス。新規なら-1
+        faces = []
+        corners = []
+        for rows in np.split(order, bounds) if len(order) else []:
+            rows = rows.tolist()
+            f = int(self._faces[rows[0]])
+            if len(rows) == 1:
+                # 三角形の面
+                src.append(rows[0])
+                faces.append(f)
+                corners.append(corners_list[rows[0]])
+                continue
+            polyline = list(face_seq[f].loops)
+            tri_indices = {tuple(corners_list[i]): i for i in rows}
             result = self.correct_tessellate(polyline, list(tri_indices))
-
             for tri_index in result:
-                # 元のLoopTriをそのまま追加
-                if tri_index in tri_indices:
-                    corrected_tris.append(tri_indices[tri_index])
-                # 新規LoopTriを追加
-                else:
-                    tri = [polyline[i] for i in tri_index]
-                    corrected_tris.append(LoopTri(tri))
-        self[:] = corrected_tris
-        for tri in self:
-            tri.sort()
-        self.sort(key=lambda tri: tri[0].face.index)
+                src.append(tri_indices.get(tuple(tri_index), -1))
+                faces.append(f)
+                corners.append(tri_index)
+
+        num = len(src)
+        src = np.array(src, dtype=np.intp)
+        new = src == -1
+        normals = self._normals[src]
+        areas = self._areas[src]
+        self._set_data(np.array(faces, dtype=np.intp),
+                       np.sort(np.array(corners, dtype=np.intp).reshape(
+                           (num, 3)), axis=1),
+                       normals, areas)
+        if np.any(new):
+            self.update_normals_areas(np.flatnonzero(new))
+        face_indices = np.fromiter((face.index for face in face_seq),
+                                   dtype=np.intp, count=len(face_seq))
+        order = np.argsort(face_indices[self._faces], kind='mergesort')
+        self._set_data(*[arr[order] for arr in self._arrays()])
 
     # Generate from self ------------------------------------------------------
     def copy(self):
         """全てのLoopTriを複製
         :rtype: LoopTris
         """
-        other = self.__class__()
-        for tri in self:
-            other.append(tri.copy())
-        return other
+        return self._subset(np.arange(len(self)))
 
     def filter(self, verts=(), faces=(), loops=(), mode='or'):
         """各要素で絞り込んだ新しいインスタンスを返す。
@@ -496,9 +715,9 @@ class LoopTris(list):
         faces = set(faces) if faces else set()
         loops = set(loops) if loops else set()
 
-        tris = []
+        indices = []
 
-        for tri in self:
+        for index, tri in enumerate(self):
             if mode == 'or':
                 exist = False
                 if verts:
@@ -521,9 +740,9 @@ class LoopTris(list):
                     for loop in loops:
                         exist &= loop in tri
             if exist:
-                tris.append(tri)
+                indices.append(index)
 
-        return self.__class__(tris)
+        return self._subset(np.array(indices, dtype=np.intp))
 
     # Utils -------------------------------------------------------------------
     @staticmethod
@@ -668,6 +887,54 @@ class LoopTris(list):
                                                loop_dict[loop], fallback)
         return tangents
 
+    # 配列 --------------------------------------------------------------------
+    @memoize()
+    def arrays(self):
+        """配列表現を返す。self.bmが有ればそれから要素の総数を求める。
+        配列は呼び出し時の要素のインデックスで表すので、インデックスを
+        更新した場合はcache_clear('arrays')を呼ぶ事。
+        :rtype: LoopTriArrays
+        """
+        face_seq = self._face_seq
+        face_loops = [face.loops for face in face_seq]
+        sizes = np.fromiter((len(loops) for loops in face_loops),
+                            dtype=np.intp, count=len(face_loops))
+        starts = np.cumsum(sizes) - sizes
+        total = int(sizes.sum())
+
+        def loop_attr(func):
+            return np.fromiter(
+                (func(loop) for loops in face_loops for loop in loops),
+                dtype=np.intp, count=total)
+
+        loop_indices = loop_attr(lambda loop: loop.index)
+        vert_indices = loop_attr(lambda loop: loop.vert.index)
+        edge_indices = loop_attr(lambda loop: loop.edge.index)
+        face_indices = np.fromiter((face.index for face in face_seq),
+                                   dtype=np.intp, count=len(face_seq))
+
+        corners = self._corners
+        corners_next = np.roll(corners, -1, axis=1)
+        start = starts[self._faces][:, None]
+        size = sizes[self._faces][:, None]
+        # loop.edgeはloopとloop.link_loop_nextが成す辺
+        edges = np.full(corners.shape, -1, dtype=np.intp)
+        forward = (corners + 1) % size == corners_next
+        backward = (corners_next + 1) % size == corners
+        edges[backward] = edge_indices[(start + corners_next)[backward]]
+        edges[forward] = edge_indices[(start + corners)[forward]]
+
+        bm = self.bm
+        if bm is not None:
+            nums = (len(bm.verts), len(bm.edges), len(bm.faces),
+                    sum(len(efa.loops) for efa in bm.faces))
+        else:
+            nums = (None, None, None, None)
+        return LoopTriArrays(
+            loop_indices[start + corners], vert_indices[start + corners],
+            edges, face_indices[self._faces], self._normals.copy(),
+            self._areas.copy(), *nums)
+
     # 各キーからLoopTriを参照する辞書 -----------------------------------------
     @memoize()
     def vert_dict(self):
@@ -739,18 +1006,22 @@ class LoopTris(list):
         return d
 
     def cache_clear(self, *names):
-        """:param names: 関数オブジェクトか関数名のリスト"""
-        if names:
-            for function, cache in self._cache.items():
-                for name_or_func in names:
-                    if isinstance(name_or_func, str):
-                        if function.__name__ == name_or_func:
-                            cache.clear()
-                    else:
-                        if function == name_or_func._function:
-                            cache.clear()
-        else:
-            self._cache.clear()
+        """このインスタンスのキャッシュを破棄する。
+        :param names: 関数オブジェクトか関数名。省略すると全て
+        """
+        if not names:
+            self.memoize.clear(self)
+            return
+        for name in names:
+            if isinstance(name, str):
+                function = getattr(self.__class__, name)
+            else:
+                function = name
+            if isinstance(function, property):
+                function = function.fget
+            elif isinstance(function, types.MethodType):
+                function = function.__func__
+            self.memoize.clear(types.MethodType(function, self))
 
     # LoopTrisから各要素を抜き出してリストにして返す --------------------------
     @property
@@ -788,3 +1059,61 @@ class LoopTris(list):
             ((loop for loop in tri) for tri in self))))
         ls.sort(key=lambda l: l.index)
         return ls
+
+
+def _bench_looptris(num=100000, ngon_ratio=0.1):
+    """LoopTris(bm)の生成時間を計り、面毎の面積と法線をBMeshの
+    tessellationの結果と比較する。
+    num個程度の四角形の面を持つグリッドを作り、その内ngon_ratioの割合の
+    隣接する面を溶解して五角形以上の面にする。
+    :return: (生成時間, tessellationの時間, 面積の最大誤差, 法線の最大誤差)
+    :rtype: (float, float, float, float)
+    """
+    import time
+    import random
+
+    bm = bmesh.new()
+    n = max(int(math.sqrt(num)), 2)
+    bmesh.ops.create_grid(bm, x_segments=n, y_segments=n, size=1.0)
+    random.seed(0)
+    for eve in bm.verts:
+        eve.co.z = random.random() * 0.01
+    edges = [eed for eed in bm.edges if len(eed.link_faces) == 2]
+    edges = random.sample(edges, int(len(edges) * ngon_ratio / 2))
+    bmesh.ops.dissolve_edges(bm, edges=edges)
+    bm.normal_update()
+
+    def face_values(tris):
+        areas = defaultdict(float)
+        normals = defaultdict(Vector)
+        for tri in tris:
+            if not isinstance(tri, LoopTri):
+                tri = LoopTri(tri)
+            face = tri[0].face
+            areas[face] += tri.area
+            normals[face] += tri.normal * tri.area
+        return areas, normals
+
+    t = time.perf_counter()
+    looptris = LoopTris(bm)
+    t_new = time.perf_counter() - t
+    t = time.perf_counter()
+    if hasattr(bm, 'calc_loop_triangles'):
+        bm_tris = bm.calc_loop_triangles()
+    else:
+        bm_tris = bm.calc_tessface()
+    t_bm = time.perf_counter() - t
+
+    areas_new, normals_new = face_values(looptris)
+    areas_bm, normals_bm = face_values(bm_tris)
+    area_error = max(abs(areas_new[f] - areas_bm[f]) for f in bm.faces)
+    normal_error = max((normals_new[f].normalized() -
+                        normals_bm[f].normalized()).length
+                       for f in bm.faces)
+    print('faces: {}, tris: {} / {}'.format(len(bm.faces), len(looptris),
+                                             len(bm_tris)))
+    print('LoopTris: {:.3f}s, tessellation: {:.3f}s'.format(t_new, t_bm))
+    print('area error: {:g}, normal error: {:g}'.format(area_error,
+                                                        normal_error))
+    bm.free()
+    return t_new, t_bm, area_error, normal_error
@@ -0,0 +1,795 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+
+"""LoopTrisの配列表現(LoopTriArrays)と、それを用いた計算。
+要素は全てBMeshのインデックスで表す。bpyを読み込まないのでBlenderの外でも
+使える。
+"""
+
+
+import math
+
+import numpy as np
+
+
+FLT_EPSILON = 1.1920928955078125e-07
+# LoopTris.vert_tangent()の長さ調整の閾値
+ANGLE_THRESHOLD = math.radians(1.0)
+
+
+#==============================================================================
+# CSR
+#==============================================================================
+class Adjacency:
+    """CSR形式の隣接リスト。要素はインデックスで表す。
+    adj[i] -> 要素iに隣接する要素のインデックスの配列(昇順、重複無し)
+    """
+
+    def __init__(self, indptr, indices, mask=None):
+        """
+        :param indptr: shapeは(N + 1,)。adj[i]はindices[indptr[i]:indptr[i + 1]]
+        :type indptr: numpy.ndarray
+        :param indices: 隣接要素のインデックス
+        :type indices: numpy.ndarray
+        :param mask: shapeは(N,)。キーとして扱う要素。Noneなら全て
+        :type mask: numpy.ndarray
+        """
+        self.indptr = indptr
+        self.indices = indices
+        if mask is None:
+            mask = np.ones(len(indptr) - 1, dtype=bool)
+        self.mask = mask
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    def __getitem__(self, i):
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    def degrees(self):
+        return np.diff(self.indptr)
+
+    def keys(self):
+        """maskが真の要素のインデックスの配列を返す"""
+        return np.flatnonzero(self.mask)
+
+    def pairs(self):
+        """(src, dst)の配列を返す。両方向含む"""
+        src = np.repeat(np.arange(len(self)), self.degrees())
+        return src, self.indices
+
+    def to_dict(self, elems):
+        """xxx_dict()と同じ形式の辞書に変換する。
+        :param elems: インデックスで参照出来るシーケンス。BMVertSeq等。
+            BMeshの場合はensure_lookup_table()を実行しておく事
+        :rtype: dict
+        """
+        indptr = self.indptr
+        indices = self.indices.tolist()
+        return {elems[i]: [elems[j] for j in indices[indptr[i]:indptr[i + 1]]]
+                for i in self.keys().tolist()}
+
+    def components(self):
+        """連結成分を求める。maskが偽の要素は含めない。
+        成分は最小のインデックス順に、成分内はインデックス順に並ぶ。
+        :return: インデックスの配列のリスト
+        :rtype: list[numpy.ndarray]
+        """
+        num = len(self)
+        labels = np.arange(num)
+        src, dst = self.pairs()
+        while len(src):
+            # hook: 根を隣接する根の内の最小の物へ繋ぐ。ラベルは減少のみ
+            lsrc = labels[src]
+            ldst = labels[dst]
+            diff = lsrc != ldst
+            if not np.any(diff):
+                break
+            src = src[diff]
+            dst = dst[diff]
+            np.minimum.at(labels, lsrc[diff], ldst[diff])
+            # shortcut: 根を直接参照するようにする
+            while True:
+                l2 = labels[labels]
+                if np.array_equal(l2, labels):
+                    break
+                labels = l2
+        keys = self.keys()
+        labels = labels[keys]
+        order = np.argsort(labels, kind='mergesort')
+        labels = labels[order]
+        bounds = np.flatnonzero(labels[1:] != labels[:-1]) + 1
+        return np.split(keys[order], bounds) if len(keys) else []
+
+
+def _csr_expand(adj, rows):
+    """rowsの各行の要素を連結する。
+    :return: 要素がrowsの何番目に属するかを表す配列と要素の配列
+    :rtype: (numpy.ndarray, numpy.ndarray)
+    """
+    starts = adj.indptr[rows]
+    counts = adj.indptr[rows + 1] - starts
+    owners = np.repeat(np.arange(len(rows)), counts)
+    offsets = np.cumsum(counts) - counts
+    pos = np.repeat(starts - offsets, counts) + np.arange(counts.sum())
+    return owners, adj.indices[pos]
+
+
+#==============================================================================
+# Tangent
+#==============================================================================
+def normalize_rows(vecs):
+    """長さ0の行はそのままにして正規化する。
+    :return: 正規化したベクトルと元の長さ
+    :rtype: (numpy.ndarray, numpy.ndarray)
+    """
+    lengths = np.sqrt(np.einsum('ij,ij->i', vecs, vecs))
+    valid = lengths > 0.0
+    vecs = vecs.copy()
+    vecs[valid] /= lengths[valid, None]
+    return vecs, lengths
+
+
+def calc_vert_tangents(coords, verts, verts_prev, verts_next, arrays,
+                       tri_mask=None, angle_threshold=None):
+    """LoopTris.vert_tangent()の配列版。全ての頂点をまとめて計算する。
+    fallbackは0ベクトルとなる。
+    :param coords: shapeは(N, 3)。頂点座標
+    :type coords: numpy.ndarray
+    :param verts: shapeは(M,)。計算する頂点のインデックス
+    :type verts: numpy.ndarray
+    :param verts_prev: shapeは(M,)。vertsに接続する頂点
+    :type verts_prev: numpy.ndarray
+    :param verts_next: shapeは(M,)。vertsに接続する頂点
+    :type verts_next: numpy.ndarray
+    :type arrays: LoopTriArrays
+    :param tri_mask: shapeは(T,)。偽の三角形は使わない
+    :type tri_mask: numpy.ndarray
+    :param angle_threshold: Noneならば ANGLE_THRESHOLD
+    :type angle_threshold: float
+    :return: shapeは(M, 3)
+    :rtype: numpy.ndarray
+    """
+    if angle_threshold is None:
+        angle_threshold = ANGLE_THRESHOLD
+    coords = np.asarray(coords, dtype=float)
+    verts = np.asarray(verts, dtype=np.intp)
+    tangents = np.zeros((len(verts), 3))
+    if len(verts) == 0:
+        return tangents
+
+    co = coords[verts]
+    v_prev, l_prev = normalize_rows(coords[verts_prev] - co)
+    v_next, l_next = normalize_rows(coords[verts_next] - co)
+    valid = (l_prev > 0.0) & (l_next > 0.0)
+    # 両ベクトルの向きが同じ
+    same = valid & np.all(v_prev == v_next, axis=1)
+    tangents[same] = v_next[same]
+    valid &= ~same
+    no, _ = normalize_rows(v_next - v_prev)
+
+    # (頂点, 三角形)の組を作る
+    rows = np.flatnonzero(valid)
+    owners, tris = _csr_expand(arrays.vert_tris(), verts[rows])
+    owners = rows[owners]
+    if tri_mask is not None:
+        used = tri_mask[tris]
+        owners = owners[used]
+        tris = tris[used]
+    if len(tris) == 0:
+        return tangents
+
+    # 頂点を先頭にした時の残りの二頂点(tri[1], tri[2])
+    tri_verts = arrays.verts[tris]
+    head = np.argmax(tri_verts == verts[owners, None], axis=1)
+    index = np.arange(len(tris))
+    c1 = coords[tri_verts[index, (head + 1) % 3]]
+    c2 = coords[tri_verts[index, (head + 2) % 3]]
+
+    p_co = co[owners]
+    p_no = no[owners]
+    d1 = np.einsum('ij,ij->i', p_no, c1 - p_co)
+    d2 = np.einsum('ij,ij->i', p_no, c2 - p_co)
+    u = c2 - c1
+    denom = np.einsum('ij,ij->i', p_no, u)
+    hit = (np.any(u != 0.0, axis=1) & (d1 * d2 <= 0.0) &
+           (np.abs(denom) > FLT_EPSILON))
+    hit = np.flatnonzero(hit)
+    if len(hit) == 0:
+        return tangents
+
+    # 頂点毎に最初に交差した三角形を採用する
+    hit_owners = owners[hit]
+    first = np.ones(len(hit), dtype=bool)
+    first[1:] = hit_owners[1:] != hit_owners[:-1]
+    hit = hit[first]
+    hit_owners = hit_owners[first]
+
+    t = -d1[hit] / denom[hit]
+    v_inter = c1[hit] + u[hit] * t[:, None]
+    v, lengths = normalize_rows(v_inter - p_co[hit])
+
+    # 長さ調整
+    def angle(a, b):
+        return np.arccos(np.clip(np.einsum('ij,ij->i', a, b), -1.0, 1.0))
+
+    nonzero = lengths > 0.0
+    a1 = angle(v, v_prev[hit_owners])
+    a2 = angle(v, v_next[hit_owners])
+    f = np.abs(np.sin((a1 + a2) / 2))
+    scale = nonzero & (f > math.sin(angle_threshold))
+    v[scale] /= f[scale, None]
+    tangents[hit_owners] = v
+    return tangents
+
+
+#==============================================================================
+# LoopTriArrays
+#==============================================================================
+class LoopTriArrays:
+    """LoopTrisの配列表現。要素は全てBMeshのインデックスで表す。
+    作成前にLoopTris.index_update()でループも含めてインデックスを更新して
+    おく事。
+    vert_tris()等の逆引きはCSR形式(Adjacency)で、初回の呼び出し時に
+    生成する。
+    """
+
+    def __init__(self, loops, verts, edges, faces, normals, areas,
+                 num_verts=None, num_edges=None, num_faces=None,
+                 num_loops=None):
+        """
+        :param loops: shapeは(T, 3)。ループのインデックス
+        :param verts: shapeは(T, 3)。頂点のインデックス
+        :param edges: shapeは(T, 3)。tri[i]とtri[i + 1]が成す辺のインデックス。
+            面の辺でないなら-1
+        :param faces: shapeは(T,)。面のインデックス
+        :param normals: shapeは(T, 3)
+        :param areas: shapeは(T,)
+        :param num_verts: 頂点の総数。Noneならvertsの最大値+1。
+            num_edges, num_faces, num_loopsも同様
+        """
+        self.loops = loops
+        self.verts = verts
+        self.edges = edges
+        self.faces = faces
+        self.normals = normals
+        self.areas = areas
+
+        def num(value, arr):
+            if value is not None:
+                return value
+            return int(arr.max()) + 1 if arr.size else 0
+
+        self.num_verts = num(num_verts, verts)
+        self.num_edges = num(num_edges, edges)
+        self.num_faces = num(num_faces, faces)
+        self.num_loops = num(num_loops, loops)
+        self._maps = {}
+
+    def __len__(self):
+        return len(self.faces)
+
+    @classmethod
+    def from_looptris(cls, looptris, bm=None):
+        """
+        :type looptris: LoopTris | list[LoopTri]
+        :param bm: 指定すると各要素の総数をこれから求める
+        :type bm: BMesh
+        :rtype: LoopTriArrays
+        """
+        num = len(looptris)
+        loops = np.fromiter(
+            (loop.index for tri in looptris for loop in tri),
+            dtype=np.intp, count=num * 3).reshape((num, 3))
+        verts = np.fromiter(
+            (loop.vert.index for tri in looptris for loop in tri),
+            dtype=np.intp, count=num * 3).reshape((num, 3))
+        faces = np.fromiter((tri[0].face.index for tri in looptris),
+                            dtype=np.intp, count=num)
+
+        def edge_index(loop1, loop2):
+            if loop1.link_loop_next == loop2:
+                return loop1.edge.index
+            elif loop1.link_loop_prev == loop2:
+                return loop2.edge.index
+            else:
+                return -1
+
+        edges = np.fromiter(
+            (edge_index(tri[i], tri[(i + 1) % 3])
+             for tri in looptris for i in range(3)),
+            dtype=np.intp, count=num * 3).reshape((num, 3))
+        normals = np.array([tuple(tri.normal) for tri in looptris],
+                           dtype=float).reshape((num, 3))
+        areas = np.fromiter((tri.area for tri in looptris), dtype=float,
+                            count=num)
+        if bm is not None:
+            nums = (len(bm.verts), len(bm.edges), len(bm.faces),
+                    sum(len(efa.loops) for efa in bm.faces))
+        else:
+            nums = (None, None, None, None)
+        return cls(loops, verts, edges, faces, normals, areas, *nums)
+
+    @staticmethod
+    def calc_normals_areas(coords, verts):
+        """三角形の法線と面積を求める。
+        :param coords: shapeは(N, 3)。頂点座標
+        :param verts: shapeは(T, 3)
+        :return: 法線(正規化済み。縮退している物は0)と面積
+        :rtype: (numpy.ndarray, numpy.ndarray)
+        """
+        coords = np.asarray(coords, dtype=float)
+        v1, v2, v3 = (coords[verts[:, i]] for i in range(3))
+        cross = np.cross(v2 - v1, v3 - v1)
+        lengths = np.sqrt(np.einsum('ij,ij->i', cross, cross))
+        normals = np.zeros_like(cross)
+        valid = lengths > 0.0
+        normals[valid] = cross[valid] / lengths[valid, None]
+        return normals, lengths / 2
+
+    def update_normals_areas(self, coords):
+        """頂点座標から法線と面積を再計算する。
+        :param coords: shapeは(N, 3)
+        """
+        self.normals, self.areas = self.calc_normals_areas(coords,
+                                                           self.verts)
+
+    def corner_angles(self, coords):
+        """三角形の各頂点の内角。
+        :param coords: shapeは(N, 3)
+        :return: shapeは(T, 3)
+        :rtype: numpy.ndarray
+        """
+        tri_coords = np.asarray(coords, dtype=float)[self.verts]
+        vec1 = np.roll(tri_coords, -1, axis=1) - tri_coords
+        vec2 = np.roll(tri_coords, 1, axis=1) - tri_coords
+        vec1, _ = normalize_rows(vec1.reshape((-1, 3)))
+        vec2, _ = normalize_rows(vec2.reshape((-1, 3)))
+        dot = np.clip(np.einsum('ij,ij->i', vec1, vec2), -1.0, 1.0)
+        return np.arccos(dot).reshape((-1, 3))
+
+    def corner_weights(self, weight='NONE', coords=None):
+        """三角形の各頂点の重み。
+        :param weight: 'NONE': 全て1, 'AREA': 三角形の面積, 'ANGLE': 内角
+        :type weight: str
+        :param coords: 'ANGLE'の場合に必要。shapeは(N, 3)
+        :return: shapeは(T, 3)
+        :rtype: numpy.ndarray
+        """
+        if weight == 'AREA':
+            return np.repeat(self.areas[:, None], 3, axis=1)
+        elif weight == 'ANGLE':
+            return self.corner_angles(coords)
+        else:
+            return np.ones((len(self), 3))
+
+    def _accumulate_normals(self, elems, num, weight, coords, tri_mask):
+        weights = self.corner_weights(weight, coords)
+        if tri_mask is not None:
+            weights = weights * tri_mask[:, None]
+        elems = elems.ravel()
+        weights = weights.ravel()
+        normals = np.repeat(self.normals, 3, axis=0)
+        result = np.zeros((num, 3))
+        for i in range(3):
+            result[:, i] = np.bincount(elems, normals[:, i] * weights,
+                                       minlength=num)
+        totals = np.bincount(elems, weights, minlength=num)
+        valid = totals > 0.0
+        result[valid] /= totals[valid, None]
+        return result
+
+    def loop_normals(self, weight='NONE', coords=None, tri_mask=None):
+        """ループ毎に、それを含む三角形の法線の加重平均を求める。
+        正規化はしない。三角形が無いループは0ベクトルとなる。
+        :param weight: corner_weights()参照
+        :type weight: str
+        :param coords: weightが'ANGLE'の場合に必要
+        :type coords: numpy.ndarray
+        :param tri_mask: shapeは(T,)。偽の三角形は使わない
+        :type tri_mask: numpy.ndarray
+        :return: shapeは(num_loops, 3)
+        :rtype: numpy.ndarray
+        """
+        return self._accumulate_normals(self.loops, self.num_loops, weight,
+                                        coords, tri_mask)
+
+    def vert_normals(self, weight='ANGLE', coords=None, tri_mask=None):
+        """頂点毎に、それを含む三角形の法線の加重平均を求める。
+        正規化はしない。三角形が無い頂点は0ベクトルとなる。
+        :param weight: corner_weights()参照
+        :type weight: str
+        :param coords: weightが'ANGLE'の場合に必要
+        :type coords: numpy.ndarray
+        :param tri_mask: shapeは(T,)。偽の三角形は使わない
+        :type tri_mask: numpy.ndarray
+        :return: shapeは(num_verts, 3)
+        :rtype: numpy.ndarray
+        """
+        return self._accumulate_normals(self.verts, self.num_verts, weight,
+                                        coords, tri_mask)
+
+    def vert_pair_tris(self, verts1, verts2, tri_mask=None):
+        """頂点の組を辺に持つ三角形を求める(vert_pair_dict()の配列版)。
+        :param verts1: shapeは(M,)
+        :type verts1: numpy.ndarray
+        :param verts2: shapeは(M,)
+        :type verts2: numpy.ndarray
+        :param tri_mask: shapeは(T,)。偽の三角形は含めない
+        :type tri_mask: numpy.ndarray
+        :return: 三角形の数(shapeは(M,))と、三角形のインデックスを並べた
+            配列とその中での各組の開始位置(shapeは(M,))。
+            組iの三角形は tris[starts[i]:starts[i] + counts[i]] で、
+            インデックス順に並ぶ。
+        :rtype: (numpy.ndarray, numpy.ndarray, numpy.ndarray)
+        """
+        num = max(self.num_verts, 1)
+        v1 = self.verts
+        v2 = np.roll(self.verts, -1, axis=1)
+        keys = (np.minimum(v1, v2) * num + np.maximum(v1, v2)).ravel()
+        tris = np.repeat(np.arange(len(self)), 3)
+        if tri_mask is not None:
+            used = np.repeat(tri_mask, 3)
+            keys = keys[used]
+            tris = tris[used]
+        order = np.argsort(keys, kind='mergesort')
+        keys = keys[order]
+        tris = tris[order]
+        verts1 = np.asarray(verts1, dtype=np.intp)
+        verts2 = np.asarray(verts2, dtype=np.intp)
+        pair_keys = (np.minimum(verts1, verts2) * num +
+                     np.maximum(verts1, verts2))
+        starts = np.searchsorted(keys, pair_keys, 'left')
+        counts = np.searchsorted(keys, pair_keys, 'right') - starts
+        return counts, tris, starts
+
+    def _inverse_map(self, name, elems, num):
+        adj = self._maps.get(name)
+        if adj is None:
+            width = elems.shape[1] if elems.ndim == 2 else 1
+            elems = elems.ravel()
+            tris = np.arange(elems.size) // width
+            valid = elems >= 0
+            elems = elems[valid]
+            order = np.argsort(elems, kind='mergesort')
+            indptr = np.zeros(num + 1, dtype=np.intp)
+            np.cumsum(np.bincount(elems, minlength=num), out=indptr[1:])
+            adj = Adjacency(indptr, tris[valid][order])
+            self._maps[name] = adj
+        return adj
+
+    def vert_tris(self):
+        """頂点のインデックスから三角形のインデックスを参照する。
+        :rtype: Adjacency
+        """
+        return self._inverse_map('vert', self.verts, self.num_verts)
+
+    def edge_tris(self):
+        """辺のインデックスから三角形のインデックスを参照する。
+        面の辺になっている物のみ。
+        :rtype: Adjacency
+        """
+        return self._inverse_map('edge', self.edges, self.num_edges)
+
+    def face_tris(self):
+        """面のインデックスから三角形のインデックスを参照する。
+        :rtype: Adjacency
+        """
+        return self._inverse_map('face', self.faces, self.num_faces)
+
+    def loop_tris(self):
+        """ループのインデックスから三角形のインデックスを参照する。
+        :rtype: Adjacency
+        """
+        return self._inverse_map('loop', self.loops, self.num_loops)
+
+
+#==============================================================================
+# Offset Normal
+#==============================================================================
+def calc_vert_offset_normals(coords, edge_verts, arrays, vert_mask,
+                             tri_mask, face_select, calculation='all',
+                             tri_angle_threshold=math.radians(0.1),
+                             intersect_angle_threshold=math.radians(0.1)):
+    """頂点を法線方向へオフセットする為のベクトルを求める。
+    辺毎に両側の三角形から法線を求め、頂点に接続する辺の法線の組み合わせ
+    毎に法線方向へオフセットした辺同士の交点を求めて平均する。
+    :param coords: shapeは(N, 3)。頂点座標
+    :type coords: numpy.ndarray
+    :param edge_verts: shapeは(E, 2)。辺の両端の頂点
+    :type edge_verts: numpy.ndarray
+    :type arrays: LoopTriArrays
+    :param vert_mask: shapeは(N,)。真の頂点だけ計算する
+    :type vert_mask: numpy.ndarray
+    :param tri_mask: shapeは(T,)。偽の三角形は使わない
+    :type tri_mask: numpy.ndarray
+    :param face_select: shapeは(F,)。面の選択状態
+    :type face_select: numpy.ndarray
+    :param calculation: 'all', 'selected', 'deselected', 'individual'。
+        'all'と'deselected'以外では選択中の面の三角形だけを使う。
+        'deselected'では選択面と非選択面の境界で、非選択面の法線を選択面に
+        投影した物を使う
+    :type calculation: str
+    :param tri_angle_threshold: 辺の両側の三角形の法線がこれ以上の角度を
+        成す場合に辺の法線として扱う
+    :type tri_angle_threshold: float
+    :param intersect_angle_threshold: 二辺が成す角がこれ未満なら交点を求めず
+        法線の平均を用いる
+    :type intersect_angle_threshold: float
+    :return: 頂点のインデックス(昇順。shapeは(K,))とベクトル(shapeは(K, 3))
+    :rtype: (numpy.ndarray, numpy.ndarray)
+    """
+    coords = np.asarray(coords, dtype=float)
+    empty = (np.zeros(0, dtype=np.intp), np.zeros((0, 3)))
+
+    # 計算対象の頂点(verts)と、辺で接続する頂点(others)の組
+    verts = np.concatenate([edge_verts[:, 0], edge_verts[:, 1]])
+    others = np.concatenate([edge_verts[:, 1], edge_verts[:, 0]])
+    used = vert_mask[verts]
+    order = np.argsort(verts[used], kind='mergesort')
+    verts = verts[used][order]
+    others = others[used][order]
+    if len(verts) == 0:
+        return empty
+
+    # 辺の両側の三角形
+    face_select = face_select[arrays.faces]
+    if calculation not in ('all', 'deselected'):
+        tri_mask = tri_mask & face_select
+    counts, tris, starts = arrays.vert_pair_tris(verts, others, tri_mask)
+    one = counts == 1
+    two = counts == 2
+    tris = np.append(tris, [0, 0])  # 範囲外参照の回避
+    tri1 = tris[starts]
+    tri2 = tris[starts + 1]
+    n1 = arrays.normals[tri1]
+    n2 = arrays.normals[tri2]
+
+    edge_normals = np.zeros((len(verts), 3))
+    edge_normals_all = np.zeros((len(verts), 3))
+    edge_normals[one] = n1[one]
+    edge_normals_all[one] = n1[one]
+    if calculation != 'deselected':
+        has_normal = one.copy()
+    else:
+        has_normal = np.zeros(len(verts), dtype=bool)
+    has_normal_all = one | two
+
+    # x * cos(angle / 2) = 1.0
+    normal, _ = normalize_rows(n1 + n2)
+    angle = np.arccos(np.clip(np.einsum('ij,ij->i', n1, n2), -1.0, 1.0))
+    f = np.cos(angle / 2)
+    valid = f != 0.0
+    normal[valid] /= f[valid, None]
+    sharp = two & (angle > tri_angle_threshold)
+    if calculation == 'deselected':
+        # n1: sel, n2: desel。deselをselに投影
+        sel1 = face_select[tri1]
+        sel2 = face_select[tri2]
+        project = sharp & (sel1 ^ sel2)
+        v1 = np.where(sel2[:, None], n2, n1)
+        v2 = np.where(sel2[:, None], n1, n2)
+        dot = np.einsum('ij,ij->i', v1, v2)
+        sq = np.einsum('ij,ij->i', v2, v2)
+        sq[sq == 0.0] = 1.0
+        vec, _ = normalize_rows(v1 - v2 * (dot / sq)[:, None])
+        f = np.einsum('ij,ij->i', normalize_rows(v1)[0], vec)
+        valid = project & (f != 0.0)
+        vec[valid] /= f[valid, None]
+        normal[project] = vec[project]
+        has_normal |= project
+    else:
+        has_normal |= sharp
+    edge_normals[has_normal & two] = normal[has_normal & two]
+    edge_normals_all[two] = normal[two]
+
+    # 有効な辺の法線が無い頂点はedge_normals_allを使う
+    num_verts = len(coords)
+    use_all = np.bincount(verts[has_normal], minlength=num_verts) == 0
+    use_all = use_all[verts]
+    has_normal = np.where(use_all, has_normal_all, has_normal)
+    edge_normals = np.where(use_all[:, None], edge_normals_all,
+                            edge_normals)
+    verts = verts[has_normal]
+    others = others[has_normal]
+    edge_normals = edge_normals[has_normal]
+    if len(verts) == 0:
+        return empty
+
+    # 同じ頂点に属する辺の法線の全ての組み合わせ
+    head = np.ones(len(verts), dtype=bool)
+    head[1:] = verts[1:] != verts[:-1]
+    group_starts = np.flatnonzero(head)
+    group = np.cumsum(head) - 1
+    sizes = np.diff(np.append(group_starts, len(verts)))[group]
+    src = np.repeat(np.arange(len(verts)), sizes)
+    offsets = np.cumsum(sizes) - sizes
+    dst = (np.repeat(group_starts[group] - offsets, sizes) +
+           np.arange(len(src)))
+    pair = dst > src
+    src = src[pair]
+    dst = dst[pair]
+
+    #       v3 v5    v6
+    #     v4  \|_____|   |n2
+    # \n1   \ / v0   v2
+    #       v1
+    v0 = coords[verts[src]]
+    d1 = coords[others[src]] - v0
+    d2 = coords[others[dst]] - v0
+    en1 = edge_normals[src]
+    en2 = edge_normals[dst]
+    len1 = np.sqrt(np.einsum('ij,ij->i', d1, d1))
+    len2 = np.sqrt(np.einsum('ij,ij->i', d2, d2))
+    cos = np.einsum('ij,ij->i', -d1, d2)
+    denom = len1 * len2
+    cos[denom > 0.0] /= denom[denom > 0.0]
+    angle = np.arccos(np.clip(cos, -1.0, 1.0))
+    cross = np.cross(d1, d2)
+    div = np.einsum('ij,ij->i', cross, cross)
+    use_isect = ((denom > 0.0) & (div > 0.0) &
+                 (angle >= intersect_angle_threshold))
+
+    # v3-v4とv5-v6の最近点の中点
+    c = en2 - en1
+    div[~use_isect] = 1.0
+    s1 = np.einsum('ij,ij->i', np.cross(c, d2), cross) / div
+    s2 = np.einsum('ij,ij->i', np.cross(c, d1), cross) / div
+    isect = (en1 + d1 * s1[:, None] + en2 + d2 * s2[:, None]) / 2
+    # 平行な場合
+    l = (np.sqrt(np.einsum('ij,ij->i', en1, en1)) +
+         np.sqrt(np.einsum('ij,ij->i', en2, en2))) / 2
+    mean, _ = normalize_rows(en1 + en2)
+    mean *= l[:, None]
+    pair_normals = np.where(use_isect[:, None], isect, mean)
+
+    # 頂点毎に平均する。辺が一本ならその法線
+    num_groups = len(group_starts)
+    pair_group = group[src]
+    result = np.zeros((num_groups, 3))
+    for i in range(3):
+        result[:, i] = np.bincount(pair_group, pair_normals[:, i],
+                                   minlength=num_groups)
+    pair_counts = np.bincount(pair_group, minlength=num_groups)
+    multi = pair_counts > 0
+    result[multi] /= pair_counts[multi, None]
+    single = ~multi
+    result[single] = edge_normals[group_starts[single]]
+    return verts[group_starts], result
+
+
+def _quad_mesh_arrays(coords, quads):
+    """四角形の面から辺とLoopTriArraysを作る。面のループは面の順に並べ、
+    三角形は(0, 1, 2), (0, 2, 3)で分割する。テスト用。
+    :return: (edge_verts, arrays)
+    :rtype: (numpy.ndarray, LoopTriArrays)
+    """
+    quads = np.asarray(quads, dtype=np.intp)
+    num_faces = len(quads)
+    keys = np.sort(np.stack([quads, np.roll(quads, -1, axis=1)], axis=2),
+                   axis=2).reshape((-1, 2))
+    edge_verts, face_edges = np.unique(
+        keys[:, 0] * len(coords) + keys[:, 1], return_inverse=True)
+    edge_verts = np.column_stack(np.divmod(edge_verts, len(coords)))
+    face_edges = face_edges.reshape((num_faces, 4))
+
+    corners = np.array([[0, 1, 2], [0, 2, 3]])
+    faces = np.repeat(np.arange(num_faces), 2)
+    loops = faces[:, None] * 4 + np.tile(corners, (num_faces, 1))
+    verts = quads.ravel()[loops]
+    edges = np.full((num_faces, 2, 3), -1, dtype=np.intp)
+    edges[:, 0, 0] = face_edges[:, 0]
+    edges[:, 0, 1] = face_edges[:, 1]
+    edges[:, 1, 1] = face_edges[:, 2]
+    edges[:, 1, 2] = face_edges[:, 3]
+    normals, areas = LoopTriArrays.calc_normals_areas(coords, verts)
+    arrays = LoopTriArrays(loops, verts, edges.reshape((-1, 3)), faces,
+                           normals, areas, len(coords), len(edge_verts),
+                           num_faces, num_faces * 4)
+    return edge_verts, arrays
+
+
+def _test_offset_normals(seed=0):
+    """calc_vert_offset_normals(), LoopTriArrays.loop_normals()を
+    解析解の分かる形状で確かめる。Blender無しで実行できる。
+    回転・平行移動した立方体と、凹凸の無い格子を使う。
+    :return: 最大誤差
+    :rtype: float
+    """
+    rng = np.random.RandomState(seed)
+    errors = []
+
+    def check(result, expected):
+        verts, normals = result
+        if not np.array_equal(verts, np.flatnonzero(expected[1])):
+            raise AssertionError('vertices differ')
+        errors.append(np.abs(normals - expected[0][verts]).max())
+
+    # 立方体。頂点iの座標の各成分はiの各ビットで決まる
+    signs = np.array([[(i >> k) & 1 for k in range(3)] for i in range(8)],
+                     dtype=float) * 2 - 1
+    quads = []
+    for axis in range(3):
+        for value in (0, 1):
+            quad = [i for i in range(8) if (i >> axis) & 1 == value]
+            quad[2], quad[3] = quad[3], quad[2]
+            quads.append(quad)
+    # 外向きに揃える
+    for quad in quads:
+        cross = np.cross(signs[quad[1]] - signs[quad[0]],
+                         signs[quad[2]] - signs[quad[0]])
+        if np.dot(cross, signs[quad].sum(axis=0)) < 0.0:
+            quad.reverse()
+    q, _ = np.linalg.qr(rng.randn(3, 3))
+    coords = np.dot(signs * rng.uniform(0.5, 2.0), q.T) + rng.randn(3)
+    edge_verts, arrays = _quad_mesh_arrays(coords, quads)
+    tri_mask = np.ones(len(arrays), dtype=bool)
+    top = [i for i in range(8) if i & 4]
+    face_select = np.zeros(len(quads), dtype=bool)
+    face_select[[i for i, quad in enumerate(quads)
+                 if set(quad) == set(top)]] = True
+    vert_mask = np.zeros(8, dtype=bool)
+    vert_mask[top] = True
+    top_normal = np.tile(q[:, 2], (8, 1))
+
+    check(calc_vert_offset_normals(coords, edge_verts, arrays,
+                                   np.ones(8, dtype=bool), tri_mask,
+                                   face_select, 'all'),
+          (np.dot(signs, q.T), np.ones(8, dtype=bool)))
+    for calc in ('selected', 'deselected', 'individual'):
+        check(calc_vert_offset_normals(coords, edge_verts, arrays,
+                                       vert_mask, tri_mask, face_select,
+                                       calc),
+              (top_normal, vert_mask))
+    # 面の法線がループの法線になる
+    face_normals = np.array([arrays.normals[arrays.faces == i][0]
+                             for i in range(len(quads))])
+    errors.append(np.abs(arrays.loop_normals() -
+                         np.repeat(face_normals, 4, axis=0)).max())
+
+    # 格子。隠した頂点は計算しない
+    size = 6
+    n = size + 1
+    xs, ys = np.meshgrid(np.arange(n, dtype=float),
+                         np.arange(n, dtype=float))
+    coords = np.column_stack((xs.ravel(), ys.ravel(), np.zeros(n * n)))
+    idx = np.arange(n * n).reshape((n, n))
+    quads = np.column_stack((idx[:-1, :-1].ravel(), idx[:-1, 1:].ravel(),
+                             idx[1:, 1:].ravel(), idx[1:, :-1].ravel()))
+    edge_verts, arrays = _quad_mesh_arrays(coords, quads)
+    face_select = rng.rand(len(quads)) < 0.5
+    vert_mask = rng.rand(n * n) < 0.8
+    up = np.tile([0.0, 0.0, 1.0], (n * n, 1))
+    for calc in ('all', 'deselected'):
+        check(calc_vert_offset_normals(
+            coords, edge_verts, arrays, vert_mask,
+            np.ones(len(arrays), dtype=bool), face_select, calc),
+            (up, vert_mask))
+    tri_mask = face_select[arrays.faces]
+    selected = vert_mask & (np.bincount(arrays.verts[tri_mask].ravel(),
+                                        minlength=n * n) > 0)
+    for calc in ('selected', 'individual'):
+        check(calc_vert_offset_normals(
+            coords, edge_verts, arrays, vert_mask,
+            np.ones(len(arrays), dtype=bool), face_select, calc),
+            (up, selected))
+    error = max(errors)
+    if error > 1e-9:
+        raise AssertionError(error)
+    return error
@@ -23,6 +23,8 @@ from functools import reduce
 from collections import OrderedDict, Counter, defaultdict
 from itertools import combinations, chain
 
+import numpy as np
+
 import bpy
 from bpy.props import *
 import mathutils as Math
@@ -36,6 +38,7 @@ from ..localutils.checkargs import CheckArgs
 from . import vaview3d as vav
 from . import vautils as vau
 from . import vamath as vam
+from .triarrays import Adjacency
 
 
 """
@@ -76,7 +79,7 @@ def vert_verts_dict(bm=None, select=None, hide=None, verts=None, edges=None):
     return:     type:dict. key:BMVert value:接続するBMVertのリスト。
     """
 
-    if verts:
+    if verts is not None:
         verts = set(verts)
         vert_verts = {eve: [] for eve in verts}
         for eve in verts:
@@ -195,28 +198,269 @@ def face_faces_dict(bm=None, select=None, hide=None, faces=None,
     return face_faces
 
 
+def _is_mesh(bm):
+    return isinstance(bm, bpy.types.Mesh)
+
+
+def _mesh_attr(seq, attr, num, dtype):
+    arr = np.empty(len(seq) * num, dtype=dtype)
+    seq.foreach_get(attr, arr)
+    return arr
+
+
+def elem_mask(seq, select=None, hide=None):
+    """selectとhideの条件を満たす要素の真偽値の配列を返す。
+    :param seq: BMVertSeq, BMEdgeSeq, BMFaceSeq 若しくは
+        MeshVertices, MeshEdges, MeshPolygons
+    :rtype: numpy.ndarray
+    """
+    num = len(seq)
+    mask = np.ones(num, dtype=bool)
+    for attr, value in (('select', select), ('hide', hide)):
+        if value is None:
+            continue
+        if isinstance(seq, bpy.types.bpy_prop_collection):
+            arr = _mesh_attr(seq, attr, 1, bool)
+        else:
+            arr = np.fromiter((getattr(elem, attr) for elem in seq),
+                              dtype=bool, count=num)
+        mask &= arr if value else ~arr
+    return mask
+
+
+def edge_vert_indices(bm):
+    """辺の両端の頂点のインデックス。
+    BMeshの場合はindex_update()が実行済みである事。
+    :type bm: bmesh.types.BMesh | bpy.types.Mesh
+    :return: shapeは(E, 2)
+    :rtype: numpy.ndarray
+    """
+    if _is_mesh(bm):
+        arr = _mesh_attr(bm.edges, 'vertices', 2, np.int32)
+    else:
+        arr = np.fromiter((eve.index for eed in bm.edges for eve in eed.verts),
+                          dtype=np.int32, count=len(bm.edges) * 2)
+    return arr.reshape((-1, 2)).astype(np.intp)
+
+
+def face_link_indices(bm, link='VERT'):
+    """面とそれを構成する頂点若しくは辺の組を返す。
+    BMeshの場合はindex_update()が実行済みである事。
+    :type bm: bmesh.types.BMesh | bpy.types.Mesh
+    :param link: 'VERT' or 'EDGE'
+    :type link: str
+    :return: 面のインデックスの配列と頂点(辺)のインデックスの配列。
+        長さはループの総数
+    :rtype: (numpy.ndarray, numpy.ndarray)
+    """
+    if _is_mesh(bm):
+        starts = _mesh_attr(bm.polygons, 'loop_start', 1, np.int32)
+        totals = _mesh_attr(bm.polygons, 'loop_total', 1, np.int32)
+        attr = 'vertex_index' if link == 'VERT' else 'edge_index'
+        loop_links = _mesh_attr(bm.loops, attr, 1, np.int32)
+        offsets = np.cumsum(totals) - totals
+        loops = (np.repeat(starts - offsets, totals) +
+                 np.arange(totals.sum()))
+        links = loop_links[loops]
+    else:
+        totals = np.fromiter((len(efa.loops) for efa in bm.faces),
+                             dtype=np.int32, count=len(bm.faces))
+        if link == 'VERT':
+            it = (loop.vert.index for efa in bm.faces for loop in efa.loops)
+        else:
+            it = (loop.edge.index for efa in bm.faces for loop in efa.loops)
+        links = np.fromiter(it, dtype=np.int32, count=totals.sum())
+    faces = np.repeat(np.arange(len(totals)), totals)
+    return faces, links.astype(np.intp)
+
+
+def incidence_adjacency(num, elems, links):
+    """同じlinkを共有する要素同士を隣接しているとみなして隣接リストを作る。
+    例えば elems=頂点, links=辺 なら頂点の隣接、elems=辺, links=頂点 なら
+    頂点を共有する辺の隣接となる。
+    :param num: 要素の総数
+    :type num: int
+    :param elems: 要素のインデックスの配列
+    :type elems: numpy.ndarray
+    :param links: elemsと同じ長さの配列
+    :type links: numpy.ndarray
+    :rtype: Adjacency
+    """
+    elems = np.asarray(elems, dtype=np.intp)
+    links = np.asarray(links, dtype=np.intp)
+    indptr = np.zeros(num + 1, dtype=np.intp)
+    if len(elems) == 0:
+        return Adjacency(indptr, np.zeros(0, dtype=np.intp))
+
+    # linkでソートし、同じlink内の全ての組を生成する
+    order = np.lexsort((elems, links))
+    elems = elems[order]
+    links = links[order]
+    head = np.empty(len(links), dtype=bool)
+    head[0] = True
+    np.not_equal(links[1:], links[:-1], out=head[1:])
+    starts = np.flatnonzero(head)
+    group = np.cumsum(head) - 1
+    sizes = np.diff(np.append(starts, len(links)))[group]
+    src = np.repeat(elems, sizes)
+    offsets = np.cumsum(sizes) - sizes
+    pos = (np.repeat(starts[group] - offsets, sizes) +
+           np.arange(len(src)))
+    dst = elems[pos]
+
+    keys = src * num + dst
+    keys = keys[src != dst]
+    keys.sort()
+    if len(keys):
+        keys = keys[np.append(True, keys[1:] != keys[:-1])]
+    src = keys // num
+    dst = keys % num
+    np.cumsum(np.bincount(src, minlength=num), out=indptr[1:])
+    return Adjacency(indptr, dst)
+
+
+def vert_verts_csr(bm=None, select=None, hide=None, edge_verts=None,
+                   num=None):
+    """vert_verts_dictの配列版。
+    select:     True:選択中, False:非選択, None:全て
+    hide:       True:非表示, False:表示, None:全て
+    edge_verts: shapeが(E, 2)の頂点インデックスの配列。これを指定した場合は
+                bmとselectとhideは無視され、辺に含まれる頂点がキーとなる。
+    num:        edge_verts使用時の頂点数。Noneならedge_vertsの最大値+1
+    BMeshの場合はbm.verts.index_update()が実行済みである事。
+    
+    :type bm: bmesh.types.BMesh | bpy.types.Mesh
+    :rtype: Adjacency
+    """
+    if edge_verts is not None:
+        edge_verts = np.asarray(edge_verts, dtype=np.intp).reshape((-1, 2))
+        if num is None:
+            num = int(edge_verts.max()) + 1 if len(edge_verts) else 0
+        edge_mask = None
+        vert_mask = np.zeros(num, dtype=bool)
+        vert_mask[edge_verts.ravel()] = True
+    else:
+        if _is_mesh(bm):
+            verts, edges = bm.vertices, bm.edges
+        else:
+            verts, edges = bm.verts, bm.edges
+        num = len(verts)
+        edge_verts = edge_vert_indices(bm)
+        edge_mask = elem_mask(edges, select, hide)
+        vert_mask = elem_mask(verts, select, hide)
+        edge_verts = edge_verts[edge_mask]
+    elems = edge_verts.ravel()
+    links = np.repeat(np.arange(len(edge_verts)), 2)
+    adj = incidence_adjacency(num, elems, links)
+    adj.mask = vert_mask
+    return adj
+
+
+def edge_edges_csr(bm=None, select=None, hide=None, edge_verts=None):
+    """edge_edges_dictの配列版。頂点を共有する辺を隣接とみなす。
+    select:     True:選択中, False:非選択, None:全て
+    hide:       True:非表示, False:表示, None:全て
+    edge_verts: shapeが(E, 2)の頂点インデックスの配列。これを指定した場合は
+                bmとselectとhideは無視される。
+    BMeshの場合はbm.verts.index_update()が実行済みである事。
+    
+    :type bm: bmesh.types.BMesh | bpy.types.Mesh
+    :rtype: Adjacency
+    """
+    if edge_verts is not None:
+        edge_verts = np.asarray(edge_verts, dtype=np.intp).reshape((-1, 2))
+        edge_mask = np.ones(len(edge_verts), dtype=bool)
+    else:
+        edge_verts = edge_vert_indices(bm)
+        edge_mask = elem_mask(bm.edges, select, hide)
+    edges = np.flatnonzero(edge_mask)
+    elems = np.repeat(edges, 2)
+    links = edge_verts[edges].ravel()
+    adj = incidence_adjacency(len(edge_verts), elems, links)
+    adj.mask = edge_mask
+    return adj
+
+
+def face_faces_csr(bm=None, select=None, hide=None, face_links=None,
+                   num=None, connect_vert=False):
+    """face_faces_dictの配列版。
+    select:       True:選択中, False:非選択, None:全て
+    hide:         True:非表示, False:表示, None:全て
+    face_links:   face_link_indices()の返り値と同形式の
+                  (面インデックスの配列, 頂点又は辺インデックスの配列)。
+                  これを指定した場合はbmとselectとhideとconnect_vertは無視される。
+    num:          face_links使用時の面の数。Noneなら最大値+1
+    connect_vert: Trueなら頂点を共有している面同士は隣接しているとみなす。
+                  Falseなら辺を共有している面のみ対象。
+    BMeshの場合はconnect_vertに応じてbm.verts若しくはbm.edgesの
+    index_update()が実行済みである事。
+    
+    :type bm: bmesh.types.BMesh | bpy.types.Mesh
+    :rtype: Adjacency
+    """
+    if face_links is not None:
+        faces, links = (np.asarray(a, dtype=np.intp) for a in face_links)
+        if num is None:
+            num = int(faces.max()) + 1 if len(faces) else 0
+        face_mask = np.ones(num, dtype=bool)
+    else:
+        if _is_mesh(bm):
+            polygons = bm.polygons
+        else:
+            polygons = bm.faces
+        num = len(polygons)
+        faces, links = face_link_indices(
+            bm, 'VERT' if connect_vert else 'EDGE')
+        face_mask = elem_mask(polygons, select, hide)
+        used = face_mask[faces]
+        faces = faces[used]
+        links = links[used]
+    adj = incidence_adjacency(num, faces, links)
+    adj.mask = face_mask
+    return adj
+
+
 #==============================================================================
 # Connect
 #==============================================================================
+def _linked_keys_list(linked_dict):
+    """{key: [key, ...], ...} の連結成分を求め、キーの二次元リストを返す"""
+    keys = list(linked_dict)
+    key_index = {key: i for i, key in enumerate(keys)}
+    adjacency = [[key_index[k] for k in linked_dict[key] if k in key_index]
+                 for key in keys]
+    return localutils.utils.groupwith(keys, adjacency=adjacency)
+
+
 def linked_vertices_list(bm=None, select=None, hide=None,
                          verts=None, edges=None):
-    """辺で繋がった頂点の二次元リストを返す"""
+    """辺で繋がった頂点の二次元リストを返す。
+    vertsとedgesを省略した場合はbm.verts.index_update()が実行済みである事。
+    """
+    if verts is None and edges is None:
+        adj = vert_verts_csr(bm, select=select, hide=hide)
+        bm.verts.ensure_lookup_table()
+        return [[bm.verts[i] for i in group.tolist()]
+                for group in adj.components()]
     vert_verts = vert_verts_dict(bm, select=select, hide=hide,
                                  verts=verts, edges=edges)
-    def key(v1, v2, data):
-        return v1 in data[v2] or v2 in data[v1]
-    return localutils.utils.groupwith(vert_verts.keys(), key, vert_verts)
-
+    return _linked_keys_list(vert_verts)
 
 
 def linked_faces_list(bm=None, select=None, hide=None, faces=None,
                       connect_vert=False):
-    """繋がった面の二次元のリストを返す。"""
+    """繋がった面の二次元のリストを返す。
+    facesを省略した場合はface_faces_csr()と同様にインデックスが更新済みで
+    ある事。
+    """
+    if faces is None:
+        adj = face_faces_csr(bm, select, hide, connect_vert=connect_vert)
+        bm.faces.ensure_lookup_table()
+        return [[bm.faces[i] for i in group.tolist()]
+                for group in adj.components()]
     face_faces = face_faces_dict(bm, select, hide, faces=faces,
                                  connect_vert=connect_vert)
-    def key(f1, f2, data):
-        return f1 in data[f2] or f2 in data[f1]
-    return localutils.utils.groupwith(face_faces.keys(), key, face_faces)
+    return _linked_keys_list(face_faces)
 
 
 #==============================================================================
@@ -281,6 +525,8 @@ def make_face_outline_paths(bm=None, select=None, hide=None, faces=None,
                   これを指定した場合はbmとselectとhideは無視される。
     connect_vert: Trueなら頂点を共有している面同士は隣接しているとみなす。
                   Falseなら辺を共有している面のみ対象。
+    facesを省略した場合はlinked_faces_list()と同様にインデックスが
+    更新済みである事。
     
     return:       Pathのリスト。
     """
@@ -1387,8 +1387,21 @@ def group_masses(masses, group_type='aabb', expand=0.0):
             return check_obb_intersection_3d(bb1[0], bb1[1], bb2[0], bb2[1])
         else:
             return check_obb_intersection_2d(bb1[0], bb1[1], bb2[0], bb2[1])
+
+    # OBBを囲むAABBが重なる組のみ判定する
+    mins = []
+    maxs = []
+    for mat, scale in bbs:
+        m = np.array(mat)
+        center = m[:dimension, dimension]
+        half = np.dot(np.abs(m[:dimension, :dimension]),
+                      np.array(scale) / 2)
+        mins.append((center - half).tolist())
+        maxs.append((center + half).tolist())
+    candidates = localutils.utils.bounds_overlap_pairs(mins, maxs)
+
     groups = []
-    localutils.utils.groupwith(bbs, key, order=groups)
+    localutils.utils.groupwith(bbs, key, order=groups, candidates=candidates)
 
     return groups
 
@@ -162,46 +162,17 @@ def project_np(region, rv3d, array):
     """numpyを用いる。
     World Coords (3D) -> Window Coords (3D).
     Window座標は左手系で、Zのクリッピング範囲は0~1。
+    計算はRegionProjector.project()で行う。
     :type region: bpy.types.Rgeion
     :type rv3d: bpy.types.RegionView3D
     :param array: 4次まで
     :type array: numpy.ndarray
     """
-    # shapeを(N,4)に変更する
-    if not isinstance(array, np.ndarray):
-        array = np.array(array)
-    shape = shape_bak = array.shape
-    if len(shape) > 2:
-        raise ValueError()
-    if len(shape) == 1:
-        array = array.reshape((1, shape[0]))
-        shape = array.shape
-    if shape[1] > 4:
-        raise ValueError()
-    if shape[1] != 4:
-        arr = np.zeros((shape[0], 4))
-        arr[:, 3] = 1.0
-        arr[:, :shape[1]] = array
-        array = arr
-
-    mat = np.array(rv3d.perspective_matrix)
-    # arr = np.dot(mat, array.transpose()).transpose()
-    # 上記の方法だと結果は正しいけどarr.baseの要素の並び順が転置されている
-    arr = np.dot(array, mat.transpose())
-
-    flags = abs(arr[:, 3]) > PROJECT_MIN_NUMBER
-    arr[flags] /= arr[flags][:, 3].reshape((-1, 1))
-
-    arr += 1.0
-    arr[:, 0] *= region.width * 0.5
-    arr[:, 1] *= region.height * 0.5
-    arr[:, 2] *= 0.5
-
-    if len(shape_bak) == 1:
-        arr.shape = (-1,)
-        return arr[0][:3]
+    arr = region_projector(region, rv3d).project(array)
+    if np.ndim(array) == 1 and len(arr):
+        return arr[0]
     else:
-        return arr[:, :3]
+        return arr
 
 
 def test_project_np(context):
@@ -232,56 +203,18 @@ def test_project_np(context):
 def unproject_np(region, rv3d, array, depth_location=None):
     """Window Coords (2D / 3D) -> World Coords (3D).
     Window座標は左手系で、Zのクリッピング範囲は0~1。
+    計算はRegionProjector.unproject()で行う。
     :type region: bpy.types.Rgeion
     :type rv3d: bpy.types.RegionView3D
     :param array: 3次まで
     :type array: numpy.ndarray
     :type depth_location: numpy.ndarray
     """
-    # shapeを(N,4)に変更する
-    do_copy = True
-    if not isinstance(array, np.ndarray):
-        array = np.array(array)
-        do_copy = False
-    shape = shape_bak = array.shape
-    if len(shape) > 2:
-        raise ValueError()
-    if len(shape) == 1:
-        array = array.reshape((1, shape[0]))
-        shape = array.shape
-    if shape[1] > 3:
-        raise ValueError()
-    if shape[1] != 4:
-        arr = np.zeros((shape[0], 4))
-        arr[:, 3] = 1.0
-        arr[:, :shape[1]] = array
-        array = arr
-        do_copy = False
-    if do_copy:
-        array = array.copy()
-
-    array[:, 0] *= 2.0 / region.width
-    array[:, 1] *= 2.0 / region.height
-    if depth_location is not None:
-        v = project_np(region, rv3d, depth_location)
-        array[:, 2] = v[:, 2] * 2.0
-    else:
-        array[:, 2] *= 2.0
-    array[:, :3] -= 1.0
-    if shape_bak[-1] == 2:
-        array[:, 2] = 0.0
-
-    mat = np.array(rv3d.perspective_matrix)
-    m = np.linalg.inv(mat)
-    arr = np.dot(array, m.transpose())
-    flags = abs(arr[:, 3]) > PROJECT_MIN_NUMBER
-    arr[flags] /= arr[flags][:, 3].reshape((-1, 1))
-
-    if len(shape_bak) == 1:
-        arr.shape = (-1,)
-        return arr[0][:3]
+    arr = region_projector(region, rv3d).unproject(array, depth_location)
+    if np.ndim(array) == 1 and len(arr):
+        return arr[0]
     else:
-        return arr[:, :3]
+        return arr
 
 
 def test_unproject_np(context):
@@ -309,6 +242,101 @@ def test_unproject_np(context):
     print('ok')
 
 
+class RegionProjector:
+    """World Coords <-> Window Coords の変換をnumpyの配列で纏めて行う。
+    perspective_matrixとregionの大きさを保持する。region_projector()で
+    取得すれば描画毎に一度だけ生成される。
+    """
+
+    def __init__(self, region, rv3d):
+        self.sx = region.width
+        self.sy = region.height
+        self.persmat = np.array(rv3d.perspective_matrix)
+        self._persinv = None
+
+    @staticmethod
+    def _to_4d(array, max_size=4):
+        """shapeを(N, 4)にした配列を返す。足りない成分は0、wは1とする。
+        空のシーケンスは0行の配列になる。
+        """
+        array = np.asarray(array, dtype=np.float64)
+        if array.ndim == 1:
+            if len(array):
+                array = array.reshape((1, -1))
+            else:
+                array = array.reshape((0, max_size))
+        if array.ndim != 2 or array.shape[1] > max_size:
+            raise ValueError('shape {} is not supported'.format(array.shape))
+        arr = np.zeros((len(array), 4))
+        arr[:, 3] = 1.0
+        arr[:, :array.shape[1]] = array
+        return arr
+
+    def project(self, array):
+        """World Coords (3D) -> Window Coords (3D)。
+        :param array: shapeが(N, 3)又は(N, 4)の配列かVectorのシーケンス
+        :rtype: numpy.ndarray
+        """
+        arr = np.dot(self._to_4d(array), self.persmat.T)
+        w = arr[:, 3:]
+        flags = np.abs(w[:, 0]) > PROJECT_MIN_NUMBER
+        arr[flags] /= w[flags]
+        arr[:, :3] += 1.0
+        arr[:, 0] *= self.sx * 0.5
+        arr[:, 1] *= self.sy * 0.5
+        arr[:, 2] *= 0.5
+        return arr[:, :3]
+
+    def project_vectors(self, vecs):
+        """projectの結果をVectorのリストで返す。
+        :rtype: list[Vector]
+        """
+        return [Vector(v) for v in self.project(vecs)]
+
+    def unproject(self, array, depth_location=None):
+        """Window Coords (2D / 3D) -> World Coords (3D)。
+        二次元の場合のZはクリッピング範囲の中央とする。
+        :param array: shapeが(N, 2)又は(N, 3)の配列かVectorのシーケンス
+        :param depth_location: World Coords。Zをこの点を投影した値とする
+        :rtype: numpy.ndarray
+        """
+        if self._persinv is None:
+            self._persinv = np.linalg.inv(self.persmat)
+        arr = self._to_4d(array, 3)
+        arr[:, 0] *= 2.0 / self.sx
+        arr[:, 1] *= 2.0 / self.sy
+        if depth_location is not None:
+            arr[:, 2] = self.project(depth_location)[:, 2]
+        arr[:, 2] *= 2.0
+        arr[:, :3] -= 1.0
+        if depth_location is None and np.shape(array)[-1] == 2:
+            arr[:, 2] = 0.0
+        arr = np.dot(arr, self._persinv.T)
+        w = arr[:, 3:]
+        flags = np.abs(w[:, 0]) > PROJECT_MIN_NUMBER
+        arr[flags] /= w[flags]
+        return arr[:, :3]
+
+
+_region_projector = [None, None]  # [key, RegionProjector]
+
+
+def region_projector(region, rv3d):
+    """regionとperspective_matrixが前回と同じならその時のRegionProjectorを
+    返す。
+    :type region: bpy.types.Region
+    :type rv3d: bpy.types.RegionView3D
+    :rtype: RegionProjector
+    """
+    persmat = rv3d.perspective_matrix
+    key = (region.as_pointer(), region.width, region.height,
+           tuple(persmat.col[0]) + tuple(persmat.col[1]) +
+           tuple(persmat.col[2]) + tuple(persmat.col[3]))
+    if _region_projector[0] != key:
+        _region_projector[:] = [key, RegionProjector(region, rv3d)]
+    return _region_projector[1]
+
+
 def project_v3(sx, sy, persmat, vec) -> "3D Vector":
     """World Coords -> Window Coords. projectより少しだけ速い。"""
     v = persmat * vec.to_4d()
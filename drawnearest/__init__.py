@@ -40,6 +40,7 @@ import enum
 import functools
 import importlib
 import inspect
+import itertools
 import numpy as np
 import math
 
@@ -54,10 +55,12 @@ import blf
 try:
     importlib.reload(structures)
     importlib.reload(utils)
+    importlib.reload(screenfind)
 except NameError:
     pass
 from .structures import *
 from .utils import AddonPreferences, SpaceProperty, operator_call
+from . import screenfind
 
 
 # glVertexへ渡すZ値。
@@ -218,6 +221,15 @@ class DrawNearestPreferences(
         description='Use mesh->edit_btmesh->derivedCage',
         default=False,
     )
+    # unified_findnearest()はderivedCageの座標を使うが、こちらはBMeshの
+    # 座標を投影する。モディファイアのケージ表示中は位置がずれる
+    use_screen_space = bpy.props.BoolProperty(
+        name='Screen Space Search',
+        description='Search projected elements without '
+                    'bpy.ops.view3d.select (ignores occlusion and the '
+                    'modifier cage, uses edit mesh coordinates)',
+        default=False,
+    )
 
     def draw(self, context):
         split = self.layout.split()
@@ -273,6 +285,9 @@ class DrawNearestPreferences(
         sub = col.column()
         sub.active = test_platform()
         sub.prop(self, 'use_internal')
+        sub = col.column()
+        sub.active = not (test_platform() and self.use_internal)
+        sub.prop(self, 'use_screen_space')
 
 
 ###############################################################################
@@ -1150,6 +1165,113 @@ def find_nearest(context, context_dict, bm, mco_region):
     return active
 
 
+screen_finders = {}
+""":type: dict[int, screenfind.ScreenSpaceFinder]"""
+
+screen_select_stamps = {}
+"""screen_findersに最後に渡した選択状態のbmesh_select_stamp()
+:type: dict[int, tuple]"""
+
+
+def bmesh_screen_arrays(bm):
+    """ScreenSpaceFinder.set_mesh()に渡す配列を作る。
+    要素のインデックスは更新済みである事。
+    :type bm: bmesh.types.BMesh
+    :rtype: dict
+    """
+    verts, edges, faces = bm.verts, bm.edges, bm.faces
+    coords = np.fromiter(itertools.chain.from_iterable(
+        v.co for v in verts), np.float64, len(verts) * 3)
+    edge_verts = np.fromiter(
+        (v.index for e in edges for v in e.verts), np.intp, len(edges) * 2)
+    face_indptr = np.zeros(len(faces) + 1, dtype=np.intp)
+    face_indptr[1:] = np.cumsum(np.fromiter(
+        (len(f.verts) for f in faces), np.intp, len(faces)))
+    face_verts = np.fromiter(
+        (v.index for f in faces for v in f.verts), np.intp, face_indptr[-1])
+
+    arrays = {
+        'coords': coords.reshape((-1, 3)),
+        'edge_verts': edge_verts.reshape((-1, 2)),
+        'face_indptr': face_indptr,
+        'face_verts': face_verts,
+        'vert_hide': bmesh_flags(verts, 'hide'),
+        'edge_hide': bmesh_flags(edges, 'hide'),
+        'face_hide': bmesh_flags(faces, 'hide'),
+    }
+    arrays.update(bmesh_select_masks(bm))
+    return arrays
+
+
+def bmesh_flags(seq, attr):
+    """:rtype: numpy.ndarray"""
+    return np.fromiter((getattr(elem, attr) for elem in seq), bool, len(seq))
+
+
+def bmesh_select_stamp(bm):
+    """選択状態が変わったかの判定に用いる。選択数と選択履歴が同じまま
+    選択する要素だけが入れ替わった場合は検出できない。
+    要素への参照を残さないよう、選択履歴はhash()(要素のアドレス)で表す。
+    :type bm: bmesh.types.BMesh
+    :rtype: tuple
+    """
+    return (bm.total_vert_sel, bm.total_edge_sel, bm.total_face_sel,
+            tuple(hash(elem) for elem in bm.select_history))
+
+
+def bmesh_select_masks(bm):
+    """ScreenSpaceFinder.set_select()に渡す配列を作る。
+    :type bm: bmesh.types.BMesh
+    :rtype: dict
+    """
+    return {'vert_select': bmesh_flags(bm.verts, 'select'),
+            'edge_select': bmesh_flags(bm.edges, 'select')}
+
+
+def find_nearest_screen(context, bm, region, rv3d, mco_region,
+                        update_mesh=True):
+    """find_nearest()と同じ要素を、投影した座標のBVHから探す。
+    OSやバックバッファに依存しないが、遮蔽は考慮しない。
+    derivedCageではなくBMeshの座標を投影する。
+    :type context: bpy.types.Context
+    :type bm: bmesh.types.BMesh
+    :type region: bpy.types.Region
+    :type rv3d: bpy.types.RegionView3D
+    :param update_mesh: 偽なら前回読み込んだメッシュをそのまま使う。
+        選択状態はObject.is_updatedに反映されないので、
+        bmesh_select_stamp()が変わった時に読み直す
+    :type update_mesh: bool
+    :rtype: bmesh.types.BMVert | bmesh.types.BMEdge | bmesh.types.BMFace
+    """
+    ob = context.active_object
+    key = ob.data.as_pointer()
+    # 編集中でなくなったメッシュの分は保持しない
+    for k in [k for k in screen_finders if k != key]:
+        del screen_finders[k]
+        screen_select_stamps.pop(k, None)
+    finder = screen_finders.get(key)
+    if finder is None:
+        finder = screen_finders[key] = screenfind.ScreenSpaceFinder()
+        update_mesh = True
+    finder.set_view(rv3d.perspective_matrix * ob.matrix_world,
+                    (region.width, region.height))
+    stamp = bmesh_select_stamp(bm)
+    if update_mesh:
+        bm.verts.index_update()
+        bm.edges.index_update()
+        bm.faces.index_update()
+        finder.set_mesh(**bmesh_screen_arrays(bm))
+    elif stamp != screen_select_stamps.get(key):
+        finder.set_select(**bmesh_select_masks(bm))
+    screen_select_stamps[key] = stamp
+    elem_type, index = finder.find_nearest(mco_region, bm.select_mode)
+    if elem_type is None:
+        return None
+    seq = {'VERT': bm.verts, 'EDGE': bm.edges, 'FACE': bm.faces}[elem_type]
+    seq.ensure_lookup_table()
+    return seq[index]
+
+
 def find_loop_selection(context, context_dict, bm, mco_region, ring, toggle):
     """
     :type context: bpy.types.Context
@@ -1262,7 +1384,129 @@ class DMForeachFlag(enum.IntEnum):
     DM_FOREACH_USE_NORMAL = (1 << 0)
 
 
-dm_cache = {}
+DM_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+
+class DMCache:
+    """DerivedMeshから取り出した配列をメッシュ毎に保持するLRUキャッシュ。
+
+    各エントリは (DerivedMeshのアドレス, 世代) のスタンプを持ち、
+    get_dm_attr()で現在のスタンプと一致しなければ破棄して作り直す。
+    世代はinvalidate()で進める(scene_update_preでメッシュの更新を
+    検出した時に呼ぶ)。合計バイト数がmax_bytesを超えたら最も長く
+    使われていないメッシュのエントリから捨てる。
+
+    DerivedMesh自身のメモリはmodifierの再評価で解放されるので参照しない。
+    ctypesの配列は必ず複製し、numpy配列はその複製へのビューとして作る
+    (ビューのバイト数は二重に数えない)。
+    """
+
+    class Entry:
+        def __init__(self, stamp):
+            self.stamp = stamp
+            self.values = {}
+            self.nbytes = 0
+
+    def __init__(self, max_bytes=DM_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = collections.OrderedDict()  # {mesh_addr: Entry}
+        self.generations = {}  # {mesh_addr: int}
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _key(mesh):
+        if isinstance(mesh, int):
+            return mesh
+        return mesh.as_pointer()
+
+    @classmethod
+    def value_nbytes(cls, value):
+        """キャッシュする値が所有するメモリのバイト数"""
+        if isinstance(value, np.ndarray):
+            # 他のバッファへのビューは0
+            return value.nbytes if value.base is None else 0
+        elif isinstance(value, ctypes.Array):
+            return sizeof(value)
+        elif isinstance(value, (tuple, list)):
+            return sum(cls.value_nbytes(v) for v in value)
+        else:
+            return 0
+
+    def __contains__(self, mesh):
+        return self._key(mesh) in self.entries
+
+    def __delitem__(self, mesh):
+        entry = self.entries.pop(self._key(mesh))
+        self.nbytes -= entry.nbytes
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        self.entries.clear()
+        self.generations.clear()
+        self.nbytes = 0
+
+    def invalidate(self, mesh):
+        """世代を進めてメッシュのエントリを破棄する"""
+        key = self._key(mesh)
+        self.generations[key] = self.generations.get(key, 0) + 1
+        if key in self.entries:
+            del self[key]
+            self.invalidations += 1
+
+    def entry(self, mesh, dm):
+        """スタンプが一致するエントリを返す。無ければ作る。
+        :rtype: DMCache.Entry
+        """
+        key = self._key(mesh)
+        stamp = (addressof(dm), self.generations.get(key, 0))
+        entry = self.entries.get(key)
+        if entry is not None and entry.stamp != stamp:
+            del self[key]
+            self.invalidations += 1
+            entry = None
+        if entry is None:
+            entry = self.entries[key] = self.Entry(stamp)
+        else:
+            self.entries.move_to_end(key)
+        return entry
+
+    def store(self, entry, attr, value):
+        nbytes = self.value_nbytes(value)
+        entry.values[attr] = value
+        entry.nbytes += nbytes
+        self.nbytes += nbytes
+        self.evict(keep=entry)
+
+    def evict(self, keep=None):
+        """max_bytes以下になるまで古いエントリを捨てる。keepは残す"""
+        for key in list(self.entries):
+            if self.nbytes <= self.max_bytes:
+                break
+            if self.entries[key] is keep:
+                continue
+            del self[key]
+            self.evictions += 1
+
+    def stats(self):
+        """:rtype: dict"""
+        return {
+            'entries': len(self.entries),
+            'nbytes': self.nbytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+        }
+
+
+dm_cache = DMCache()
 
 
 def get_dm(mesh):
@@ -1278,15 +1522,179 @@ def get_dm(mesh):
     return None
 
 
-def get_dm_attr(mesh, dm, attr):
-    mesh_addr = mesh.as_pointer()
-    if mesh_addr not in dm_cache:
-        dm_cache[mesh_addr] = {}
-    cache = dm_cache[mesh_addr]
-    dm_p = pointer(dm)
+def make_origindex_map(arr, num=0):
+    """派生要素のorigindexの配列から、元の要素のインデックスで派生要素の
+    インデックスを引く為の(order, offsets)を作る。
+    元の要素iに対応する派生要素は order[offsets[i]:offsets[i + 1]] で、
+    インデックス順に並ぶ。
+    :param arr: '*_origindex_np_array'。Noneなら派生要素と元の要素が
+        一致するとみなし、num個の要素の恒等写像を返す
+    :type arr: numpy.ndarray | None
+    :param num: arrがNoneの場合の要素数
+    :type num: int
+    :rtype: (numpy.ndarray, numpy.ndarray)
+    """
+    if arr is None:
+        return np.arange(num), np.arange(num + 1)
+    order = np.argsort(arr, kind='mergesort')
+    sorted_arr = arr[order]
+    if len(sorted_arr) and sorted_arr[-1] >= 0:
+        num = int(sorted_arr[-1]) + 1
+    else:
+        num = 0
+    offsets = np.searchsorted(sorted_arr, np.arange(num + 1))
+    return order, offsets
+
+
+def lookup_origindex_map(origindex_map, index):
+    """元の要素のインデックスから派生要素のインデックスの配列を返す。
+    :type origindex_map: (numpy.ndarray, numpy.ndarray)
+    :type index: int
+    :rtype: numpy.ndarray
+    """
+    order, offsets = origindex_map
+    if 0 <= index < len(offsets) - 1:
+        return order[offsets[index]:offsets[index + 1]]
+    else:
+        return order[:0]
+
 
+def struct_array_field(arr, struct, name, dtype):
+    """ctypesの構造体の配列から一つのフィールドを取り出してnumpy.ndarrayにする。
+    :param arr: structの配列
+    :param struct: ctypes.Structureのサブクラス
+    :param name: フィールド名
+    :param dtype: フィールドの型に対応するnumpyの型
+    :rtype: numpy.ndarray
+    """
+    field = getattr(struct, name)
+    if len(arr) == 0:
+        return np.zeros(0, dtype=dtype)
+    raw = np.frombuffer(arr, dtype=np.uint8).reshape((len(arr),
+                                                      sizeof(struct)))
+    column = raw[:, field.offset:field.offset + field.size]
+    return np.ascontiguousarray(column).view(dtype).ravel()
+
+
+def calc_dm_face_centers(dm_type, vert_coords, face_array, loop_array,
+                         face_origindex):
+    """DerivedMesh.foreachMappedFaceCenter()と同じ結果を、コピー済みの
+    頂点・ループ・面の配列から求める。
+    DM_TYPE_CCGDMなら元の面毎にsubsurfの面の中心の頂点の座標を、それ以外なら
+    派生面毎に頂点座標の平均を返す。
+    origindexがORIGINDEX_NONEの派生面は含めない。
+    :param vert_coords: (N, 3) 'vert_coords_np_array'
+    :type vert_coords: numpy.ndarray
+    :param face_origindex: 'face_origindex_np_array'。Noneなら派生面と元の面が
+        一致しているとみなす
+    :type face_origindex: numpy.ndarray | None
+    :return: 元の面のインデックスの配列(昇順)と中心座標の配列
+    :rtype: (numpy.ndarray, numpy.ndarray)
+    """
+    num_faces = len(face_array)
+    coords = vert_coords.astype(np.float64)
+    loopstart = struct_array_field(face_array, MPoly, 'loopstart', np.int32)
+    totloop = struct_array_field(face_array, MPoly, 'totloop', np.int32)
+    loop_verts = struct_array_field(loop_array, MLoop, 'v', np.uint32)
+    if face_origindex is None:
+        face_origindex = np.arange(num_faces)
+
+    mapped = np.flatnonzero(face_origindex != ORIGINDEX_NONE)
+    order = mapped[np.argsort(face_origindex[mapped], kind='mergesort')]
+    if dm_type == DerivedMeshType.DM_TYPE_CCGDM:
+        # subsurf: 元の面毎に一つ。派生面は元の面のグリッド毎に並んでいて、
+        # 各グリッドの最初の派生面のループは面の中心の頂点から始まる
+        # (ccgDM_copyFinalLoopArray()参照)
+        origindex = face_origindex[order]
+        if len(order):
+            head = np.append(True, origindex[1:] != origindex[:-1])
+        else:
+            head = np.zeros(0, dtype=bool)
+        first_faces = order[head]
+        verts = loop_verts[loopstart[first_faces]].astype(np.intp)
+        return origindex[head], coords[verts]
+
+    # 派生面毎に頂点座標の平均を求める
+    offsets = np.cumsum(totloop) - totloop
+    loops = np.repeat(loopstart - offsets, totloop) + np.arange(totloop.sum())
+    loop_faces = np.repeat(np.arange(num_faces), totloop)
+    loop_coords = coords[loop_verts[loops].astype(np.intp)]
+    centers = np.empty((num_faces, 3))
+    for i in range(3):
+        centers[:, i] = np.bincount(loop_faces, loop_coords[:, i],
+                                    minlength=num_faces)
+    centers /= np.maximum(totloop, 1)[:, None]
+    return face_origindex[order], centers[order]
+
+
+def _test_dm_face_centers(max_level=4):
+    """subsurfの派生面と同じ並びの配列を作り、calc_dm_face_centers()が
+    元の面の中心の頂点を返すか確かめる。Blender無しで実行できる。
+    頂点はz = x ** 2 + y ** 2上に置くので、派生面の平均を取ると中心が
+    z = 0からずれる(level 2: 0.75, level 3: 0.6875)。
+    :return: 失敗したlevelのリスト
+    :rtype: list[int]
+    """
+    # 元の面: 原点を中心とする正方形と、それに隣接する三角形
+    polys = [[(-1, -1), (1, -1), (1, 1), (-1, 1)],
+             [(1, -1), (3, 0), (1, 1)]]
+    failures = []
+    for level in range(1, max_level + 1):
+        grid_size = (1 << (level - 1)) + 1
+        vert_indices = {}
+        face_loops = []
+        face_origindex = []
+        for face_index, corners in enumerate(polys):
+            n = len(corners)
+            center = np.mean(corners, axis=0)
+            for s in range(n):
+                # グリッドS: 中心, 辺S-1の中点, 角S, 辺Sの中点
+                corner = np.array(corners[s], dtype=np.float64)
+                prev_mid = (corner + corners[s - 1]) / 2
+                next_mid = (corner + corners[(s + 1) % n]) / 2
+
+                def vert(x, y):
+                    u, v = x / (grid_size - 1), y / (grid_size - 1)
+                    co = ((1 - u) * (1 - v) * center + u * (1 - v) * next_mid +
+                          u * v * corner + (1 - u) * v * prev_mid)
+                    key = tuple(np.round(co, 6).tolist())
+                    return vert_indices.setdefault(key, len(vert_indices))
+
+                for y in range(grid_size - 1):
+                    for x in range(grid_size - 1):
+                        face_loops.append([vert(x, y), vert(x + 1, y),
+                                           vert(x + 1, y + 1),
+                                           vert(x, y + 1)])
+                        face_origindex.append(face_index)
+        coords = np.zeros((len(vert_indices), 3), dtype=np.float32)
+        for (x, y), i in vert_indices.items():
+            coords[i] = (x, y, x ** 2 + y ** 2)
+        face_array = (MPoly * len(face_loops))()
+        loop_array = (MLoop * (4 * len(face_loops)))()
+        for i, loops in enumerate(face_loops):
+            face_array[i].loopstart = 4 * i
+            face_array[i].totloop = 4
+            for j, v in enumerate(loops):
+                loop_array[4 * i + j].v = v
+        origindex, centers = calc_dm_face_centers(
+            DerivedMeshType.DM_TYPE_CCGDM, coords, face_array, loop_array,
+            np.array(face_origindex, dtype=np.int32))
+        expected = [np.mean(corners, axis=0) for corners in polys]
+        expected = np.array([(x, y, x ** 2 + y ** 2) for x, y in expected])
+        if (origindex.tolist() != list(range(len(polys))) or
+                not np.allclose(centers, expected, atol=1e-5)):
+            failures.append(level)
+    return failures
+
+
+def get_dm_attr(mesh, dm, attr):
+    entry = dm_cache.entry(mesh, dm)
+    cache = entry.values
     if attr in cache:
+        dm_cache.hits += 1
         return cache[attr]
+    dm_cache.misses += 1
+    dm_p = pointer(dm)
 
     if attr == 'type':
         value = dm.type
@@ -1320,7 +1728,7 @@ def get_dm_attr(mesh, dm, attr):
     elif attr == 'vert_origindex_array':
         num_verts = get_dm_attr(mesh, dm, 'num_verts')
         if dm.type == DerivedMeshType.DM_TYPE_EDITBMESH:
-            value = (c_int * num_verts)(*range(num_verts))
+            value = np.arange(num_verts, dtype=np.int32)
         else:
             arr = dm.getVertDataArray(dm_p, CustomDataType.CD_ORIGINDEX)
             if arr:
@@ -1331,7 +1739,7 @@ def get_dm_attr(mesh, dm, attr):
     elif attr == 'edge_origindex_array':
         num_edges = get_dm_attr(mesh, dm, 'num_edges')
         if dm.type == DerivedMeshType.DM_TYPE_EDITBMESH:
-            value = (c_int * num_edges)(*range(num_edges))
+            value = np.arange(num_edges, dtype=np.int32)
         else:
             arr = dm.getEdgeDataArray(dm_p, CustomDataType.CD_ORIGINDEX)
             if arr:
@@ -1342,7 +1750,7 @@ def get_dm_attr(mesh, dm, attr):
     elif attr == 'face_origindex_array':
         num_faces = get_dm_attr(mesh, dm, 'num_faces')
         if dm.type == DerivedMeshType.DM_TYPE_EDITBMESH:
-            value = (c_int * num_faces)(*range(num_faces))
+            value = np.arange(num_faces, dtype=np.int32)
         else:
             arr = dm.getPolyDataArray(dm_p, CustomDataType.CD_ORIGINDEX)
             if arr:
@@ -1351,42 +1759,53 @@ def get_dm_attr(mesh, dm, attr):
             else:
                 value = None
 
-    elif attr in {'face_center_origindex_np_array', 'face_center_np_array'}:
-        # 1007616個の要素: 4.0s
-        queue = collections.deque()
-        P = POINTER(c_float)
-        def callback(userData, index, cent, no):
-            # この方法だと12.0s
-            # queue = cast(c_void_p(userData), py_object).value
-            # v = list(cast(c_void_p(cent), POINTER(c_float * 3)).contents)
-            # queue.append((index, v))
-            x = cast(cent, P)
-            queue.append((index, (x[0], x[1], x[2])))
-            return 0
-        func = CFUNCTYPE(c_int, c_void_p, c_int, c_void_p, c_void_p)(callback)
-        dm.foreachMappedFaceCenter(dm_p, func, id(queue),
-                                   DMForeachFlag.DM_FOREACH_NOP)
-
-        face_center_origindex_np_array = np.array(
-                [i for i, v in queue], dtype=np.int)
-        sort_order = np.argsort(face_center_origindex_np_array)
-        face_center_origindex_np_array = \
-            face_center_origindex_np_array[sort_order]
-        cache['face_center_origindex_np_array'] = \
-            face_center_origindex_np_array
-
-        face_center_np_array = np.array([v for i, v in queue], dtype=np.float)
-        face_center_np_array = face_center_np_array[sort_order]
-        cache['face_center_np_array'] = face_center_np_array
+    elif attr == 'vert_coords_np_array':
+        # 複製済みのvert_coordsへのビュー(コピーしない)
+        vert_coords = get_dm_attr(mesh, dm, 'vert_coords')
+        if len(vert_coords):
+            value = np.frombuffer(vert_coords, dtype=np.float32).reshape(
+                (-1, 3))
+        else:
+            value = np.zeros((0, 3), dtype=np.float32)
+    elif attr in {'vert_origindex_np_array', 'edge_origindex_np_array',
+                  'face_origindex_np_array'}:
+        # 同上。origindexが無ければNone
+        arr = get_dm_attr(mesh, dm, attr.replace('_np_array', '_array'))
+        if arr is None or isinstance(arr, np.ndarray):
+            value = arr
+        else:
+            value = np.ctypeslib.as_array(arr)
+
+    elif attr in {'vert_origindex_map', 'edge_origindex_map',
+                  'face_origindex_map', 'face_center_origindex_map'}:
+        # 元の要素のインデックス -> 派生要素のインデックス
+        array_attr = attr[:-len('_map')] + '_np_array'
+        # origindexが無い場合に要素数が必要になる
+        num = get_dm_attr(mesh, dm, 'num_{}s'.format(attr.split('_')[0]))
+        value = make_origindex_map(get_dm_attr(mesh, dm, array_attr), num)
 
+    elif attr in {'face_center_origindex_np_array', 'face_center_np_array'}:
+        # 旧実装はforeachMappedFaceCenter()のコールバックで集めていた
+        # (1007616個の要素: 4.0s)
+        face_center_origindex_np_array, face_center_np_array = \
+            calc_dm_face_centers(
+                dm.type,
+                get_dm_attr(mesh, dm, 'vert_coords_np_array'),
+                get_dm_attr(mesh, dm, 'face_array'),
+                get_dm_attr(mesh, dm, 'loop_array'),
+                get_dm_attr(mesh, dm, 'face_origindex_np_array'))
         if attr == 'face_center_origindex_np_array':
             value = face_center_origindex_np_array
+            dm_cache.store(entry, 'face_center_np_array',
+                           face_center_np_array)
         else:
             value = face_center_np_array
+            dm_cache.store(entry, 'face_center_origindex_np_array',
+                           face_center_origindex_np_array)
     else:
         raise KeyError(attr)
 
-    cache[attr] = value
+    dm_cache.store(entry, attr, value)
     return value
 
 
@@ -1454,21 +1873,23 @@ def get_dm_elems(mesh, bm, elems, require_face_centers):
     vert_origindex_array = get_dm_attr(mesh, dm, 'vert_origindex_array')
     if bmesh.types.BMVert in elem_types:
         # vert_array = get_dm_attr(mesh, dm, 'vert_array')
-        pass
+        vert_origindex_map = get_dm_attr(mesh, dm, 'vert_origindex_map')
     if bmesh.types.BMEdge in elem_types:
         edge_array = get_dm_attr(mesh, dm, 'edge_array')
         edge_origindex_array = get_dm_attr(mesh, dm, 'edge_origindex_array')
+        edge_origindex_map = get_dm_attr(mesh, dm, 'edge_origindex_map')
     if bmesh.types.BMFace in elem_types:
         edge_array = get_dm_attr(mesh, dm, 'edge_array')
         face_array = get_dm_attr(mesh, dm, 'face_array')
         loop_array = get_dm_attr(mesh, dm, 'loop_array')
         edge_origindex_array = get_dm_attr(mesh, dm, 'edge_origindex_array')
         face_origindex_array = get_dm_attr(mesh, dm, 'face_origindex_array')
+        face_origindex_map = get_dm_attr(mesh, dm, 'face_origindex_map')
         if require_face_centers:
             face_center_np_array = get_dm_attr(
                     mesh, dm, 'face_center_np_array')
-            face_center_origindex_np_array = get_dm_attr(
-                    mesh, dm, 'face_center_origindex_np_array')
+            face_center_origindex_map = get_dm_attr(
+                    mesh, dm, 'face_center_origindex_map')
 
     # 要素の二番目は派生元のelemのindex。無けれはNone
     dm_vert_elems = {}
@@ -1480,15 +1901,14 @@ def get_dm_elems(mesh, bm, elems, require_face_centers):
         elem_index = elem.index
 
         if isinstance(elem, bmesh.types.BMVert):
-            orig_index_array = vert_origindex_array
+            origindex_map = vert_origindex_map
         elif isinstance(elem, bmesh.types.BMEdge):
-            orig_index_array = edge_origindex_array
+            origindex_map = edge_origindex_map
         else:
-            orig_index_array = face_origindex_array
+            origindex_map = face_origindex_map
 
         derived_indices = {}
-        arr = np.ctypeslib.as_array(orig_index_array)
-        for i in np.nonzero(arr == elem_index)[0]:
+        for i in lookup_origindex_map(origindex_map, elem_index).tolist():
             derived_indices[i] = elem_index
 
         if isinstance(elem, bmesh.types.BMVert):
@@ -1529,8 +1949,9 @@ def get_dm_elems(mesh, bm, elems, require_face_centers):
                 dm_edge_elems[i] = ((e.v1, e.v2), orig_index)
 
             if require_face_centers:
-                arr = face_center_origindex_np_array == elem.index
-                for i in np.nonzero(arr)[0]:
+                indices = lookup_origindex_map(face_center_origindex_map,
+                                               elem_index)
+                for i in indices.tolist():
                     vec = Vector(face_center_np_array[i])
                     dm_face_center_elems[i] = (vec, elem.index)
 
@@ -2335,6 +2756,10 @@ class VIEW3D_OT_draw_nearest_element(bpy.types.Operator):
             if use_internal:
                 elem = find_nearest_ctypes(
                         context, context_dict, bm, mco_region)
+            elif prefs.use_screen_space:
+                elem = find_nearest_screen(
+                        context, bm, region, rv3d, mco_region,
+                        data['object_is_updated'])
             else:
                 elem = find_nearest(context, context_dict, bm, mco_region)
             elems = [elem] if elem else []
@@ -2378,8 +2803,7 @@ class VIEW3D_OT_draw_nearest_element(bpy.types.Operator):
         do_dm_cache_updated = False
         if elems:
             if prefs.use_derived_mesh and data['do_dm_cache_update']:
-                if mesh.as_pointer() in dm_cache:
-                    del dm_cache[mesh.as_pointer()]
+                dm_cache.invalidate(mesh)
                 data['do_dm_cache_update'] = False
                 do_dm_cache_updated = True
             # index_update()はほぼ無視できる処理時間。10万ポリで1e-5以下
@@ -2546,6 +2970,7 @@ def scene_update_pre(scene):
                     dm_updated):
                 data['object_is_updated'] = True
                 data['do_dm_cache_update'] = True
+                dm_cache.invalidate(ob.data)
                 data['dm_address'] = dm_address
                 data['dm_num_elems'] = dm_num_elems
 
@@ -2573,6 +2998,8 @@ def load_pre(dummy):
     # オブジェクトは開放しておかないとアドレスが再利用された場合に不具合になる
     VIEW3D_OT_draw_nearest_element.unregister()
     dm_cache.clear()
+    screen_finders.clear()
+    screen_select_stamps.clear()
 
 
 classes = [
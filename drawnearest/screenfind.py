@@ -0,0 +1,681 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+
+"""Region座標に投影した頂点・辺・面中心からマウスに最も近い要素を探す。
+bpy.ops.view3d.select()やctypes経由の関数を使わないので、OSや
+OpenGLのバックバッファに依存しない。bpyを読み込まないのでBlenderの外でも
+使える。
+
+遮蔽は考慮しない(X線表示と同じ扱いになる)。
+"""
+
+
+import heapq
+import math
+
+import numpy as np
+
+
+# ED_view3d_select_dist_px() (U.pixelsize == 1)
+SELECT_DIST_PX = 75.0
+# editmesh_select.c: FIND_NEAR_SELECT_BIAS
+FIND_NEAR_SELECT_BIAS = 5.0
+# 投影時にwがこれ以下なら視点の後ろとみなす
+CLIP_W_EPSILON = 1e-5
+
+
+def morton_codes(points, bits=16):
+    """二次元座標をbitsビットに量子化してZ順序の値にする。
+    :type points: numpy.ndarray
+    :rtype: numpy.ndarray
+    """
+    codes = np.zeros(len(points), dtype=np.uint64)
+    if len(points) == 0:
+        return codes
+    lo = points.min(axis=0)
+    size = np.maximum(points.max(axis=0) - lo, 1e-12)
+    scale = (1 << bits) - 1
+    q = ((points - lo) / size * scale).astype(np.uint64)
+    for bit in range(bits):
+        for axis in range(2):
+            b = (q[:, axis] >> np.uint64(bit)) & np.uint64(1)
+            codes |= b << np.uint64(2 * bit + axis)
+    return codes
+
+
+def point_box_distance(x, y, bounds):
+    """点から矩形(xmin, ymin, xmax, ymax)までの距離。内部なら0。
+    空の矩形(xmin > xmax)は無限大になる。
+    :type bounds: numpy.ndarray
+    :rtype: numpy.ndarray | float
+    """
+    dx = np.maximum(np.maximum(bounds[..., 0] - x, x - bounds[..., 2]), 0.0)
+    dy = np.maximum(np.maximum(bounds[..., 1] - y, y - bounds[..., 3]), 0.0)
+    return np.sqrt(dx * dx + dy * dy)
+
+
+def point_segment_distance(x, y, p1, p2):
+    """点から線分群までの距離。
+    :type p1: numpy.ndarray
+    :type p2: numpy.ndarray
+    :rtype: numpy.ndarray
+    """
+    d = p2 - p1
+    length_sq = (d * d).sum(axis=1)
+    t = ((x - p1[:, 0]) * d[:, 0] + (y - p1[:, 1]) * d[:, 1])
+    t = np.clip(t / np.maximum(length_sq, 1e-12), 0.0, 1.0)
+    px = p1[:, 0] + d[:, 0] * t - x
+    py = p1[:, 1] + d[:, 1] * t - y
+    return np.sqrt(px * px + py * py)
+
+
+class ScreenBVH:
+    """二次元の矩形に対するBVH。
+    プリミティブを矩形中心のZ順序で並べ、leaf_size個ずつを葉にした
+    完全二分木。ノードの矩形は階層毎の配列に持つ。
+    """
+
+    def __init__(self, bounds, indices=None, leaf_size=8):
+        """
+        :param bounds: (N, 4) xmin, ymin, xmax, ymax
+        :type bounds: numpy.ndarray
+        :param indices: プリミティブの番号。省略時は0 ~ N-1
+        :type indices: numpy.ndarray
+        :type leaf_size: int
+        """
+        bounds = np.asarray(bounds, dtype=np.float64).reshape((-1, 4))
+        if indices is None:
+            indices = np.arange(len(bounds))
+        self.leaf_size = leaf_size
+        valid = np.isfinite(bounds).all(axis=1)
+        centers = (bounds[valid, :2] + bounds[valid, 2:]) / 2
+        order = np.argsort(morton_codes(centers), kind='mergesort')
+        self.indices = np.asarray(indices)[valid][order]
+        """:type: numpy.ndarray"""
+        num_leaves = max(1, -(-len(self.indices) // leaf_size))
+        self.depth = int(math.ceil(math.log(num_leaves, 2)))
+        self.leaf_ptr = np.minimum(
+            np.arange((1 << self.depth) + 1) * leaf_size,
+            len(self.indices))
+        self.levels = []
+        """:type: list[numpy.ndarray]"""
+        self.refit(bounds[valid][order], sorted_bounds=True)
+
+    def __len__(self):
+        return len(self.indices)
+
+    def refit(self, bounds, sorted_bounds=False):
+        """並び順はそのままで各ノードの矩形を作り直す。
+        :param bounds: 全プリミティブの矩形。sorted_boundsが真なら
+            self.indicesの順に並べた物
+        :type bounds: numpy.ndarray
+        """
+        if not sorted_bounds:
+            bounds = bounds[self.indices]
+        num_leaves = 1 << self.depth
+        leaves = np.empty((num_leaves, 4))
+        leaves[:, :2] = np.inf
+        leaves[:, 2:] = -np.inf
+        starts = self.leaf_ptr[:-1]
+        used = starts < self.leaf_ptr[-1]
+        if len(bounds):
+            leaves[used, :2] = np.minimum.reduceat(bounds[:, :2],
+                                                   starts[used])
+            leaves[used, 2:] = np.maximum.reduceat(bounds[:, 2:],
+                                                   starts[used])
+        levels = [leaves]
+        while len(levels[-1]) > 1:
+            child = levels[-1]
+            parent = np.empty((len(child) // 2, 4))
+            parent[:, :2] = np.minimum(child[0::2, :2], child[1::2, :2])
+            parent[:, 2:] = np.maximum(child[0::2, 2:], child[1::2, 2:])
+            levels.append(parent)
+        levels.reverse()
+        self.levels = levels
+
+    def nearest(self, x, y, prim_distance, max_dist=np.inf):
+        """(x, y)に最も近いプリミティブを探す。
+        :param prim_distance: プリミティブ番号の配列を受け取り、
+            距離の配列を返す関数
+        :type prim_distance: (numpy.ndarray) -> numpy.ndarray
+        :param max_dist: これ未満の物だけを対象にする
+        :return: (プリミティブ番号, 距離)。見つからなければ(-1, max_dist)
+        :rtype: (int, float)
+        """
+        best_index = -1
+        best_dist = max_dist
+        if len(self.indices) == 0:
+            return best_index, best_dist
+        heap = [(float(point_box_distance(x, y, self.levels[0][0])), 0, 0)]
+
+        def reachable(d):
+            # 距離が等しい物は番号の小さい方を選ぶので同距離も辿る
+            if best_index == -1:
+                return d < best_dist
+            return d <= best_dist
+
+        while heap:
+            d, level, node = heapq.heappop(heap)
+            if not reachable(d):
+                break
+            if level == self.depth:
+                prims = self.indices[self.leaf_ptr[node]:
+                                     self.leaf_ptr[node + 1]]
+                dists = prim_distance(prims)
+                d = float(dists.min())
+                if reachable(d):
+                    i = int(prims[dists == d].min())
+                    if d < best_dist or i < best_index:
+                        best_index = i
+                        best_dist = d
+            else:
+                children = self.levels[level + 1][2 * node:2 * node + 2]
+                for i, cd in enumerate(point_box_distance(x, y, children)):
+                    if reachable(cd):
+                        heapq.heappush(heap,
+                                       (float(cd), level + 1, 2 * node + i))
+        return best_index, best_dist
+
+    def overlap(self, x, y):
+        """矩形が(x, y)を含むプリミティブの番号を返す。
+        :rtype: numpy.ndarray
+        """
+        if len(self.indices) == 0:
+            return self.indices
+        nodes = np.zeros(1, dtype=np.intp)
+        for level in range(self.depth + 1):
+            b = self.levels[level][nodes]
+            hit = ((b[:, 0] <= x) & (x <= b[:, 2]) &
+                   (b[:, 1] <= y) & (y <= b[:, 3]))
+            nodes = nodes[hit]
+            if level < self.depth:
+                nodes = np.column_stack((2 * nodes, 2 * nodes + 1)).ravel()
+        if len(nodes) == 0:
+            return self.indices[:0]
+        return np.concatenate([
+            self.indices[self.leaf_ptr[i]:self.leaf_ptr[i + 1]]
+            for i in nodes.tolist()])
+
+
+class ScreenSpaceFinder:
+    """メッシュの頂点・辺・面中心をRegion座標に投影して保持し、
+    unified_findnearest()と同じ優先順位で要素を探す。
+
+    set_mesh()は前回と座標を比べ、変化した頂点とそれに接する辺・面だけを
+    再投影する。set_view()で視点が変わった時は全てを再投影してBVHを
+    作り直す。
+    """
+
+    def __init__(self):
+        self.persmat = None
+        self.region_size = None
+        self.coords = np.zeros((0, 3))
+        self.edge_verts = np.zeros((0, 2), dtype=np.intp)
+        self.face_indptr = np.zeros(1, dtype=np.intp)
+        self.face_verts = np.zeros(0, dtype=np.intp)
+        self.face_centers = np.zeros((0, 3))
+        self.vert_hide = np.zeros(0, dtype=bool)
+        self.edge_hide = np.zeros(0, dtype=bool)
+        self.face_hide = np.zeros(0, dtype=bool)
+        self.vert_select = np.zeros(0, dtype=bool)
+        self.edge_select = np.zeros(0, dtype=bool)
+
+        # 投影結果。視点の後ろはnan
+        self.vert_co2d = np.zeros((0, 2))
+        self.vert_depth = np.zeros(0)
+        self.face_center_co2d = np.zeros((0, 2))
+
+        self.vert_bvh = self.edge_bvh = self.face_bvh = None
+        self.face_loop_faces = np.zeros(0, dtype=np.intp)
+        self.vert_edges_ptr = np.zeros(1, dtype=np.intp)
+        self.vert_edges = np.zeros(0, dtype=np.intp)
+        self.vert_faces_ptr = np.zeros(1, dtype=np.intp)
+        self.vert_faces = np.zeros(0, dtype=np.intp)
+
+        self.num_projected = 0  # 直近の更新で投影した頂点数
+
+    # Mesh -------------------------------------------------------------
+    @staticmethod
+    def _mask(arr, num):
+        if arr is None:
+            return np.zeros(num, dtype=bool)
+        return np.asarray(arr, dtype=bool)
+
+    @staticmethod
+    def _inverse(num, elems, links):
+        """links[i]がelems[i]を参照する時、linksの各要素を参照する
+        elemsをCSRで返す。
+        """
+        order = np.argsort(links, kind='mergesort')
+        indptr = np.searchsorted(links[order], np.arange(num + 1))
+        return indptr, elems[order]
+
+    def set_mesh(self, coords, edge_verts, face_indptr, face_verts,
+                 vert_hide=None, edge_hide=None, face_hide=None,
+                 vert_select=None, edge_select=None):
+        """メッシュを設定する。トポロジーが前回と同じなら座標が
+        変化した頂点に関係する要素だけを再投影する。
+        :param coords: (V, 3) 投影に使う座標系の頂点座標
+        :param edge_verts: (E, 2)
+        :param face_indptr: (F + 1,) 面毎の頂点のCSR
+        :param face_verts: (L,)
+        :return: 再投影した頂点数
+        :rtype: int
+        """
+        coords = np.asarray(coords, dtype=np.float64).reshape((-1, 3))
+        edge_verts = np.asarray(edge_verts, dtype=np.intp).reshape((-1, 2))
+        face_indptr = np.asarray(face_indptr, dtype=np.intp)
+        face_verts = np.asarray(face_verts, dtype=np.intp)
+        num_verts = len(coords)
+        num_edges = len(edge_verts)
+        num_faces = len(face_indptr) - 1
+
+        same_topology = (
+            num_verts == len(self.coords) and
+            np.array_equal(edge_verts, self.edge_verts) and
+            np.array_equal(face_indptr, self.face_indptr) and
+            np.array_equal(face_verts, self.face_verts))
+        if same_topology:
+            dirty = np.flatnonzero((coords != self.coords).any(axis=1))
+        else:
+            dirty = None
+
+        vert_hide = self._mask(vert_hide, num_verts)
+        edge_hide = self._mask(edge_hide, num_edges)
+        face_hide = self._mask(face_hide, num_faces)
+        if same_topology and not (
+                np.array_equal(vert_hide, self.vert_hide) and
+                np.array_equal(edge_hide, self.edge_hide) and
+                np.array_equal(face_hide, self.face_hide)):
+            # BVHに含める要素が変わる
+            dirty = None
+        self.vert_hide = vert_hide
+        self.edge_hide = edge_hide
+        self.face_hide = face_hide
+        self.coords = coords
+        if not same_topology:
+            self.edge_verts = edge_verts
+            self.face_indptr = face_indptr
+            self.face_verts = face_verts
+            self.face_loop_faces = np.repeat(np.arange(num_faces),
+                                             np.diff(face_indptr))
+            self.vert_edges_ptr, self.vert_edges = self._inverse(
+                num_verts, np.repeat(np.arange(num_edges), 2),
+                edge_verts.ravel())
+            self.vert_faces_ptr, self.vert_faces = self._inverse(
+                num_verts, self.face_loop_faces, face_verts)
+        self.set_select(vert_select, edge_select)
+        self.face_centers = self._calc_face_centers()
+
+        if self.persmat is None:
+            self.num_projected = 0
+            return 0
+        if dirty is None:
+            self._project_all()
+        else:
+            self._project_dirty(dirty)
+        return self.num_projected
+
+    def set_select(self, vert_select=None, edge_select=None):
+        """選択状態だけを更新する。選択は投影やBVHに影響しない"""
+        self.vert_select = self._mask(vert_select, len(self.coords))
+        self.edge_select = self._mask(edge_select, len(self.edge_verts))
+
+    def _calc_face_centers(self):
+        num_faces = len(self.face_indptr) - 1
+        centers = np.zeros((num_faces, 3))
+        if num_faces == 0:
+            return centers
+        loop_coords = self.coords[self.face_verts]
+        for i in range(3):
+            centers[:, i] = np.bincount(self.face_loop_faces,
+                                        loop_coords[:, i],
+                                        minlength=num_faces)
+        centers /= np.maximum(np.diff(self.face_indptr), 1)[:, None]
+        return centers
+
+    # View -------------------------------------------------------------
+    def set_view(self, persmat, region_size):
+        """
+        :param persmat: 4x4 region_3d.perspective_matrix * matrix_world
+        :param region_size: (width, height)
+        :return: 視点が変わって全て再投影したら真
+        :rtype: bool
+        """
+        persmat = np.array(persmat, dtype=np.float64).reshape((4, 4))
+        region_size = (float(region_size[0]), float(region_size[1]))
+        if (self.persmat is not None and
+                np.array_equal(persmat, self.persmat) and
+                region_size == self.region_size):
+            return False
+        self.persmat = persmat
+        self.region_size = region_size
+        self._project_all()
+        return True
+
+    def project(self, coords):
+        """(N, 3)をRegion座標と深度(0 ~ 1)にする。視点の後ろはnan。
+        :rtype: (numpy.ndarray, numpy.ndarray)
+        """
+        m = self.persmat
+        v = np.dot(coords, m[:3, :3].T) + m[:3, 3]
+        w = np.dot(coords, m[3, :3]) + m[3, 3]
+        behind = w <= CLIP_W_EPSILON
+        w = np.where(behind, 1.0, w)
+        v /= w[:, None]
+        sx, sy = self.region_size
+        co2d = np.empty((len(coords), 2))
+        co2d[:, 0] = (1 + v[:, 0]) * sx * 0.5
+        co2d[:, 1] = (1 + v[:, 1]) * sy * 0.5
+        depth = (1 + v[:, 2]) * 0.5
+        co2d[behind] = np.nan
+        depth[behind] = np.nan
+        return co2d, depth
+
+    def _project_all(self):
+        self.vert_co2d, self.vert_depth = self.project(self.coords)
+        self.face_center_co2d = self.project(self.face_centers)[0]
+        self.num_projected = len(self.coords)
+        self._build()
+
+    def _project_dirty(self, dirty):
+        self.num_projected = len(dirty)
+        if len(dirty) == 0:
+            return
+        co2d, depth = self.project(self.coords[dirty])
+        was_valid = ~np.isnan(self.vert_depth[dirty])
+        self.vert_co2d[dirty] = co2d
+        self.vert_depth[dirty] = depth
+        faces = np.unique(np.concatenate([
+            self.vert_faces[self.vert_faces_ptr[i]:self.vert_faces_ptr[i + 1]]
+            for i in dirty.tolist()]))
+        if len(faces):
+            self.face_center_co2d[faces] = self.project(
+                self.face_centers[faces])[0]
+        if (was_valid != ~np.isnan(depth)).any():
+            # 視点の後ろとの出入りがあればBVHに含める要素が変わる
+            self._build()
+            return
+        # 並び順はそのままで矩形だけ更新する
+        self.vert_bvh.refit(self._vert_bounds())
+        self.edge_bvh.refit(self._edge_bounds())
+        self.face_bvh.refit(self._face_bounds())
+
+    # BVH --------------------------------------------------------------
+    def _vert_bounds(self):
+        return np.hstack((self.vert_co2d, self.vert_co2d))
+
+    def _edge_bounds(self):
+        p1 = self.vert_co2d[self.edge_verts[:, 0]]
+        p2 = self.vert_co2d[self.edge_verts[:, 1]]
+        return np.hstack((np.minimum(p1, p2), np.maximum(p1, p2)))
+
+    def _face_bounds(self):
+        """面の頂点全てを囲む矩形。一つでも視点の後ろならnan"""
+        num_faces = len(self.face_indptr) - 1
+        bounds = np.empty((num_faces, 4))
+        if num_faces == 0:
+            return bounds
+        co = self.vert_co2d[self.face_verts]
+        starts = self.face_indptr[:-1]
+        nonempty = starts < self.face_indptr[1:]
+        bounds[:] = np.nan
+        for i in range(2):
+            # nanはminimum/maximumで伝播する
+            bounds[nonempty, i] = np.minimum.reduceat(co[:, i],
+                                                      starts[nonempty])
+            bounds[nonempty, i + 2] = np.maximum.reduceat(co[:, i],
+                                                          starts[nonempty])
+        return bounds
+
+    def _build(self):
+        self.vert_bvh = ScreenBVH(self._vert_bounds()[~self.vert_hide],
+                                  np.flatnonzero(~self.vert_hide))
+        self.edge_bvh = ScreenBVH(self._edge_bounds()[~self.edge_hide],
+                                  np.flatnonzero(~self.edge_hide))
+        self.face_bvh = ScreenBVH(self._face_bounds()[~self.face_hide],
+                                  np.flatnonzero(~self.face_hide))
+
+    # Find -------------------------------------------------------------
+    def find_vert(self, x, y, dist, use_select_bias=True):
+        """:rtype: (int, float)"""
+        def distance(verts):
+            co = self.vert_co2d[verts]
+            d = np.hypot(co[:, 0] - x, co[:, 1] - y)
+            if use_select_bias:
+                d += self.vert_select[verts] * FIND_NEAR_SELECT_BIAS
+            return np.where(np.isnan(d), np.inf, d)
+
+        # 選択頂点のバイアス分だけ矩形の距離は小さく見積もられる
+        return self.vert_bvh.nearest(x, y, distance, dist)
+
+    def find_edge(self, x, y, dist, use_select_bias=True):
+        """:return: (辺, 線分までの距離, 辺の中点までの距離)
+        :rtype: (int, float, float)
+        """
+        def distance(edges):
+            ev = self.edge_verts[edges]
+            d = point_segment_distance(x, y, self.vert_co2d[ev[:, 0]],
+                                       self.vert_co2d[ev[:, 1]])
+            if use_select_bias:
+                d += self.edge_select[edges] * FIND_NEAR_SELECT_BIAS
+            return np.where(np.isnan(d), np.inf, d)
+
+        eed, d = self.edge_bvh.nearest(x, y, distance, dist)
+        if eed == -1:
+            return eed, d, np.inf
+        mid = self.vert_co2d[self.edge_verts[eed]].mean(axis=0)
+        return eed, d, float(np.hypot(mid[0] - x, mid[1] - y))
+
+    def find_face(self, x, y):
+        """(x, y)を含む面の内、頂点の深度の平均が最も手前の物を返す。
+        :return: (面, 面中心までの距離)
+        :rtype: (int, float)
+        """
+        faces = self.face_bvh.overlap(x, y)
+        if len(faces) == 0:
+            return -1, np.inf
+        faces = np.sort(faces)
+        # 交差数による内外判定
+        indptr = self.face_indptr
+        counts = indptr[faces + 1] - indptr[faces]
+        cand = np.repeat(np.arange(len(faces)), counts)
+        offsets = np.cumsum(counts) - counts
+        loops = (np.repeat(indptr[faces] - offsets, counts) +
+                 np.arange(counts.sum()))
+        nxt = loops + 1
+        last = np.cumsum(counts) - 1
+        nxt[last] = indptr[faces]
+        p1 = self.vert_co2d[self.face_verts[loops]]
+        p2 = self.vert_co2d[self.face_verts[nxt]]
+        cross = (p1[:, 1] > y) != (p2[:, 1] > y)
+        dy = np.where(cross, p2[:, 1] - p1[:, 1], 1.0)
+        ix = p1[:, 0] + (y - p1[:, 1]) * (p2[:, 0] - p1[:, 0]) / dy
+        cross &= x < ix
+        inside = np.bincount(cand, cross, minlength=len(faces)) % 2 == 1
+        if not inside.any():
+            return -1, np.inf
+        depth = (np.bincount(cand, self.vert_depth[self.face_verts[loops]],
+                             minlength=len(faces)) / counts)
+        depth[~inside] = np.inf
+        efa = int(faces[int(np.argmin(depth))])
+        center = self.face_center_co2d[efa]
+        return efa, float(np.hypot(center[0] - x, center[1] - y))
+
+    def find_nearest(self, mval, select_mode, dist=SELECT_DIST_PX):
+        """unified_findnearest()と同じ手順で要素を探す。
+        :param mval: Region座標
+        :param select_mode: {'VERT', 'EDGE', 'FACE'}の部分集合
+        :type select_mode: set[str]
+        :return: (要素の種類, インデックス)。見つからなければ(None, -1)
+        :rtype: (str | None, int)
+        """
+        if self.persmat is None:
+            raise ValueError('set_view() has not been called')
+        x, y = float(mval[0]), float(mval[1])
+        # since edges select lines, we give dots advantage of ~20 pix
+        dist_margin = dist / 2
+        eve = eed = efa = -1
+
+        if dist > 0.0 and 'FACE' in select_mode:
+            efa, dist_center = self.find_face(x, y)
+            if efa != -1 and select_mode & {'EDGE', 'VERT'}:
+                dist = min(dist_margin, dist_center)
+        if dist > 0.0 and 'EDGE' in select_mode:
+            eed, _, dist_center = self.find_edge(x, y, dist)
+            if eed != -1 and 'VERT' in select_mode:
+                dist = min(dist_margin, dist_center)
+        if dist > 0.0 and 'VERT' in select_mode:
+            eve, _ = self.find_vert(x, y, dist)
+
+        if eve != -1:
+            return 'VERT', eve
+        elif eed != -1:
+            return 'EDGE', eed
+        elif efa != -1:
+            return 'FACE', efa
+        return None, -1
+
+
+def _find_nearest_brute_force(finder, mval, select_mode,
+                              dist=SELECT_DIST_PX):
+    """ScreenSpaceFinder.find_nearest()をBVHを使わずに求める。検証用"""
+    x, y = float(mval[0]), float(mval[1])
+    dist_margin = dist / 2
+    eve = eed = efa = -1
+    inf = np.inf
+
+    if dist > 0.0 and 'FACE' in select_mode:
+        best_depth = inf
+        for f in range(len(finder.face_indptr) - 1):
+            if finder.face_hide[f]:
+                continue
+            vs = finder.face_verts[finder.face_indptr[f]:
+                                   finder.face_indptr[f + 1]]
+            poly = finder.vert_co2d[vs]
+            if np.isnan(poly).any():
+                continue
+            inside = False
+            for i in range(len(poly)):
+                (x1, y1), (x2, y2) = poly[i], poly[(i + 1) % len(poly)]
+                if (y1 > y) != (y2 > y):
+                    if x < x1 + (y - y1) * (x2 - x1) / (y2 - y1):
+                        inside = not inside
+            depth = finder.vert_depth[vs].mean()
+            if inside and depth < best_depth:
+                efa, best_depth = f, depth
+        if efa != -1 and select_mode & {'EDGE', 'VERT'}:
+            c = finder.face_center_co2d[efa]
+            dist = min(dist_margin, math.hypot(c[0] - x, c[1] - y))
+    if dist > 0.0 and 'EDGE' in select_mode:
+        ev = finder.edge_verts
+        d = point_segment_distance(x, y, finder.vert_co2d[ev[:, 0]],
+                                   finder.vert_co2d[ev[:, 1]])
+        d += finder.edge_select * FIND_NEAR_SELECT_BIAS
+        d[np.isnan(d) | finder.edge_hide] = inf
+        if len(d) and d.min() < dist:
+            eed = int(np.argmin(d))
+            if 'VERT' in select_mode:
+                mid = finder.vert_co2d[ev[eed]].mean(axis=0)
+                dist = min(dist_margin, math.hypot(mid[0] - x, mid[1] - y))
+    if dist > 0.0 and 'VERT' in select_mode:
+        co = finder.vert_co2d
+        d = np.hypot(co[:, 0] - x, co[:, 1] - y)
+        d += finder.vert_select * FIND_NEAR_SELECT_BIAS
+        d[np.isnan(d) | finder.vert_hide] = inf
+        if len(d) and d.min() < dist:
+            eve = int(np.argmin(d))
+
+    if eve != -1:
+        return 'VERT', eve
+    elif eed != -1:
+        return 'EDGE', eed
+    elif efa != -1:
+        return 'FACE', efa
+    return None, -1
+
+
+def _test_screen_finder(size=40, num_queries=500, seed=0):
+    """格子状のメッシュを作ってBVHと総当たりの結果を比べる。
+    Blender無しで実行できる。
+    :param size: 格子の一辺の面数
+    :return: (一致しなかった問い合わせ数, 最後の更新で再投影した頂点数)
+    :rtype: (int, int)
+    """
+    rng = np.random.RandomState(seed)
+    n = size + 1
+    xs, ys = np.meshgrid(np.arange(n, dtype=np.float64),
+                         np.arange(n, dtype=np.float64))
+    coords = np.column_stack((xs.ravel(), ys.ravel(),
+                              rng.uniform(-0.3, 0.3, n * n)))
+    idx = np.arange(n * n).reshape((n, n))
+    quads = np.column_stack((idx[:-1, :-1].ravel(), idx[:-1, 1:].ravel(),
+                             idx[1:, 1:].ravel(), idx[1:, :-1].ravel()))
+    face_verts = quads.ravel()
+    face_indptr = np.arange(len(quads) + 1) * 4
+    edge_verts = np.vstack((
+        np.column_stack((idx[:, :-1].ravel(), idx[:, 1:].ravel())),
+        np.column_stack((idx[:-1, :].ravel(), idx[1:, :].ravel()))))
+
+    def random_persmat():
+        # 格子を斜めから見下ろす透視投影
+        angle = rng.uniform(0, 2 * math.pi)
+        c, s = math.cos(angle), math.sin(angle)
+        view = np.array([[c, -s, 0, -size / 2],
+                         [s * 0.6, c * 0.6, 0.8, -size / 3],
+                         [-s * 0.8, -c * 0.8, 0.6, -size * 1.5],
+                         [0, 0, 0, 1]])
+        near, far = 0.1, 1000.0
+        proj = np.array([[1.5, 0, 0, 0],
+                         [0, 1.5, 0, 0],
+                         [0, 0, -(far + near) / (far - near),
+                          -2 * far * near / (far - near)],
+                         [0, 0, -1, 0]])
+        return np.dot(proj, view)
+
+    finder = ScreenSpaceFinder()
+    region_size = (800, 600)
+    finder.set_view(random_persmat(), region_size)
+    masks = {'vert_hide': rng.rand(n * n) < 0.05,
+             'face_hide': rng.rand(len(quads)) < 0.05,
+             'vert_select': rng.rand(n * n) < 0.1}
+    finder.set_mesh(coords, edge_verts, face_indptr, face_verts, **masks)
+
+    modes = [{'VERT'}, {'EDGE'}, {'FACE'}, {'VERT', 'EDGE', 'FACE'},
+             {'EDGE', 'FACE'}]
+    failures = 0
+    for i in range(num_queries):
+        if i == num_queries // 2:
+            # 一部の頂点だけ動かす
+            coords = coords.copy()
+            moved = rng.choice(n * n, 10, replace=False)
+            coords[moved, 2] += 1.0
+            finder.set_mesh(coords, edge_verts, face_indptr, face_verts,
+                            **masks)
+            num_projected = finder.num_projected
+            if num_projected != len(moved):
+                raise AssertionError(num_projected)
+        elif i % 50 == 0:
+            finder.set_view(random_persmat(), region_size)
+        mval = rng.uniform(0, 1, 2) * region_size
+        mode = modes[i % len(modes)]
+        if (finder.find_nearest(mval, mode) !=
+                _find_nearest_brute_force(finder, mval, mode)):
+            failures += 1
+    return failures, finder.num_projected
@@ -45,12 +45,14 @@ bpy.ops.mesh.sort_elements()で頂点の順番が並び替えられる。
 
 import ctypes
 import importlib
+import itertools
 import platform
 import time
 
+import numpy as np
+
 import bpy
 import bmesh
-from mathutils import Vector
 
 try:
     importlib.reload(utils)
@@ -60,10 +62,11 @@ except NameError:
 
 # BMLayerItem name
 # 他のアドオンと衝突するようなら変更する
-LAYER_LOCK = 'use_lock'  # verts.layers.int
-LAYER_X = 'lock_x'  # verts.layers.float
-LAYER_Y = 'lock_y'  # verts.layers.float
-LAYER_Z = 'lock_z'  # verts.layers.float
+# verts.layers.int 0:非ロック, 1以上:LockStore.coordsの行 + 1
+LAYER_LOCK = 'use_lock'
+LAYER_X = 'lock_x'  # verts.layers.float 0.2.3まで使用
+LAYER_Y = 'lock_y'  # verts.layers.float 0.2.3まで使用
+LAYER_Z = 'lock_z'  # verts.layers.float 0.2.3まで使用
 LAYER_GX = 'lock_global_x'  # verts.layers.float 0.2.0でのみ使用
 LAYER_GY = 'lock_global_y'  # verts.layers.float 0.2.0でのみ使用
 LAYER_GZ = 'lock_global_z'  # verts.layers.float 0.2.0でのみ使用
@@ -71,6 +74,10 @@ LAYER_TMP_SELECT = '_select'  # [verts|edges|faces].layers.int
 LAYER_TMP_HISTORY = '_history'  # [verts|edges|faces].layers.int
 LAYER_TMP_ACTIVE = '_active'  # faces.layers.int
 
+# Mesh ID Property name。0.2.3の開発版でLockStore.coordsを書き込んでいた。
+# ロック座標はエディットモード開始時に取り直すので、セーブ時に削除する
+PROP_LOCK_COORDS = 'lock_coords_store'
+
 # (type, context.ATTR, bpy.data.ATTR)
 PREFS_LOCATION = (bpy.types.Scene, 'scene', 'scenes')
 # PREFS_LOCATION = (bpy.types.WindowManager, 'window_manager', 'window_managers')
@@ -87,6 +94,9 @@ MENU_KEYMAPS = (
 # 頂点選択が無効になっている時の速度低下の軽減(linuxのみ)
 USE_CTYPES = True
 
+# ロック座標との差がこれ以下なら動いていないとみなす(相対/絶対誤差)
+LOCK_EPSILON = 1e-6
+
 
 ###############################################################################
 # Callback
@@ -154,41 +164,294 @@ def get_layer(bm, type, name):
     return layer
 
 
-def relock(bm=None):
-    """頂点のロック座標を現在の座標で上書きする"""
+def read_vert_coords(elems):
+    """頂点座標を(N, 3)の配列にする。
+    :type elems: collections.abc.Sequence[bmesh.types.BMVert]
+    :rtype: numpy.ndarray
+    """
+    return np.fromiter(itertools.chain.from_iterable(
+        eve.co for eve in elems), np.float64, len(elems) * 3).reshape((-1, 3))
+
+
+def read_lock_slots(bm, layer_lock):
+    """全頂点のLAYER_LOCKの値。
+    :rtype: numpy.ndarray
+    """
+    verts = bm.verts
+    return np.fromiter((eve[layer_lock] for eve in verts), np.int32,
+                       len(verts))
+
+
+class LockStore:
+    """ロック座標をロックした頂点の分だけ保持する。
+    頂点とcoordsの対応はLAYER_LOCKの値(行 + 1)で取る。int型のレイヤーは
+    頂点と一緒に並び替え・削除・複製されるので、トポロジーが変わっても
+    対応が崩れない。
+    エディットモード中のMeshの分だけ保持し、開始時に作り直す。
+    """
+
+    def __init__(self, coords=None):
+        if coords is None:
+            coords = np.zeros((0, 3), dtype=np.float32)
+        self.coords = coords
+        """:type: numpy.ndarray"""
+
+    def __len__(self):
+        return len(self.coords)
+
+
+# {Mesh.as_pointer(): LockStore}
+lock_stores = {}
+
+
+def get_lock_store(mesh):
+    """:rtype: LockStore"""
+    key = mesh.as_pointer()
+    store = lock_stores.get(key)
+    if store is None:
+        store = lock_stores[key] = LockStore()
+    return store
+
+
+def prune_lock_stores():
+    """開放された、又はエディットモードでないMeshのLockStoreを削除する。
+    アドレスが再利用された別のMeshに古いLockStoreが使われるのを防ぐ。
+    """
+    live = {me.as_pointer() for me in bpy.data.meshes if me.is_editmode}
+    for key in [key for key in lock_stores if key not in live]:
+        del lock_stores[key]
+
+
+def commit_locks(mesh, bm, layer_lock, slots, locked, set_coords,
+                 compact=False):
+    """ロック状態とロック座標を更新する。
+    アンドゥで戻ったLAYER_LOCKの値が別の頂点の座標を指さないよう、未使用に
+    なった行は再利用せず、新しくロックする頂点の分を末尾に追加する。
+    既にロックされていて行を一つの頂点だけが使っている頂点は、その行を
+    書き換える(Relockを繰り返しても行が増えない。アンドゥしてもその頂点の
+    ロック座標は戻らない)。
+    compactが真の場合は使用中の行だけを残して1から番号を振り直す
+    (エディットモード開始時等、古い番号を参照するアンドゥが無い時に限る)。
+    :param slots: 現在のLAYER_LOCKの値
+    :type slots: numpy.ndarray
+    :param locked: ロックする頂点
+    :type locked: numpy.ndarray
+    :param set_coords: 現在の座標をロック座標とする頂点
+    :type set_coords: numpy.ndarray
+    :type compact: bool
+    """
+    store = get_lock_store(mesh)
+    verts = bm.verts
+    verts.ensure_lookup_table()
+    valid = (slots > 0) & (slots <= len(store))
+    if not compact:
+        # 一つの頂点だけが使っている行はその場で書き換える
+        counts = np.bincount(slots[valid], minlength=len(store) + 1)
+        rewrite = np.flatnonzero(locked & valid & set_coords &
+                                 (counts[np.where(valid, slots, 0)] == 1))
+        store.coords[slots[rewrite] - 1] = read_vert_coords(
+            [verts[i] for i in rewrite.tolist()])
+        set_coords = set_coords.copy()
+        set_coords[rewrite] = False
+    keep = locked & valid & ~set_coords
+    append = np.flatnonzero(locked & ~keep)
+    coords = read_vert_coords([verts[i] for i in append.tolist()]).astype(
+        np.float32)
+
+    new_slots = np.zeros(len(verts), dtype=np.int32)
+    if compact:
+        kept = np.flatnonzero(keep)
+        store.coords = np.concatenate(
+            [store.coords[slots[kept] - 1], coords])
+        new_slots[kept] = np.arange(1, len(kept) + 1)
+        new_slots[append] = np.arange(len(kept) + 1, len(store) + 1)
+    else:
+        new_slots[keep] = slots[keep]
+        new_slots[append] = np.arange(len(store) + 1,
+                                      len(store) + len(append) + 1)
+        store.coords = np.concatenate([store.coords, coords])
+    for i in np.flatnonzero(new_slots != slots).tolist():
+        verts[i][layer_lock] = int(new_slots[i])
+    lock_arrays.clear()
+
+
+class LockArrays:
+    """ロックされた頂点のインデックスとロック座標(ローカル座標)を保持する。
+    頂点・辺・面の数が変わった時、ロック状態を変更した時、アンドゥ後に
+    作り直す。
+    """
+
+    def __init__(self):
+        self.mesh_addr = None
+        self.counts = None
+        self.indices = np.zeros(0, dtype=np.intp)
+        """:type: numpy.ndarray"""
+        # indicesの頂点のLAYER_LOCKの値。並び替えの検出に使う
+        self.slots = np.zeros(0, dtype=np.int32)
+        """:type: numpy.ndarray"""
+        self.targets = np.zeros((0, 3))
+        """:type: numpy.ndarray"""
+        # 前回のcallback_scene_update_pre()での状態
+        self.stamp = None
+        # max_rateで見送った適用が残っているか
+        self.pending = False
+        # 前回適用した時刻(time.perf_counter())
+        self.enforce_time = 0.0
+
+    def clear(self):
+        self.__init__()
+
+    @staticmethod
+    def bm_counts(bm):
+        return len(bm.verts), len(bm.edges), len(bm.faces)
+
+    def is_valid(self, mesh, bm):
+        return (self.mesh_addr == mesh.as_pointer() and
+                self.counts == self.bm_counts(bm))
+
+    def build(self, mesh, bm, layer_lock):
+        slots = read_lock_slots(bm, layer_lock)
+        store = get_lock_store(mesh)
+        if len(slots) and slots.max() > len(store):
+            # 旧バージョンのファイルやアンドゥ等で対応する行が無い
+            locked = slots > 0
+            commit_locks(mesh, bm, layer_lock, slots, locked,
+                         locked & (slots > len(store)))
+            slots = read_lock_slots(bm, layer_lock)
+        self.indices = np.flatnonzero(slots)
+        self.slots = slots[self.indices]
+        self.targets = store.coords[self.slots - 1].astype(np.float64)
+        self.mesh_addr = mesh.as_pointer()
+        self.counts = self.bm_counts(bm)
+        self.stamp = None
+
+    def read(self, bm, layer_lock, check_order=True):
+        """ロックされた頂点の座標・hide・selectを一度のループで読む。
+        check_orderが真の場合はLAYER_LOCKの値も読み、頂点数を変えずに
+        並び替えられていればNoneを返す。
+        :return: (N, 3)の座標、(N,)のhide、(N,)のselect
+        :rtype: (numpy.ndarray, numpy.ndarray, numpy.ndarray) | None
+        """
+        verts = bm.verts
+        verts.ensure_lookup_table()
+        elems = map(verts.__getitem__, self.indices.tolist())
+        if check_order:
+            rows = ((eve[layer_lock], eve.hide, eve.select, *eve.co)
+                    for eve in elems)
+        else:
+            rows = ((eve.hide, eve.select, *eve.co) for eve in elems)
+        width = 6 if check_order else 5
+        data = np.fromiter(itertools.chain.from_iterable(rows), np.float64,
+                           len(self.indices) * width).reshape((-1, width))
+        if check_order:
+            if not np.array_equal(data[:, 0].astype(np.int32), self.slots):
+                return None
+            data = data[:, 1:]
+        return data[:, 2:], data[:, 0].astype(bool), data[:, 1].astype(bool)
+
+
+lock_arrays = LockArrays()
+
+
+class LockStats:
+    """callback_scene_update_pre()の計測値"""
+
+    def __init__(self):
+        self.calls = 0  # 呼び出し回数
+        self.skipped = 0  # 変更が無いので何もしなかった回数
+        self.throttled = 0  # max_rateにより見送った回数
+        self.enforced = 0  # ロック座標を適用した回数
+        self.moved = 0  # ロック座標を適用して移動した頂点数の合計
+        self.updates = 0  # normal_update()等を行った回数
+        self.time = 0.0  # 適用に掛かった時間の合計(秒)
+        self.last_time = 0.0  # 直近の適用に掛かった時間(秒)
+
+    def reset(self):
+        self.__init__()
+
+    def as_dict(self):
+        """:rtype: dict"""
+        d = dict(self.__dict__)
+        d['average_time'] = self.time / self.enforced if self.enforced else 0.0
+        return d
+
+
+lock_stats = LockStats()
+
+
+def calc_lock_coords(coords, targets, lock_axis, matrix=None):
+    """ロック後の座標を求める。
+    :param coords: (N, 3) 現在のローカル座標
+    :type coords: numpy.ndarray
+    :param targets: (N, 3) ロック座標(ローカル座標)
+    :type targets: numpy.ndarray
+    :param lock_axis: 固定する軸
+    :type lock_axis: (bool, bool, bool)
+    :param matrix: 4x4。グローバル座標系で固定する場合はmatrix_world
+    :rtype: numpy.ndarray
+    """
+    axis = np.array(lock_axis, dtype=bool)
+    if matrix is None:
+        result = coords.copy()
+        result[:, axis] = targets[:, axis]
+        return result
+    mat = np.array(matrix, dtype=np.float64)
+    rot, loc = mat[:3, :3], mat[:3, 3]
+    world = np.dot(coords, rot.T) + loc
+    world[:, axis] = (np.dot(targets, rot.T) + loc)[:, axis]
+    return np.linalg.solve(rot, (world - loc).T).T
+
+
+def relock(bm=None, mesh=None, compact=False):
+    """頂点のロック座標を現在の座標で上書きする
+    :param compact: LockStoreの番号を振り直す。commit_locks()参照
+    """
+    lock_arrays.clear()
     if not bm:
         if bpy.context.mode == 'EDIT_MESH':
-            bm = bmesh.from_edit_mesh(bpy.context.active_object.data)
+            mesh = bpy.context.active_object.data
+            bm = bmesh.from_edit_mesh(mesh)
         else:
             return
+    elif not mesh:
+        mesh = bpy.context.active_object.data
     layer_lock = bm.verts.layers.int.get(LAYER_LOCK)
     if not layer_lock:
         return
-    layer_x = get_layer(bm, float, LAYER_X)
-    layer_y = get_layer(bm, float, LAYER_Y)
-    layer_z = get_layer(bm, float, LAYER_Z)
-    for eve in bm.verts:
-        if eve[layer_lock]:
-            eve[layer_x], eve[layer_y], eve[layer_z] = eve.co
+    slots = read_lock_slots(bm, layer_lock)
+    locked = slots > 0
+    commit_locks(mesh, bm, layer_lock, slots, locked, locked, compact)
 
 
 @bpy.app.handlers.persistent
 def callback_load_post(dummy):
     """ファイルのロード後に実行"""
     edit_mesh_scenes.clear()
+    lock_arrays.clear()
+    lock_stores.clear()
     check_callback()
 
 
+@bpy.app.handlers.persistent
+def callback_undo_post(dummy):
+    """アンドゥ・リドゥでロック状態が戻る場合があるので作り直させる"""
+    lock_arrays.clear()
+
+
 @bpy.app.handlers.persistent
 def callback_save_pre(dummy):
-    """ファイルのセーブ前に実行。ロック座標用の頂点レイヤーを削除"""
+    """ファイルのセーブ前に実行。不要なLockStoreと、旧バージョンのロック座標用の
+    頂点レイヤー及びID Propertyを削除する。
+    """
+    prune_lock_stores()
     for me in bpy.data.meshes:
+        if PROP_LOCK_COORDS in me:
+            del me[PROP_LOCK_COORDS]
+
         if me.is_editmode:
             bm = bmesh.from_edit_mesh(me)
         else:
             skip = True
-            if LAYER_LOCK in me.vertex_layers_int:
-                skip = False
             for name in (LAYER_X, LAYER_Y, LAYER_Z,
                          LAYER_GX, LAYER_GY, LAYER_GZ):
                 if name in me.vertex_layers_float:
@@ -210,15 +473,6 @@ def callback_save_pre(dummy):
             bm.to_mesh(me)
 
 
-@bpy.app.handlers.persistent
-def callback_save_post(dummy):
-    """editmode中のメッシュに対しcallback_save_preで消したレイヤを追加する"""
-    for me in bpy.data.meshes:
-        if me.is_editmode:
-            bm = bmesh.from_edit_mesh(me)
-            relock(bm)
-
-
 @bpy.app.handlers.persistent
 def callback_scene_update_pre(scene):
     """meshに変更が無くても絶えず呼び出す。
@@ -229,6 +483,7 @@ def callback_scene_update_pre(scene):
     """
 
     t = time.perf_counter()
+    lock_stats.calls += 1
 
     check_callback()
 
@@ -247,7 +502,9 @@ def callback_scene_update_pre(scene):
     if scene:
         if context.mode == 'EDIT_MESH':
             if scene not in edit_mesh_scenes:
-                relock()
+                # エディットモード開始直後は古い番号を参照するアンドゥが無い
+                prune_lock_stores()
+                relock(compact=True)
                 edit_mesh_scenes.add(scene)
         else:
             if scene in edit_mesh_scenes:
@@ -263,61 +520,70 @@ def callback_scene_update_pre(scene):
     lock_axis = tuple(lock_coords.lock_axis)
     if not any(lock_axis):
         return
-    lock_x, loc_y, lock_z = lock_axis
-    lock_all = all(lock_axis)
     is_selectable = lock_coords.is_selectable
     use_local_coords = lock_coords.lock_coordinate_system == 'LOCAL'
 
     actob = context.active_object
     mesh = actob.data
     mat = actob.matrix_world
-    imat = mat.inverted()
 
     bm = bmesh.from_edit_mesh(mesh)  # 所要時間は1e-5程度
 
     layer_lock = bm.verts.layers.int.get(LAYER_LOCK)
     if not layer_lock:
         return
-    layer_x = bm.verts.layers.float.get(LAYER_X)
-    layer_y = bm.verts.layers.float.get(LAYER_Y)
-    layer_z = bm.verts.layers.float.get(LAYER_Z)
-    if not (layer_x and layer_y and layer_z):
+
+    # メッシュが更新されておらず、選択状態と設定が前回と同じなら何もしない。
+    # 選択の変更ではmesh.is_updatedは真にならないので選択数等で判定する
+    active = bm.select_history.active
+    stamp = (mesh.as_pointer(), LockArrays.bm_counts(bm),
+             mesh.total_vert_sel, mesh.total_edge_sel, mesh.total_face_sel,
+             len(bm.select_history),
+             (type(active), active.index) if active else None,
+             lock_axis, is_selectable, use_local_coords,
+             None if use_local_coords else tuple(map(tuple, mat)))
+    # 並び替えはメッシュの更新を伴うので、その時だけLAYER_LOCKの値を比べる
+    check_order = mesh.is_updated or mesh.is_updated_data
+    if not lock_arrays.is_valid(mesh, bm):
+        lock_arrays.build(mesh, bm, layer_lock)
+        check_order = False
+    elif (lock_arrays.stamp == stamp and not lock_arrays.pending and
+            not check_order):
+        lock_stats.skipped += 1
+        return
+
+    max_rate = lock_coords.max_rate
+    if max_rate > 0.0 and t - lock_arrays.enforce_time < 1.0 / max_rate:
+        # 次の呼び出しで適用する
+        lock_arrays.pending = True
+        lock_stats.throttled += 1
         return
+    lock_arrays.pending = False
+    lock_arrays.enforce_time = t
+
+    result = lock_arrays.read(bm, layer_lock, check_order)
+    if result is None:
+        # 頂点数を変えずに並び替えられた
+        lock_arrays.build(mesh, bm, layer_lock)
+        result = lock_arrays.read(bm, layer_lock, False)
+    coords, hide, select = result
+    lock_arrays.stamp = stamp
+
+    verts = bm.verts
+    indices = lock_arrays.indices
+    new_coords = calc_lock_coords(
+        coords, lock_arrays.targets, lock_axis,
+        None if use_local_coords else mat)
+    moved = ~hide & ~np.isclose(new_coords, coords, rtol=LOCK_EPSILON,
+                                atol=LOCK_EPSILON).all(axis=1)
+    for i in np.flatnonzero(moved).tolist():
+        verts[int(indices[i])].co = new_coords[i].tolist()
 
     do_select_update = False
-    for eve in bm.verts:
-        if not eve.hide and eve[layer_lock]:
-            x = eve[layer_x]
-            y = eve[layer_y]
-            z = eve[layer_z]
-            if use_local_coords:
-                if lock_all:
-                    eve.co = x, y, z
-                else:
-                    co = eve.co
-                    if lock_x:
-                        co[0] = x
-                    if loc_y:
-                        co[1] = y
-                    if lock_z:
-                        co[2] = z
-            else:
-                lock_co = mat * Vector((x, y, z))
-                if lock_all:
-                    eve.co = imat * lock_co
-                else:
-                    co = mat * eve.co
-                    if lock_x:
-                        co[0] = lock_co[0]
-                    if loc_y:
-                        co[1] = lock_co[1]
-                    if lock_z:
-                        co[2] = lock_co[2]
-                    eve.co = imat * co
-            if not is_selectable:
-                if eve.select:
-                    eve.select = False
-                    do_select_update = True
+    if not is_selectable:
+        for i in indices[~hide & select].tolist():
+            verts[i].select = False
+            do_select_update = True
 
     """
     NOTE:
@@ -370,11 +636,20 @@ def callback_scene_update_pre(scene):
                         # hideフラグの判定は代入時にやってくれるので不要
                         f.select = True
 
-    bm.normal_update()
-    if mesh.is_updated or mesh.is_updated_data:
-        bmesh.update_edit_mesh(mesh, tessface=True)
+    # 選択を解除した時も描画の為に更新する。
+    # 法線とtessfaceはロックした頂点が実際に動いた時だけ更新する
+    num_moved = int(moved.sum())
+    if num_moved or do_select_update:
+        if num_moved:
+            bm.normal_update()
+        bmesh.update_edit_mesh(mesh, tessface=bool(num_moved),
+                               destructive=bool(num_moved))
+        lock_stats.updates += 1
 
-    # print(time.perf_counter() - t)
+    lock_stats.enforced += 1
+    lock_stats.moved += num_moved
+    lock_stats.last_time = time.perf_counter() - t
+    lock_stats.time += lock_stats.last_time
 
 
 ###############################################################################
@@ -425,6 +700,13 @@ class WM_PROP_LockCoords(bpy.types.PropertyGroup):
                    ('LOCAL', 'Local', 'Lock with local coordinate system')),
             default='LOCAL',
             update=prop_update)
+    max_rate = bpy.props.FloatProperty(
+            name='Max Rate',
+            description='Maximum number of lock enforcements per second '
+                        '(0: unlimited)',
+            default=0.0,
+            min=0.0,
+            soft_max=120.0)
 
 
 ###############################################################################
@@ -459,37 +741,36 @@ class MESH_OT_lock_coords(bpy.types.Operator):
         bm = bmesh.from_edit_mesh(actob.data)
 
         layer_lock = get_layer(bm, int, LAYER_LOCK)
-        layer_x = get_layer(bm, float, LAYER_X)
-        layer_y = get_layer(bm, float, LAYER_Y)
-        layer_z = get_layer(bm, float, LAYER_Z)
-        for eve in bm.verts:
-            if eve.hide:
-                continue
-            set_lock_co = False
-            if self.mode in ('LOCK_SEL', 'LOCK_DESEL'):
-                if self.mode == 'LOCK_SEL' and eve.select or \
-                   self.mode == 'LOCK_DESEL' and not eve.select:
-                    eve[layer_lock] = 1
-                    set_lock_co = True
-            elif self.mode in ('UNLOCK_SEL', 'UNLOCK_DESEL'):
-                if self.mode == 'UNLOCK_SEL' and eve.select or \
-                   self.mode == 'UNLOCK_DESEL' and not eve.select:
-                    eve[layer_lock] = 0
-            elif self.mode == 'UNLOCK_ALL':
-                eve[layer_lock] = 0
-            elif self.mode == 'INVERT':
-                if eve[layer_lock]:
-                    eve[layer_lock] = 0
-                else:
-                    eve[layer_lock] = 1
-                    set_lock_co = True
-            elif self.mode == 'RELOCK':
-                if eve[layer_lock] and eve.select:
-                    set_lock_co = True
-            if set_lock_co:
-                eve[layer_x], eve[layer_y], eve[layer_z] = eve.co
+        verts = bm.verts
+        num = len(verts)
+        slots = read_lock_slots(bm, layer_lock)
+        locked = slots > 0
+        visible = ~np.fromiter((eve.hide for eve in verts), bool, num)
+        select = np.fromiter((eve.select for eve in verts), bool, num)
+        if self.mode in ('LOCK_SEL', 'UNLOCK_SEL', 'RELOCK'):
+            target = visible & select
+        elif self.mode in ('LOCK_DESEL', 'UNLOCK_DESEL'):
+            target = visible & ~select
+        else:
+            target = visible
+
+        if self.mode in ('LOCK_SEL', 'LOCK_DESEL'):
+            new_locked = locked | target
+            set_coords = target
+        elif self.mode in ('UNLOCK_SEL', 'UNLOCK_DESEL', 'UNLOCK_ALL'):
+            new_locked = locked & ~target
+            set_coords = np.zeros(num, dtype=bool)
+        elif self.mode == 'INVERT':
+            new_locked = locked ^ target
+            set_coords = target & ~locked
+        else:  # 'RELOCK'
+            new_locked = locked
+            set_coords = locked & target
+        commit_locks(actob.data, bm, layer_lock, slots, new_locked,
+                     set_coords)
 
         del bm  # ↓のオペレータの為に参照カウンタを0にする必要がある
+        lock_arrays.clear()
         bpy.ops.mesh.lock_coords_sort_order()
 
         actob.data.update_tag()
@@ -573,6 +854,7 @@ class MESH_OT_lock_coords_sort_order(bpy.types.Operator):
 
         # sort
         bpy.ops.mesh.sort_elements(type='SELECTED', elements={'VERT'})
+        lock_arrays.clear()
 
         # restore
         bpy.ops.mesh.select_all(action='DESELECT')
@@ -732,6 +1014,9 @@ class MESH_PT_LockCoords(bpy.types.Panel):
         row = col.row(align=True)
         row.prop(lock_coords, 'lock_coordinate_system', expand=True)
 
+        col = layout.column(align=True)
+        col.prop(lock_coords, 'max_rate')
+
     # def draw_header(self, context):
     #     self.layout.prop(get_prefs(context), 'enable', text='')
 
@@ -840,7 +1125,8 @@ def register():
 
     bpy.app.handlers.load_post.append(callback_load_post)
     bpy.app.handlers.save_pre.append(callback_save_pre)
-    bpy.app.handlers.save_post.append(callback_save_post)
+    bpy.app.handlers.undo_post.append(callback_undo_post)
+    bpy.app.handlers.redo_post.append(callback_undo_post)
     bpy.app.handlers.scene_update_pre.append(callback_scene_update_pre)
 
     kc = bpy.context.window_manager.keyconfigs.addon
@@ -882,7 +1168,8 @@ def unregister():
 
     bpy.app.handlers.load_post.remove(callback_load_post)
     bpy.app.handlers.save_pre.remove(callback_save_pre)
-    bpy.app.handlers.save_post.remove(callback_save_post)
+    bpy.app.handlers.undo_post.remove(callback_undo_post)
+    bpy.app.handlers.redo_post.remove(callback_undo_post)
     if callback_scene_update_pre in bpy.app.handlers.scene_update_pre:
         bpy.app.handlers.scene_update_pre.remove(callback_scene_update_pre)
 
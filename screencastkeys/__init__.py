@@ -292,6 +292,55 @@ def region_rectangle_v3d(context, area=None, region=None):
     return xmin, ymin, xmax, ymax
 
 
+class RingLog(collections.deque):
+    """容量固定のログ。容量を超えると古い物から捨てる。
+    各要素の先頭はtime.monotonic()による時刻で、追加順に並んでいる事。
+    """
+
+    def __init__(self, capacity):
+        super().__init__(maxlen=capacity)
+
+    def expire(self, current_time, lifetime):
+        """lifetimeより古い要素を先頭から取り除く"""
+        while self and current_time - self[0][0] > lifetime:
+            self.popleft()
+        return self
+
+
+class OperatorHistoryTracker:
+    """WindowManager.operatorsの長さと末尾のアドレスを覚えておき、
+    追加されたオペレータだけを返す。
+    """
+
+    def __init__(self):
+        self.length = 0
+        self.tail = None
+
+    def reset(self):
+        self.__init__()
+
+    def new_operators(self, operators):
+        """前回から追加されたオペレータを古い順に返す。
+        変化が無ければリストを作らずに空を返す。
+        :type operators: bpy.types.bpy_prop_collection
+        :rtype: list[bpy.types.Operator]
+        """
+        length = len(operators)
+        tail = operators[-1].as_pointer() if length else None
+        if length == self.length and tail == self.tail:
+            return []
+        new = []
+        for i in range(length - 1, -1, -1):
+            op = operators[i]
+            if op.as_pointer() == self.tail:
+                break
+            new.append(op)
+        self.length = length
+        self.tail = tail
+        new.reverse()
+        return new
+
+
 def invoke_callback(context, event, dst, src):
     win = context.window
     dst.event_timer_add(context)
@@ -310,9 +359,14 @@ class ScreencastKeysStatus(bpy.types.Operator):
     # modifier確認要。不要か？
     # window_event = {}  # {Window.as_pointer(): Event, ...}
 
+    EVENT_LOG_CAPACITY = 64
+    OPERATOR_LOG_CAPACITY = 32
+
     hold_keys = []
-    event_log = []  # [[time, event_type, mod, repeat], ...]
-    operator_log = []  # [[time, bl_label, idname_py, addr], ...]
+    # [[time, event_type, mod, repeat], ...]
+    event_log = RingLog(EVENT_LOG_CAPACITY)
+    # [[time, bl_label, idname_py, addr], ...]
+    operator_log = RingLog(OPERATOR_LOG_CAPACITY)
 
     modifier_event_types = [
         EventType.LEFT_SHIFT,
@@ -356,6 +410,10 @@ class ScreencastKeysStatus(bpy.types.Operator):
     origin = {'window': '', 'area': '', 'space': '', 'region_type': ''}
     # {area_addr: [space_addr, ...], ...}
     area_spaces = collections.defaultdict(set)
+    # area_spacesを更新した時の (screen_addr, len(screen.areas))
+    area_spaces_key = None
+
+    operator_tracker = OperatorHistoryTracker()
 
     @classmethod
     def sorted_modifiers(cls, modifiers):
@@ -381,31 +439,12 @@ class ScreencastKeysStatus(bpy.types.Operator):
     def removed_old_event_log(cls):
         prefs = ScreenCastKeysPreferences.get_instance()
         """:type: ScreenCastKeysPreferences"""
-        current_time = time.time()
-        event_log = []
-        for item in cls.event_log:
-            event_time = item[0]
-            t = current_time - event_time
-            if t <= prefs.display_time:
-                event_log.append(item)
-        return event_log
+        return cls.event_log.expire(time.monotonic(), prefs.display_time)
 
     @classmethod
     def removed_old_operator_log(cls):
-        prefs = ScreenCastKeysPreferences.get_instance()
-        """:type: ScreenCastKeysPreferences"""
-        # 時間経過ではなく数で制限する
-        if 0:
-            current_time = time.time()
-            operator_log = []
-            for item in cls.operator_log:
-                event_time = item[0]
-                t = current_time - event_time
-                if t <= prefs.display_time:
-                    operator_log.append(item)
-            return operator_log
-        else:
-            return cls.operator_log[-32:]
+        # 時間経過ではなく数(OPERATOR_LOG_CAPACITY)で制限する
+        return cls.operator_log
 
     @classmethod
     def get_origin(cls, context):
@@ -501,7 +540,7 @@ class ScreencastKeysStatus(bpy.types.Operator):
             w = max(w, tw)
             h += th * cls.SEPARATOR_HEIGHT
 
-        for event_time, event_type, modifiers, count in event_log[::-1]:
+        for event_time, event_type, modifiers, count in reversed(event_log):
             # t = current_time - event_time
             # if t > prefs.display_time:
             #     continue
@@ -592,7 +631,7 @@ class ScreencastKeysStatus(bpy.types.Operator):
                 (xmin + 1, ymin + 1), (xmax - 1, ymax - 1)):
             return
 
-        current_time = time.time()
+        current_time = time.monotonic()
         draw_any = False
 
         font_size = prefs.font_size
@@ -695,7 +734,7 @@ class ScreencastKeysStatus(bpy.types.Operator):
         else:
             py += th * cls.SEPARATOR_HEIGHT
 
-        for event_time, event_type, modifiers, count in event_log[::-1]:
+        for event_time, event_type, modifiers, count in reversed(event_log):
             color = prefs.color
             bgl.glColor3f(*color)
 
@@ -770,12 +809,20 @@ class ScreencastKeysStatus(bpy.types.Operator):
         # print(context.screen, context.window.as_pointer())
 
         event_type = EventType[event.type]
-        current_time = time.time()
+        current_time = time.monotonic()
 
         # update cls.area_spaces
-        for area in context.screen.areas:
-            for space in area.spaces:
-                self.area_spaces[area.as_pointer()].add(space.as_pointer())
+        # Spaceが変わるのはクリックやキー入力の後なので、マウス移動等では
+        # Screenが切り替わった時かAreaの数が変わった時だけ更新する
+        screen = context.screen
+        area_spaces_key = (screen.as_pointer(), len(screen.areas))
+        if (area_spaces_key != self.area_spaces_key or
+                not self.is_ignore_event(event)):
+            for area in screen.areas:
+                for space in area.spaces:
+                    self.area_spaces[area.as_pointer()].add(
+                        space.as_pointer())
+            self.__class__.area_spaces_key = area_spaces_key
 
         # modifiers
         self.update_holed_keys(event)
@@ -794,28 +841,15 @@ class ScreencastKeysStatus(bpy.types.Operator):
                 last[-1] += 1
             else:
                 self.event_log.append(current)
-        self.event_log[:] = self.removed_old_event_log()
+        self.event_log.expire(current_time, prefs.display_time)
 
         # operator_log
-        operators = list(context.window_manager.operators)
-
-        if operators:
-            if self.operator_log:
-                addr = self.operator_log[-1][-1]
-            else:
-                addr = None
-            j = 0
-            for i, op in enumerate(operators[::-1]):
-                if op.as_pointer() == addr:
-                    j = len(operators) - i
-                    break
-
-            for op in operators[j:]:
-                m, f = op.bl_idname.split('_OT_')
-                idname_py = m.lower() + '.' + f
-                self.operator_log.append(
-                    [current_time, op.bl_label, idname_py, op.as_pointer()])
-        self.operator_log[:] = self.removed_old_operator_log()
+        operators = context.window_manager.operators
+        for op in self.operator_tracker.new_operators(operators):
+            m, f = op.bl_idname.split('_OT_')
+            idname_py = m.lower() + '.' + f
+            self.operator_log.append(
+                [current_time, op.bl_label, idname_py, op.as_pointer()])
 
         # redraw
         prev_time = self.prev_time
@@ -880,6 +914,7 @@ class ScreencastKeysStatus(bpy.types.Operator):
             self.hold_keys.clear()
             self.event_log.clear()
             self.operator_log.clear()
+            self.operator_tracker.reset()
             self.draw_regions_prev.clear()
             context.area.tag_redraw()
             return {'CANCELLED'}